@@ -31,6 +31,9 @@ class MultiPublish2(sgtk.platform.Application):
         # the application itself
         self._manager_class = tk_multi_publish2.PublishManager
 
+        # keep a handle on the module for the deferred registrations replay
+        self._tk_multi_publish2 = tk_multi_publish2
+
         # make the util methods available via the app instance
         self._util = tk_multi_publish2.util
 
@@ -118,6 +121,27 @@ class MultiPublish2(sgtk.platform.Application):
         """
         return self._manager_class()
 
+    def replay_deferred_registrations(self, batch_size=100):
+        """
+        Registers the publishes and creates the Versions whose registration
+        was deferred by the publish plugins, see the ``deferred_registration``
+        setting.
+
+        Registrations are replayed once, even if this method is called
+        concurrently or interrupted. Those failing to replay are kept for the
+        next call.
+
+        :param int batch_size: The maximum number of entities created by a
+            single ``shotgun.batch`` call.
+
+        :returns: A dictionary with the number of publishes ``registered``,
+            the number of ``versions`` created, the number of ``failed``
+            registrations and uploads and the number of registrations left
+            ``pending``.
+        """
+        deferred_queue = self._tk_multi_publish2.get_deferred_registration_queue()
+        return deferred_queue.replay(batch_size=batch_size)
+
     def destroy_app(self):
         """
         Tear down the app
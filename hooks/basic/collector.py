@@ -13,6 +13,7 @@ import os
 import datetime
 import urllib
 import pprint
+import weakref
 import sgtk
 from sgtk import TankError
 
@@ -106,8 +107,8 @@ class FileCollectorPlugin(HookBaseClass):
             representing a sequence of files (including a frame specifier).
 
         sequence_paths - If the item represents a collection of files, the
-            plugin will populate this property with a list of files matching
-            "path".
+            plugin will populate this property with the files matching "path",
+            as a compact ``FrameSequence`` that behaves like a list of paths.
 
     """
 
@@ -189,6 +190,40 @@ class FileCollectorPlugin(HookBaseClass):
                 },
             }
         )
+        schema.update(
+            {
+                "Recursive Folder Ingest": {
+                    "type": "bool",
+                    "default_value": False,
+                    "description": (
+                        "Whether to collect the file sequences of all the "
+                        "subfolders of a collected folder, rather than only "
+                        "the sequences directly within it."
+                    ),
+                },
+                "Ingest Threads": {
+                    "type": "int",
+                    "default_value": 4,
+                    "description": (
+                        "The maximum number of folders listed concurrently when "
+                        "recursively collecting a folder."
+                    ),
+                },
+                "Ignore Patterns": {
+                    "type": "list",
+                    "values": {
+                        "type": "str",
+                        "description": "A file or folder name pattern, such as '*.tmp'."
+                    },
+                    "default_value": [".*"],
+                    "description": (
+                        "A list of patterns of the names of the files and folders "
+                        "to ignore when recursively collecting a folder, see "
+                        "'Recursive Folder Ingest'."
+                    ),
+                },
+            }
+        )
         return schema
 
 
@@ -232,11 +267,24 @@ class FileCollectorPlugin(HookBaseClass):
         :param dict settings: Configured settings for this collector
         :param item: The Item instance
         """
+        # Both of these require template lookups and, for images, reading the
+        # file header. Defer them until they are accessed so that items which
+        # are never validated or published don't pay the cost. The providers
+        # are stored in the item's properties and only reference the item
+        # weakly, so that they don't keep it alive.
+        item_ref = weakref.ref(item)
+
         # Set the item's work_path_template
-        item.properties.work_path_template = self._resolve_work_path_template(settings, item)
+        item.properties.set_lazy(
+            "work_path_template",
+            lambda: self._resolve_work_path_template(settings, item_ref())
+        )
 
         # Set the item's fields property
-        item.properties.fields = self._resolve_item_fields(settings, item)
+        item.properties.set_lazy(
+            "fields",
+            lambda: self._resolve_item_fields(settings, item_ref())
+        )
 
 
     def __get_work_path_template_from_settings(self, settings, item_type, path):
@@ -256,7 +304,7 @@ class FileCollectorPlugin(HookBaseClass):
         # Else see if the path matches an existing template
         elif path:
             # let's try to check if this path fits into any known template
-            work_tmpl = self.sgtk.template_from_path(path)
+            work_tmpl = self.parent.util.get_template_from_path(path)
             if not work_tmpl:
                 # this path doesn't map to any known templates!
                 self.logger.warning("Cannot find a matching template for path: %s" % path)
@@ -308,7 +356,9 @@ class FileCollectorPlugin(HookBaseClass):
 
         entities.extend(addable_entities)
 
-        new_context = self.tank.context_from_entities(entities, previous_context=parent_item.context)
+        # items sharing their entities share the context built for them
+        new_context = publisher.util.get_context_cache().context_from_entities(
+            self.tank, entities, previous_context=parent_item.context)
         if new_context != parent_item.context:
             return new_context
         else:
@@ -409,34 +459,127 @@ class FileCollectorPlugin(HookBaseClass):
         # are appropriate for the current os, no double separators, etc.
         folder = sgtk.util.ShotgunPath.normalize(folder)
 
+        if settings["Recursive Folder Ingest"].value:
+            file_items = self._collect_folder_tree(settings, parent_item, folder)
+        else:
+            file_items = self._collect_folder_sequences(settings, parent_item, folder)
+
+        if not file_items:
+            self.logger.warning("No file sequences found in: %s" % (folder,))
+
+        return file_items
+
+
+    def _collect_folder_tree(self, settings, parent_item, folder):
+        """
+        Process the supplied folder path and all of its subfolders.
+
+        The folders are listed concurrently and the sequences of each folder
+        are added to the tree, and reported to the publisher via the parent
+        item, as soon as it has been listed. The walk stops if the
+        cancellation token of the parent item is cancelled, keeping the items
+        collected so far.
+
+        :param dict settings: Configured settings for this collector
+        :param parent_item: parent item instance
+        :param folder: Normalized path to analyze
+
+        :returns: The items that were created
+        """
         publisher = self.parent
-        frame_sequences = publisher.util.get_frame_sequences(folder, KNOWN_SEQ_EXTENSIONS)
+        cancellation_token = parent_item.cancellation_token
 
         file_items = []
-        for path, seq_files in frame_sequences:
-            file_item = self._add_file_item(settings, parent_item, path, True, seq_files)
-            if file_item:
-                # include an indicator that this is an image sequence and the known
-                # file that belongs to this sequence
-                file_info = (
-                    "The following files were collected:<br>"
-                    "<pre>%s</pre>" % (pprint.pformat(seq_files),)
-                )
-
-                self.logger.info(
-                    "Collected item: %s" % file_item.name,
+        num_folders = 0
+        for (sub_folder, error) in publisher.util.walk_folders(
+                folder,
+                max_workers=settings["Ingest Threads"].value,
+                ignore_patterns=settings["Ignore Patterns"].value,
+                cancellation_token=cancellation_token):
+
+            num_folders += 1
+            if error:
+                self.logger.warning(
+                    "Unable to list folder: %s" % (sub_folder,),
                     extra={
                         "action_show_more_info": {
-                            "label": "Show File(s)",
-                            "tooltip": "Show the collected file(s)",
-                            "text": file_info
+                            "label": "Show Error Log",
+                            "tooltip": "Show the error log",
+                            "text": error
                         }
                     }
                 )
-                file_items.append(file_item)
+                continue
 
-        if not file_items:
-            self.logger.warning("No file sequences found in: %s" % (folder,))
+            folder_items = self._collect_folder_sequences(
+                settings,
+                parent_item,
+                sub_folder,
+                ignore_patterns=settings["Ignore Patterns"].value
+            )
+            file_items.extend(folder_items)
+
+            # display the items of the folder without waiting for the rest of
+            # the tree to be walked
+            parent_item.notify_items_collected(folder_items)
+
+            # keep the ui responsive, and the collection cancellable
+            publisher.util.process_events()
+
+        if cancellation_token and cancellation_token.is_cancelled:
+            self.logger.warning(
+                "Collection of folder '%s' cancelled. Collected %d items from "
+                "%d folders." % (folder, len(file_items), num_folders)
+            )
+        else:
+            self.logger.debug(
+                "Collected %d items from %d folders in '%s'." %
+                (len(file_items), num_folders, folder)
+            )
+
+        return file_items
+
+
+    def _collect_folder_sequences(self, settings, parent_item, folder,
+                                  ignore_patterns=None):
+        """
+        Creates an item for each of the file sequences directly within the
+        supplied folder.
+
+        :param dict settings: Configured settings for this collector
+        :param parent_item: parent item instance
+        :param folder: Normalized path to analyze
+        :param list ignore_patterns: Optional patterns of the names of the
+            files to ignore
+
+        :returns: The items that were created
+        """
+        publisher = self.parent
+        frame_sequences = [
+            (path, seq_files) for (path, seq_files) in
+            publisher.util.get_frame_sequences(folder, KNOWN_SEQ_EXTENSIONS)
+            if not publisher.util.is_ignored(os.path.basename(path), ignore_patterns)
+        ]
+
+        file_items = self._add_file_items(settings, parent_item, frame_sequences)
+        for (file_item, (path, seq_files)) in zip(file_items, frame_sequences):
+            # include an indicator that this is an image sequence and the known
+            # file that belongs to this sequence
+            file_info = (
+                "The following files were collected:<br>"
+                "<pre>%s</pre>" % (pprint.pformat(seq_files),)
+            )
+
+            self.logger.info(
+                "Collected item: %s" % file_item.name,
+                extra={
+                    "action_show_more_info": {
+                        "label": "Show File(s)",
+                        "tooltip": "Show the collected file(s)",
+                        "text": file_info
+                    }
+                }
+            )
 
         return file_items
 
@@ -477,18 +620,10 @@ class FileCollectorPlugin(HookBaseClass):
 
         # If a sequence, add the sequence path
         if is_sequence:
-            properties["sequence_paths"] = seq_files
+            properties["sequence_paths"] = self._get_sequence_paths(path, seq_files)
 
         if not context:
-            # See if we can get a resolved work_path_template from the settings object
-            work_path_template = self.__get_work_path_template_from_settings(settings, item_type, path)
-            if work_path_template:
-                # If defined, attempt to use it and the input path to get the item's initial context
-                context = self._get_item_context_from_path(work_path_template, path, parent_item)
-
-            # Otherwise, just set the context to the parent's context
-            else:
-                context = parent_item.context
+            context = self._get_file_item_context(settings, parent_item, item_type, path)
 
         # create and populate the item
         file_item = self._add_item(settings,
@@ -498,8 +633,105 @@ class FileCollectorPlugin(HookBaseClass):
                                    context,
                                    properties)
 
-        # if the supplied path is an image, use the path as the thumbnail.
-        image_type = item_type.split(".")[1]
+        self._set_file_item_thumbnail(file_item, path, is_sequence, seq_files)
+
+        return file_item
+
+
+    def _add_file_items(self, settings, parent_item, frame_sequences):
+        """
+        Creates a file item for each of the supplied frame sequences in a
+        single pass.
+
+        This is the bulk equivalent of :meth:`_add_file_item` for sequences.
+        Plugins are attached to all of the created items at once rather than
+        item by item.
+
+        :param dict settings: Configured settings for this collector
+        :param parent_item: parent item instance
+        :param frame_sequences: A list of ``(path, seq_files)`` tuples as
+            returned by ``get_frame_sequences``
+
+        :returns: A list of the items that were created, in the order of the
+            supplied frame sequences
+        """
+        publisher = self.parent
+
+        item_specs = []
+        for (path, seq_files) in frame_sequences:
+
+            # Get the item name and type from the path
+            item_name = publisher.util.get_publish_name(path)
+            item_type = self._get_item_type_from_settings(settings, path, True)
+
+            properties = {
+                "path": path,
+                "is_sequence": True,
+                "sequence_paths": self._get_sequence_paths(path, seq_files),
+            }
+
+            context = self._get_file_item_context(settings, parent_item, item_type, path)
+
+            item_specs.append((item_name, item_type, context, properties))
+
+        file_items = self._add_items(settings, parent_item, item_specs)
+
+        for (file_item, (path, seq_files)) in zip(file_items, frame_sequences):
+            self._set_file_item_thumbnail(file_item, path, True, seq_files)
+
+        return file_items
+
+
+    def _get_file_item_context(self, settings, parent_item, item_type, path):
+        """
+        Returns the initial context for a file item.
+
+        :param dict settings: Configured settings for this collector
+        :param parent_item: parent item instance
+        :param item_type: The type of the item instance
+        :param path: Path to analyze
+
+        :returns: A :class:`sgtk.Context` instance
+        """
+        # See if we can get a resolved work_path_template from the settings object
+        work_path_template = self.__get_work_path_template_from_settings(settings, item_type, path)
+        if work_path_template:
+            # If defined, attempt to use it and the input path to get the item's initial context
+            return self._get_item_context_from_path(work_path_template, path, parent_item)
+
+        # Otherwise, just set the context to the parent's context
+        return parent_item.context
+
+
+    def _get_sequence_paths(self, path, seq_files):
+        """
+        Returns the files of a sequence as a compact
+        :class:`~.util.FrameSequence`, or as the supplied list if they can't
+        be represented as one.
+
+        :param path: The sequence path or the path of one of its frames
+        :param seq_files: A list of files in the sequence
+        """
+        publisher = self.parent
+
+        seq_path = publisher.util.get_frame_sequence_path(path) or path
+        try:
+            return publisher.util.FrameSequence.from_paths(seq_path, seq_files)
+        except ValueError:
+            # not a printf style frame specification or mismatching padding
+            return seq_files
+
+
+    def _set_file_item_thumbnail(self, file_item, path, is_sequence=False, seq_files=None):
+        """
+        If the supplied file item is an image, use its path as the thumbnail.
+
+        :param file_item: The file item to set the thumbnail for
+        :param path: Path of the item
+        :param is_sequence: Bool as to whether the path is part of a sequence
+        :param seq_files: A list of files in the sequence
+        """
+        image_type = file_item.type_spec.split(".")[1]
         if image_type in KNOWN_IMAGE_TYPES:
             if is_sequence:
                 file_item.set_thumbnail_from_path(seq_files[0])
@@ -509,8 +741,6 @@ class FileCollectorPlugin(HookBaseClass):
             # disable thumbnail creation since we get it for free
             file_item.thumbnail_enabled = False
 
-        return file_item
-
 
     def _get_item_type_from_settings(self, settings, path, is_sequence):
         """
@@ -177,6 +177,25 @@ class CreateVersionPlugin(HookBaseClass):
         # return the accepted info
         return accept_data
 
+    def accept_cache_key(self, task_settings, item):
+        """
+        Returns the key used to memoize the acceptance result for the item.
+
+        Besides the configuration of the review submission app, which is the
+        same for all items, acceptance depends on the item type and whether a
+        path was collected for the item. Items without a path are rejected
+        with a message naming them, so they aren't shared.
+
+        :param task_settings: Dictionary of Settings. The keys are strings, matching
+            the keys returned in the settings property. The values are `Setting`
+            instances.
+        :param item: Item to process
+
+        :returns: A hashable key
+        """
+        if item.properties.get("path"):
+            return (item.type, True)
+        return (item.type, False, item.name)
 
     def validate(self, task_settings, item):
         """
@@ -234,7 +253,7 @@ class CreateVersionPlugin(HookBaseClass):
         fields["version"] = item.properties.publish_version
 
         # Update with the fields from the context
-        fields.update(item.context.as_template_fields())
+        fields.update(self.parent.util.get_context_template_fields(item.context))
 
         # set review_submission app's env/context based on item (ingest)
         self.__review_submission_app.change_context(item.context)
@@ -347,7 +366,7 @@ class CreateVersionPlugin(HookBaseClass):
         # Make sure we don't overwrite the item's fields
         fields = copy.copy(item.properties.fields)
         # Update with the fields from the context
-        fields.update(item.context.as_template_fields())
+        fields.update(self.parent.util.get_context_template_fields(item.context))
 
         # Movie output width and height
         width = self.__review_submission_app.get_setting("movie_width")
@@ -10,7 +10,6 @@
 
 import os
 import copy
-import glob
 import pprint
 import traceback
 
@@ -63,6 +62,10 @@ class PublishPlugin(HookBaseClass):
             determine where "path" should be copied prior to publishing. If
             not specified, "path" will be published in place.
 
+        checksum_publish_field - If set in the plugin settings dictionary, the
+            PublishedFile field populated with the checksums of the published
+            files, when the plugin's "Checksum Algorithm" setting is defined.
+
     The following properties are set during the execution of this plugin, and can be
     accessed via :meth:`Item.properties` or :meth:`Item.local_properties`.
 
@@ -74,6 +77,10 @@ class PublishPlugin(HookBaseClass):
 
         publish_path - The location on disk the publish is copied to.
 
+        publish_checksums - The checksums of the published files, if the
+            plugin's "Checksum Algorithm" setting is defined. A dictionary
+            holding the algorithm and the concatenated hex digests of the files.
+
         sg_publish_data_list - The list of entity dictionaries corresponding to the
             publish information returned from the tk-core register_publish method.
 
@@ -176,6 +183,15 @@ class PublishPlugin(HookBaseClass):
                     "Dictionary of template_key/sg_field pairs to populate on "
                     "the PublishedFile entity."
                 )
+            },
+            "checksum_publish_field": {
+                "type": "str",
+                "default_value": "",
+                "description": (
+                    "The text field of the PublishedFile entity to populate "
+                    "with the checksums of the published files, as "
+                    "<algorithm>:<concatenated hex digests>."
+                )
             }
         }
         return schema
@@ -184,6 +200,44 @@ class PublishPlugin(HookBaseClass):
     ############################################################################
     # standard publish plugin methods
 
+    # the publish properties resolved for each item during validation
+    PUBLISH_PROPERTIES = ("publish_type", "publish_name", "publish_version", "publish_path",
+                          "publish_symlink_path", "publish_linked_entity_name")
+
+
+    def pre_validate(self, tasks):
+        """
+        Resolves the publish properties of all the items to validate and finds
+        their conflicting publishes at once.
+
+        :param tasks: List of (task_settings, item) tuples to validate.
+        """
+
+        publisher = self.parent
+
+        # items whose properties were resolved, keyed by id
+        self._pre_validated_items = {}
+
+        publish_requests = []
+        for (task_settings, item) in tasks:
+            try:
+                for attr in self.PUBLISH_PROPERTIES:
+                    method = getattr(self, "_get_%s" % attr)
+                    item.properties[attr] = method(item, task_settings)
+            except Exception:
+                # errors are reported when validating the item
+                continue
+
+            self._pre_validated_items[id(item)] = item
+            publish_requests.append(
+                (item.context, item.properties.publish_path, item.properties.publish_name)
+            )
+
+        publisher.util.prefetch_conflicting_publishes(
+            publish_requests,
+            filters=["sg_status_list", "is_not", None]
+        )
+
 
     def validate(self, task_settings, item):
         """
@@ -203,8 +257,13 @@ class PublishPlugin(HookBaseClass):
 
         # ---- validate the settings required to publish
 
-        attr_list = ("publish_type", "publish_name", "publish_version", "publish_path",
-                     "publish_symlink_path", "publish_linked_entity_name")
+        # properties resolved by pre_validate are used as is
+        pre_validated_items = getattr(self, "_pre_validated_items", {})
+        if pre_validated_items.pop(id(item), None) is item:
+            attr_list = ()
+        else:
+            attr_list = self.PUBLISH_PROPERTIES
+
         for attr in attr_list:
             try:
                 method = getattr(self, "_get_%s" % attr)
@@ -226,7 +285,8 @@ class PublishPlugin(HookBaseClass):
 
         # Note the name, context, and path *must* match the values supplied to
         # register_publish in the publish phase in order for this to return an
-        # accurate list of previous publishes of this file.
+        # accurate list of previous publishes of this file. The publishes were
+        # usually prefetched for all items by pre_validate.
         publishes = publisher.util.get_conflicting_publishes(
             item.context,
             item.properties.publish_path,
@@ -264,9 +324,12 @@ class PublishPlugin(HookBaseClass):
             # ---- ensure the published file(s) don't already exist on disk
 
             conflict_info = None
-            if item.properties.get("is_sequence"):
+            if self._get_setting_value("Resume Copies", False, task_settings):
+                # files left by a partial publish of this version can be resumed
+                conflict_info = self._validate_resume(item, publishes)
+            elif item.properties.get("is_sequence"):
                 seq_pattern = publisher.util.get_path_for_frame(item.properties.publish_path, "*")
-                seq_files = [f for f in glob.iglob(seq_pattern) if os.path.isfile(f)]
+                seq_files = publisher.util.glob_files(seq_pattern)
 
                 if seq_files:
                     conflict_info = (
@@ -294,6 +357,23 @@ class PublishPlugin(HookBaseClass):
                 )
                 return False
 
+        # ---- check the sequence is complete
+        if item.properties.get("is_sequence"):
+            analysis = publisher.util.analyze_sequence(
+                item.properties.get("sequence_paths", [])
+            )
+            if analysis.has_issues:
+                self.logger.warning(
+                    "The sequence may be incomplete: %s." % (analysis.summary(),),
+                    extra={
+                        "action_show_more_info": {
+                            "label": "Show Gaps",
+                            "tooltip": "Show the issues found with the frames of the sequence",
+                            "text": "<pre>%s</pre>" % (analysis.report(),)
+                        }
+                    }
+                )
+
         self.logger.info(
             "A Publish will be created for item '%s'." %
                 (item.name,),
@@ -345,9 +425,17 @@ class PublishPlugin(HookBaseClass):
         dependency_ids = item.properties.get("publish_dependency_ids", [])
 
         # If the parent item has publish data, include those ids in the
-        # list of dependencies as well
-        if "sg_publish_data_list" in item.parent.properties:
-            dependency_ids.extend([ent["id"] for ent in item.parent.properties["sg_publish_data_list"]])
+        # list of dependencies as well. Publishes still queued for
+        # registration are added to the dependencies once registered.
+        batch_registration = self._get_setting_value("Batch Registration", False, task_settings)
+        parent_properties = item.parent.properties
+        if "sg_publish_data_list" in parent_properties:
+            if (batch_registration and
+                    not parent_properties.is_resolved("sg_publish_data_list")):
+                parent_publishes = self._get_registered_publishes(item.parent)
+            else:
+                parent_publishes = parent_properties["sg_publish_data_list"]
+            dependency_ids.extend([ent["id"] for ent in parent_publishes])
 
         # get any additional_publish_fields that have been defined
         sg_fields = {}
@@ -361,6 +449,14 @@ class PublishPlugin(HookBaseClass):
         if path:
             sg_fields["sg_path_to_source"] = path
 
+        # Add the checksums of the published files, if requested
+        checksum_field = task_settings.get("checksum_publish_field")
+        checksums = item.properties.get("publish_checksums")
+        if checksum_field and checksums:
+            sg_fields[checksum_field] = "%s:%s" % (
+                checksums["algorithm"], checksums["digests"]
+            )
+
         # Make sure any specified fields exist on the PublishedFile entity
         sg_fields = self._validate_sg_fields(sg_fields)
 
@@ -392,12 +488,31 @@ class PublishPlugin(HookBaseClass):
             }
         )
 
+        if self._is_registration_deferred():
+            # the publish is registered when the deferred registrations are
+            # replayed
+            self._defer_publish_registration(item, publish_data)
+            self.logger.info("Publish registration deferred.")
+            return
+
+        if batch_registration:
+            # the publish is stashed in the item properties once registered
+            self._queue_publish_registration(
+                item,
+                publish_data,
+                error_callback=lambda request: self._on_registration_error(
+                    task_settings, item, request)
+            )
+            self.logger.info("Publish queued for registration.")
+            return
+
         exception = None
         sg_publish_data = None
         # create the publish and stash it in the item properties for other
         # plugins to use.
         try:
             sg_publish_data = sgtk.util.register_publish(**publish_data)
+            publisher.util.get_published_files_cache().discard(sg_publish_data)
             self.logger.info("Publish registered!")
         except Exception as e:
             exception = e
@@ -437,17 +552,23 @@ class PublishPlugin(HookBaseClass):
         :param item: Item to process
         """
 
-        self.logger.info("Cleaning up copied files for %s..." % item.name)
-
         sg_publish_data_list = item.properties.get("sg_publish_data_list")
         publish_path = item.properties.get("publish_path")
         publish_symlink_path = item.properties.get("publish_symlink_path")
 
-        if publish_symlink_path:
-            self.delete_files(task_settings, item, publish_symlink_path)
+        if self._get_setting_value("Resume Copies", False, task_settings):
+            # keep the copied files for the publish to be resumed
+            self.logger.info(
+                "Keeping copied files for %s to resume the publish." % item.name
+            )
+        else:
+            self.logger.info("Cleaning up copied files for %s..." % item.name)
+
+            if publish_symlink_path:
+                self.delete_files(task_settings, item, publish_symlink_path)
 
-        # Delete any files on disk
-        self.delete_files(task_settings, item, publish_path)
+            # Delete any files on disk
+            self.delete_files(task_settings, item, publish_path)
 
         if sg_publish_data_list:
             for publish_data in sg_publish_data_list:
@@ -476,6 +597,41 @@ class PublishPlugin(HookBaseClass):
             # pop the sg_publish_data_list too
             item.properties.pop("sg_publish_data_list")
 
+        deferred_publish_keys = item.properties.get("deferred_publish_keys")
+        if deferred_publish_keys:
+            self.logger.info("Cancelling deferred publish registrations...")
+            self._cancel_deferred_registrations(deferred_publish_keys)
+            item.properties.pop("deferred_publish_keys")
+
+
+    def pre_finalize(self, tasks):
+        """
+        Clears the status of the publishes conflicting with the publishes of
+        all the items to finalize at once.
+
+        :param tasks: List of (task_settings, item) tuples to finalize.
+        """
+
+        publisher = self.parent
+
+        # items whose conflicting publishes were cleared, keyed by id
+        self._pre_finalized_items = {}
+
+        items = []
+        publish_requests = []
+        for (task_settings, item) in tasks:
+            if "sg_publish_data_list" not in item.properties:
+                continue
+            items.append(item)
+            for publish_data in item.properties.sg_publish_data_list:
+                publish_requests.append((item.context, publish_data))
+
+        # errors are left for finalize to report, one item at a time
+        publisher.util.clear_status_for_conflicting_publishes_batch(publish_requests)
+
+        for item in items:
+            self._pre_finalized_items[id(item)] = item
+
 
     def finalize(self, task_settings, item):
         """
@@ -495,10 +651,15 @@ class PublishPlugin(HookBaseClass):
             # get the data for the publish that was just created in SG
             sg_publish_data_list = item.properties.sg_publish_data_list
 
+            # conflicting publishes cleared by pre_finalize are left as is
+            pre_finalized_items = getattr(self, "_pre_finalized_items", {})
+            pre_finalized = pre_finalized_items.pop(id(item), None) is item
+
             for publish_data in sg_publish_data_list:
                 # ensure conflicting publishes have their status cleared
-                publisher.util.clear_status_for_conflicting_publishes(
-                    item.context, publish_data)
+                if not pre_finalized:
+                    publisher.util.clear_status_for_conflicting_publishes(
+                        item.context, publish_data)
 
                 self.logger.info(
                     "Publish created for file: %s" % (publish_data["path"]["local_path"],),
@@ -513,6 +674,12 @@ class PublishPlugin(HookBaseClass):
 
             self.logger.info("Cleared the status of all previous, conflicting publishes")
 
+        elif "deferred_publish_keys" in item.properties:
+            self.logger.info(
+                "Publish registration deferred for file: %s" %
+                (item.properties.publish_path,)
+            )
+
 
     def publish_files(self, task_settings, item, publish_path):
         """
@@ -535,7 +702,15 @@ class PublishPlugin(HookBaseClass):
         else:
             work_files = [path]
 
-        return self._copy_files(work_files, publish_path, is_sequence)
+        return self._copy_files(
+            work_files,
+            publish_path,
+            is_sequence,
+            progress_callback=lambda num_copied, num_files: self.parent.util.process_events(),
+            cancellation_token=item.cancellation_token,
+            item=item,
+            task_settings=task_settings
+        )
 
 
     def symlink_publishes(self, task_settings, item):
@@ -579,6 +754,79 @@ class PublishPlugin(HookBaseClass):
     ############################################################################
     # protected methods
 
+    def _on_registration_error(self, task_settings, item, request):
+        """
+        Called when the queued registration of the publish of an item failed.
+
+        :param task_settings: Dictionary of Settings.
+        :param item: Item whose publish failed to be registered
+        :param request: The failed registration request
+        """
+        self.logger.error(
+            "Couldn't register Publish for %s" % item.name,
+            extra={
+                "action_show_more_info": {
+                    "label": "Show Error Log",
+                    "tooltip": "Show the error log",
+                    "text": request.error
+                }
+            }
+        )
+        self.undo(task_settings, item)
+
+
+    def _validate_resume(self, item, publishes):
+        """
+        Checks whether the published files already existing on disk were left
+        by a partial publish of the item that can be resumed.
+
+        Files are left by a partial publish if they are identical to their
+        source and no publish has been registered for them.
+
+        :param item: Item to process
+        :param publishes: The conflicting publishes of the item.
+
+        :returns: The info to report if the existing files conflict with the
+            publish, ``None`` otherwise.
+        """
+        is_sequence = item.properties.get("is_sequence", False)
+        if is_sequence:
+            work_files = item.properties.get("sequence_paths", [])
+        else:
+            work_files = [item.properties.path]
+
+        (unchanged, divergent) = self._get_existing_files(
+            work_files, item.properties.publish_path, is_sequence
+        )
+
+        if divergent:
+            return (
+                "The following files already exist and differ from the "
+                "files to publish!<br>"
+                "<pre>%s</pre>" % (pprint.pformat(divergent),)
+            )
+
+        if unchanged and publishes:
+            return (
+                "The following files have already been published!<br>"
+                "<pre>%s</pre>" % (pprint.pformat(unchanged),)
+            )
+
+        if unchanged:
+            self.logger.warning(
+                "Resuming a partial publish. %d of %d files have already been "
+                "copied and will be skipped." % (len(unchanged), len(work_files)),
+                extra={
+                    "action_show_more_info": {
+                        "label": "Show Files",
+                        "tooltip": "Show the files already copied",
+                        "text": "<pre>%s</pre>" % (pprint.pformat(unchanged),)
+                    }
+                }
+            )
+
+        return None
+
     def _validate_sg_fields(self, sg_fields):
         """
         Ensure that the requested sg_fields exist in the PublishedFile entity schema
@@ -589,10 +837,12 @@ class PublishPlugin(HookBaseClass):
         """
         publish_entity_type = sgtk.util.get_published_file_entity_type(self.parent.sgtk)
         try:
-            fields = self.parent.shotgun.schema_field_read(publish_entity_type)
+            fields = self.parent.util.get_schema_fields(publish_entity_type)
         except Exception, e:
-            self.logger.error("Failed to find fields for the '%s' schema: %s" 
+            # keep the fields, the registration will report any invalid one
+            self.logger.error("Failed to find fields for the '%s' schema: %s"
                               % (publish_entity_type, e))
+            return sg_fields
 
         bad_fields = list(set(sg_fields.keys()).difference(set(fields)))
         if bad_fields:
@@ -654,7 +904,7 @@ class PublishPlugin(HookBaseClass):
 
             # First get the fields from the context
             try:
-                fields.update(item.context.as_template_fields(pub_tmpl))
+                fields.update(publisher.util.get_context_template_fields(item.context, pub_tmpl))
             except TankError, e:
                 self.logger.debug(
                     "Unable to get context fields for publish_path_template.")
@@ -717,7 +967,7 @@ class PublishPlugin(HookBaseClass):
 
             # First get the fields from the context
             try:
-                fields.update(item.context.as_template_fields(pub_symlink_tmpl))
+                fields.update(publisher.util.get_context_template_fields(item.context, pub_symlink_tmpl))
             except TankError, e:
                 self.logger.debug(
                     "Unable to get context fields for publish_symlink_template.")
@@ -776,6 +1026,9 @@ class PublishPlugin(HookBaseClass):
         """
         Given a context, publish name and type, find all publishes from Shotgun
         that match.
+
+        All the publishes of a context are found with a single query, shared
+        by all items during the validation pass.
         
         :param ctx:             Context to use when looking for publishes
         :param publish_name:    The name of the publishes to look for
@@ -786,30 +1039,10 @@ class PublishPlugin(HookBaseClass):
         """
         publisher = self.parent
 
-        publish_entity_type = sgtk.util.get_published_file_entity_type(self.parent.sgtk)
-        if publish_entity_type == "PublishedFile":
-            publish_type_field = "published_file_type.PublishedFileType.code"
-        else:
-            publish_type_field = "tank_type.TankType.code"
-        
-        # construct filters from the context:
-        filters = [["project", "is", ctx.project]]
-        if ctx.entity:
-            filters.append(["entity", "is", ctx.entity])
-        if ctx.task:
-            filters.append(["task", "is", ctx.task])
-
-        # add in name & type:
-        if publish_name:
-            filters.append(["name", "starts_with", publish_name])
-        if publish_type:
-            filters.append([publish_type_field, "is", publish_type])
-            
         # retrieve a list of all matching publishes from Shotgun:
         sg_publishes = []
         try:
-            query_fields = ["version_number"]
-            sg_publishes = self.parent.shotgun.find(publish_entity_type, filters, query_fields)
+            sg_publishes = publisher.util.find_publishes(ctx, publish_name, publish_type)
         except Exception, e:
             self.logger.error("Failed to find publishes of type '%s', called '%s', for context %s: %s" 
                               % (publish_type, publish_name, ctx, e))
@@ -847,7 +1080,7 @@ class PublishPlugin(HookBaseClass):
 
             # First get the fields from the context
             try:
-                fields.update(item.context.as_template_fields(pub_tmpl))
+                fields.update(publisher.util.get_context_template_fields(item.context, pub_tmpl))
             except TankError, e:
                 self.logger.debug(
                     "Unable to get context fields for publish_name_template.")
@@ -899,7 +1132,7 @@ class PublishPlugin(HookBaseClass):
 
             # First get the fields from the context
             try:
-                fields.update(item.context.as_template_fields(pub_linked_entity_name_tmpl))
+                fields.update(publisher.util.get_context_template_fields(item.context, pub_linked_entity_name_tmpl))
             except TankError, e:
                 self.logger.debug(
                     "Unable to get context fields for publish_linked_entity_name_template.")
@@ -207,6 +207,24 @@ class PublishFilesPlugin(HookBaseClass):
         # return the accepted data
         return accept_data
 
+    def accept_cache_key(self, task_settings, item):
+        """
+        Returns the key used to memoize the acceptance result for the item.
+
+        File items are accepted based on their type, which selects their task
+        settings, as long as a path was collected for them. Items without a
+        path are rejected with a message naming them, so they aren't shared.
+
+        :param task_settings: Dictionary of Settings. The keys are strings, matching
+            the keys returned in the settings property. The values are `Setting`
+            instances.
+        :param item: Item to process
+
+        :returns: A hashable key
+        """
+        if item.properties.get("path"):
+            return (item.type, True)
+        return (item.type, False, item.name)
 
     def validate(self, task_settings, item):
         """
@@ -93,6 +93,15 @@ class UploadVersionPlugin(HookBaseClass):
             "default_value": True,
             "description": "Should the local file be referenced by Shotgun"
         }
+        schema["Background Upload"] = {
+            "type": "bool",
+            "default_value": False,
+            "description": (
+                "Whether to upload the content or thumbnail in the background "
+                "while the next tasks are published. Uploads are waited for "
+                "when finalizing."
+            )
+        }
         return schema
 
     def init_task_settings(self, task_settings, item):
@@ -143,6 +152,22 @@ class UploadVersionPlugin(HookBaseClass):
         # return the accepted data
         return accept_data
 
+    def accept_cache_key(self, task_settings, item):
+        """
+        Returns the key used to memoize the acceptance result for the item.
+
+        Items are silently rejected when no path was collected for them, the
+        result is otherwise the same for all items of a type.
+
+        :param task_settings: Dictionary of Settings. The keys are strings, matching
+            the keys returned in the settings property. The values are `Setting`
+            instances.
+        :param item: Item to process
+
+        :returns: A hashable key
+        """
+        return (item.type, bool(item.properties.get("path")))
+
     def validate(self, task_settings, item):
         """
         Validates the given item to check that it is ok to publish.
@@ -213,6 +238,10 @@ class UploadVersionPlugin(HookBaseClass):
             }
         )
 
+        if self._is_registration_deferred():
+            self._defer_version(task_settings, item, version_data)
+            return
+
         # Create the version
         version = publisher.shotgun.create("Version", version_data)
         self.logger.info("Version created!")
@@ -232,23 +261,38 @@ class UploadVersionPlugin(HookBaseClass):
             else:
                 upload_path = path
 
-            self.parent.shotgun.upload(
-                "Version",
-                version["id"],
-                upload_path,
-                "sg_uploaded_movie"
-            )
+            if task_settings["Background Upload"].value:
+                self._queue_upload(
+                    item,
+                    "Version",
+                    version["id"],
+                    upload_path,
+                    "sg_uploaded_movie"
+                )
+            else:
+                self.parent.shotgun.upload(
+                    "Version",
+                    version["id"],
+                    upload_path,
+                    "sg_uploaded_movie"
+                )
         elif thumb:
             # only upload thumb if we are not uploading the content. with
             # uploaded content, the thumb is automatically extracted.
             self.logger.info("Uploading thumbnail...")
-            self.parent.shotgun.upload_thumbnail(
-                "Version",
-                version["id"],
-                thumb
-            )
-
-        self.logger.info("Upload complete!")
+            if task_settings["Background Upload"].value:
+                self._queue_upload(item, "Version", version["id"], thumb)
+            else:
+                self.parent.shotgun.upload_thumbnail(
+                    "Version",
+                    version["id"],
+                    thumb
+                )
+
+        if task_settings["Background Upload"].value:
+            self.logger.info("Upload queued!")
+        else:
+            self.logger.info("Upload complete!")
 
     def finalize(self, task_settings, item):
         """
@@ -262,7 +306,14 @@ class UploadVersionPlugin(HookBaseClass):
         """
 
         path = item.properties.path
-        version = item.properties.sg_version_data
+        version = item.properties.get("sg_version_data")
+
+        if not version:
+            self.logger.info("Version creation deferred for file: %s" % (path,))
+            return
+
+        # surface the errors of the uploads queued in the background
+        self._wait_for_uploads(item)
 
         self.logger.info(
             "Version uploaded for file: %s" % (path,),
@@ -275,6 +326,39 @@ class UploadVersionPlugin(HookBaseClass):
             }
         )
 
+    def _defer_version(self, task_settings, item, version_data):
+        """
+        Defers the creation of the Version and the upload of its content or
+        thumbnail until the deferred registrations are replayed. The files to
+        upload are copied to the deferred registration queue, the item's file
+        being a work file which can change before the replay.
+        """
+
+        uploads = []
+        thumb = item.get_thumbnail_as_path()
+        if task_settings["Upload"].value:
+            uploads.append((item.properties.path, "sg_uploaded_movie"))
+        elif thumb:
+            uploads.append((thumb, None))
+
+        self._defer_version_creation(item, version_data, uploads=uploads)
+        self.logger.info("Version creation deferred.")
+
+    def undo(self, task_settings, item):
+        """
+        Cancels the deferred creation of the Version, if any.
+
+        :param task_settings: Dictionary of Settings. The keys are strings, matching
+            the keys returned in the task_settings property. The values are `Setting`
+            instances.
+        :param item: Item to process
+        """
+
+        deferred_version_key = item.properties.get("deferred_version_key")
+        if deferred_version_key:
+            self._cancel_deferred_registrations([deferred_version_key])
+            item.properties.pop("deferred_version_key")
+
     def _get_version_entity(self, item):
         """
         Returns the best entity to link the version to.
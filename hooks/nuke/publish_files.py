@@ -79,6 +79,19 @@ class NukePublishFilesPlugin(HookBaseClass):
         # return the accepted info
         return accept_data
 
+    def accept_cache_key(self, task_settings, item):
+        """
+        Disables memoization of the acceptance result since it depends on the
+        state of the node for each item.
+
+        :param task_settings: Dictionary of Settings. The keys are strings, matching
+            the keys returned in the settings property. The values are `Setting`
+            instances.
+        :param item: Item to process
+
+        :returns: ``None``
+        """
+        return None
 
     def validate(self, task_settings, item):
         """
@@ -10,7 +10,6 @@
 
 import os
 import re
-import glob
 
 import sgtk
 from sgtk.templatekey import SequenceKey
@@ -31,6 +30,19 @@ VERSION_REGEX = re.compile("(.*)([._-])v(\d+)\.?(\S+)?$", re.IGNORECASE)
 # or '-'.
 FRAME_REGEX = re.compile("(.*)([._-])(\d+)\.(\S+)$", re.IGNORECASE)
 
+# compiled regular expressions matching a frame specification, such as %04d,
+# just before the extension. keyed by frame specification.
+_SPEC_REGEXES = {}
+
+# the parsed components of the sequence paths frames have been substituted
+# for, keyed by (folder, filename, frame spec, pipeline configuration). values
+# are (folder, prefix, frame separator, extension) tuples, None for paths that
+# are not sequence paths.
+_SEQUENCE_PATH_COMPONENTS = {}
+
+# the maximum number of sequence paths memoized before the memo is reset
+_MAX_SEQUENCE_PATHS = 16384
+
 
 class BasicPathInfo(HookBaseClass):
     """
@@ -164,13 +176,57 @@ class BasicPathInfo(HookBaseClass):
         :return: The full frame number path
         """
 
+        # the frame spec of a sequence path is only located once, substituting
+        # frame numbers for known sequences is simple string formatting
+        (folder, filename) = os.path.split(path)
+        memo_key = (
+            folder,
+            filename,
+            frame_spec,
+            self.sgtk.pipeline_configuration.get_path()
+        )
+
+        try:
+            components = _SEQUENCE_PATH_COMPONENTS[memo_key]
+        except KeyError:
+            components = self._get_sequence_path_components(path, frame_spec)
+            if len(_SEQUENCE_PATH_COMPONENTS) >= _MAX_SEQUENCE_PATHS:
+                _SEQUENCE_PATH_COMPONENTS.clear()
+            _SEQUENCE_PATH_COMPONENTS[memo_key] = components
+
+        if components is None:
+            return None
+
+        (folder, prefix, frame_sep, extension) = components
+
+        seq_filename = "%s%s%s" % (prefix, frame_sep, frame_num)
+
+        if extension:
+            seq_filename = "%s.%s" % (seq_filename, extension)
+
+        # build the full sequence path
+        return os.path.join(folder, seq_filename)
+
+    def _get_sequence_path_components(self, path, frame_spec=None):
+        """
+        Locates the frame spec of the supplied sequence path for
+        :meth:`get_path_for_frame`.
+
+        :param path: The input path with a frame spec
+        :param frame_spec: The frame specification to be replaced.
+
+        :return: A tuple of the folder, the filename prefix, the frame
+            separator and the extension of the path. ``None`` if the path
+            is not a sequence path.
+        """
+
         publisher = self.parent
         path_info = publisher.util.get_file_path_components(path)
 
         # If the frame_spec is not specified, see if we can determine one
         if not frame_spec:
             # Attempt to match the path to a template
-            path_tmpl = self.sgtk.template_from_path(path)
+            path_tmpl = publisher.util.get_template_from_path(path)
             if path_tmpl:
                 # Find the first instance of a SequenceKey
                 seq_key = None
@@ -216,8 +272,11 @@ class BasicPathInfo(HookBaseClass):
                     frame_spec = "%04d"
 
         # see if there is a frame spec
-        SPEC_REGEX = re.compile("(.*)([._-])(%s)\.(\S+)$" % re.escape(frame_spec))
-        frame_pattern_match = re.search(SPEC_REGEX, path_info["filename"])
+        spec_regex = _SPEC_REGEXES.get(frame_spec)
+        if spec_regex is None:
+            spec_regex = re.compile("(.*)([._-])(%s)\.(\S+)$" % re.escape(frame_spec))
+            _SPEC_REGEXES[frame_spec] = spec_regex
+        frame_pattern_match = spec_regex.search(path_info["filename"])
 
         if not frame_pattern_match:
             # no frame spec detected. carry on.
@@ -225,16 +284,9 @@ class BasicPathInfo(HookBaseClass):
 
         prefix = frame_pattern_match.group(1)
         frame_sep = frame_pattern_match.group(2)
-        frame_str = frame_pattern_match.group(3)
         extension = frame_pattern_match.group(4) or ""
 
-        seq_filename = "%s%s%s" % (prefix, frame_sep, frame_num)
-
-        if extension:
-            seq_filename = "%s.%s" % (seq_filename, extension)
-
-        # build the full sequence path
-        return os.path.join(path_info["folder"], seq_filename)
+        return (path_info["folder"], prefix, frame_sep, extension)
 
     def get_frame_sequence_path(self, path, frame_spec=None):
         """
@@ -303,14 +355,12 @@ class BasicPathInfo(HookBaseClass):
         # are appropriate for the current os, no double separators, etc.
         path = sgtk.util.ShotgunPath.normalize(seq_path)
 
-        # find files that match the pattern
+        # find files that match the pattern, reusing the folder listing
+        # cached for the publish session
         seq_pattern = self.get_path_for_frame(path, "*", frame_spec)
-        seq_files = [f for f in glob.iglob(seq_pattern) if os.path.isfile(f)]
-
-        # Sort the resulting list
-        seq_files.sort()
+        seq_files = self.parent.util.glob_files(seq_pattern)
 
-        # Return the seq_files
+        # Return the seq_files, sorted
         return seq_files
 
     def get_frame_sequences(self, folder, extensions=None, frame_spec=None):
@@ -364,13 +414,14 @@ class BasicPathInfo(HookBaseClass):
         processed_names = {}
 
         # examine the files in the folder
-        for filename in os.listdir(folder):
-            file_path = os.path.join(folder, filename)
+        for (filename, entry_type) in publisher.util.list_folder(folder):
 
-            if os.path.isdir(file_path):
+            if entry_type == "folder":
                 # ignore subfolders
                 continue
 
+            file_path = os.path.join(folder, filename)
+
             # see if there is a frame number
             frame_pattern_match = re.search(FRAME_REGEX, filename)
 
@@ -489,7 +540,7 @@ class BasicPathInfo(HookBaseClass):
 
         # default
         next_version_path = None
-        path_template = self.sgtk.template_from_path(path)
+        path_template = publisher.util.get_template_from_path(path)
 
         if path_template:
             # if the path fits a template, use that and increment the version field
@@ -14,6 +14,7 @@ import os
 from .api import PublishManager
 from . import base_hooks
 from . import util
+from .deferred import get_deferred_registration_queue
 
 
 def _handle_sgtk_publish_preload_path(app, sgtk_publish_preload_path, PRELOAD_SIGNALER):
@@ -8,6 +8,11 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
+from .cancellation import (
+    CancellationToken,
+    PublishCancelledError,
+    PublishTimeoutError,
+)
 from .data import PublishData
 from .manager import PublishManager
 from .item import PublishItem
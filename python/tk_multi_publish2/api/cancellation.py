@@ -0,0 +1,144 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import threading
+import time
+
+import sgtk
+
+logger = sgtk.platform.get_logger(__name__)
+
+
+class PublishCancelledError(sgtk.TankError):
+    """
+    Raised when the processing of a publish phase has been cancelled.
+    """
+
+
+class PublishTimeoutError(PublishCancelledError):
+    """
+    Raised when a publish task exceeds its configured hard timeout.
+    """
+
+
+class CancellationToken(object):
+    """
+    Cooperative cancellation of the publish phases.
+
+    A token can be supplied to the :meth:`~PublishManager.validate`,
+    :meth:`~PublishManager.publish` and :meth:`~PublishManager.finalize`
+    methods of the :ref:`publish-api-manager`. Calling :meth:`cancel`, from any
+    thread, stops the processing before the next task.
+
+    While a task is running, publish plugins can access the token for the
+    task via :attr:`~PublishItem.cancellation_token` and check it regularly
+    during long running operations:
+
+    .. code-block:: python
+
+        def publish(self, settings, item):
+
+            for path in item.properties.sequence_paths:
+                # raises if the publish was cancelled or timed out
+                item.cancellation_token.raise_if_cancelled()
+                self._copy_frame(path)
+
+    Each task runs with its own token, derived from the token supplied to the
+    manager, which also expires once the plugin's hard timeout has elapsed.
+    """
+
+    def __init__(self, parent=None, timeout=None):
+        """
+        :param parent: An optional parent :class:`CancellationToken`. The token
+            is cancelled when its parent is.
+        :param float timeout: An optional number of seconds after which the
+            token is considered timed out.
+        """
+        self._parent = parent
+        self._timeout = timeout
+        self._deadline = time.time() + timeout if timeout else None
+        self._timed_out = False
+        self._reason = None
+        self._event = threading.Event()
+
+    def cancel(self, reason=None):
+        """
+        Cancels the token.
+
+        :param str reason: An optional reason for the cancellation, used as the
+            message of the raised :class:`PublishCancelledError`.
+        """
+        if not self._event.is_set():
+            self._reason = reason or "Processing cancelled."
+            self._event.set()
+
+    @property
+    def is_cancelled(self):
+        """
+        ``True`` if the token, or its parent, has been cancelled or if its
+        timeout has elapsed.
+        """
+        if self._event.is_set():
+            return True
+
+        if self._deadline is not None and time.time() >= self._deadline:
+            self._timed_out = True
+            self.cancel("Timed out after %s seconds." % (self._timeout,))
+        elif self._parent and self._parent.is_cancelled:
+            self._timed_out = self._parent.timed_out
+            self.cancel(self._parent.reason)
+
+        return self._event.is_set()
+
+    @property
+    def timed_out(self):
+        """
+        ``True`` if the token was cancelled because a timeout elapsed.
+        """
+        return self.is_cancelled and self._timed_out
+
+    @property
+    def reason(self):
+        """
+        The reason for the cancellation, ``None`` if the token has not been
+        cancelled.
+        """
+        return self._reason
+
+    def raise_if_cancelled(self):
+        """
+        Raises if the token has been cancelled.
+
+        :raises: :class:`PublishTimeoutError` if a timeout elapsed,
+            :class:`PublishCancelledError` otherwise.
+        """
+        if self.is_cancelled:
+            if self._timed_out:
+                raise PublishTimeoutError(self._reason)
+            raise PublishCancelledError(self._reason)
+
+    def wait(self, seconds):
+        """
+        Sleeps for the supplied number of seconds, returning early if the
+        token is cancelled in the meantime.
+
+        :param float seconds: The number of seconds to sleep for.
+
+        :returns: ``True`` if the token has been cancelled, ``False`` otherwise.
+        """
+        end_time = time.time() + seconds
+        while not self.is_cancelled:
+            remaining = end_time - time.time()
+            if remaining <= 0:
+                break
+            # wake up regularly to check the parent and the deadline
+            self._event.wait(min(remaining, 0.1))
+
+        return self.is_cancelled
@@ -12,8 +12,14 @@ import collections
 import sgtk
 import copy
 
+from ..util import FrameSequence
+
 logger = sgtk.platform.get_logger(__name__)
 
+# key used to store the lazy value providers in the instance's dictionary. It
+# is never exposed as a key of the mapping.
+_LAZY_PROVIDERS_KEY = "_PublishData__lazy_providers"
+
 
 class PublishData(collections.MutableMapping):
     """
@@ -38,7 +44,13 @@ class PublishData(collections.MutableMapping):
 
         :return: A :class:`~PublishData` instance.
         """
-        return cls(**data)
+        return cls(
+            **dict(
+                (key, FrameSequence.from_dict(value))
+                if FrameSequence.is_serialized(value) else (key, value)
+                for (key, value) in data.iteritems()
+            )
+        )
 
     def __init__(self, **kwargs):
         """
@@ -53,23 +65,125 @@ class PublishData(collections.MutableMapping):
         Returns a dictionary representation of the :class:`~PublishData`
         instance.
 
-        Each item stored in the instance will be serialized.
+        Each item stored in the instance will be serialized. Values registered
+        via :meth:`set_lazy` which haven't been resolved yet are skipped, their
+        providers are not called.
 
         :return: A dictionary representing the data stored on the instance.
         """
-        return copy.deepcopy(self.__dict__)
+        return copy.deepcopy(
+            dict(
+                (key, value) for (key, value) in self.__dict__.iteritems()
+                if key != _LAZY_PROVIDERS_KEY
+            )
+        )
+
+    def set_lazy(self, key, provider):
+        """
+        Registers a provider for a value that is expensive to compute.
+
+        The provider is called, without arguments, the first time the key is
+        accessed via dict syntax or dot notation. The returned value is then
+        stored on the instance and the provider is discarded. Until it is
+        resolved, the key is reported as being set but is not serialized by
+        :meth:`to_dict`.
+
+        Providers are stored on the instance, they should not hold strong
+        references to the object owning it, such as the item whose properties
+        they compute, as it would create a reference cycle.
+
+        Registering a provider replaces any value currently stored for the key.
+        Assigning a value to the key discards the provider.
+
+        :param str key: The key to register the provider for.
+        :param provider: A callable returning the value for the key.
+        """
+        self.__dict__.pop(key, None)
+        self.__dict__.setdefault(_LAZY_PROVIDERS_KEY, {})[key] = provider
+
+    def is_resolved(self, key):
+        """
+        Returns ``True`` if a value is stored for the supplied key, ``False``
+        if the key is only backed by a provider registered via
+        :meth:`set_lazy` that hasn't been called yet.
+
+        :param str key: The key to check.
+
+        :raises: ``KeyError`` if the key is not set.
+        """
+        if key in self.__dict__ and key != _LAZY_PROVIDERS_KEY:
+            return True
+        if key in self.__providers:
+            return False
+        raise KeyError(key)
+
+    @property
+    def __providers(self):
+        """The providers registered for unresolved keys."""
+        return self.__dict__.get(_LAZY_PROVIDERS_KEY, {})
+
+    def __resolve(self, key):
+        """
+        Calls the provider registered for the supplied key and stores the
+        returned value.
+        """
+        value = self.__providers[key]()
+        self.__dict__[key] = value
+        self.__providers.pop(key, None)
+        return value
+
+    def __getattr__(self, name):
+        # only called when the attribute was not found the usual way. resolve
+        # any lazy value registered for the name.
+        if name in self.__providers:
+            return self.__resolve(name)
+        raise AttributeError(
+            "'%s' object has no attribute '%s'" % (self.__class__.__name__, name)
+        )
+
+    def __setattr__(self, name, value):
+        # assigning an attribute is the same as assigning the key, discard any
+        # lazy value registered for it.
+        self.__providers.pop(name, None)
+        self.__dict__[name] = value
+
+    def __delattr__(self, name):
+        try:
+            del self[name]
+        except KeyError:
+            raise AttributeError(name)
 
     def __setitem__(self, key, value):
+        self.__providers.pop(key, None)
         self.__dict__[key] = value
 
     def __getitem__(self, key):
-        return self.__dict__[key]
+        if key in self.__dict__:
+            return self.__dict__[key]
+        if key in self.__providers:
+            return self.__resolve(key)
+        raise KeyError(key)
 
     def __delitem__(self, key):
-        del self.__dict__[key]
+        if key in self.__providers:
+            del self.__providers[key]
+            self.__dict__.pop(key, None)
+        else:
+            del self.__dict__[key]
+
+    def __contains__(self, key):
+        # overridden to avoid resolving lazy values
+        if key == _LAZY_PROVIDERS_KEY:
+            return False
+        return key in self.__dict__ or key in self.__providers
 
     def __iter__(self):
-        return iter(self.__dict__)
+        for key in self.__dict__:
+            if key != _LAZY_PROVIDERS_KEY:
+                yield key
+        for key in self.__providers:
+            if key not in self.__dict__:
+                yield key
 
     def __len__(self):
-        return len(self.__dict__)
+        return sum(1 for _ in self)
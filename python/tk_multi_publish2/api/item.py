@@ -66,7 +66,9 @@ class PublishItem(object):
     __slots__ = [
         "_active",
         "_allows_context_change",
+        "_cancellation_token",
         "_children",
+        "_collected_callback",
         "_collector",
         "_context",
         "_created_temp_files",
@@ -87,7 +89,9 @@ class PublishItem(object):
         "_thumbnail_path",
         "_thumbnail_pixmap",
         "_type_display",
-        "_type_spec"
+        "_type_spec",
+        # lazy property providers reference their item weakly
+        "__weakref__",
     ]
 
     @classmethod
@@ -183,7 +187,9 @@ class PublishItem(object):
 
         self._active = True
         self._allows_context_change = True
+        self._cancellation_token = None
         self._children = []
+        self._collected_callback = None
         self._collector = collector
         self._context = None
         self._created_temp_files = []
@@ -369,6 +375,74 @@ class PublishItem(object):
 
         return child_item
 
+    def create_items(self, item_specs, collector):
+        """
+        Factory method for generating many child items in a single pass.
+
+        This is the bulk equivalent of :meth:`~PublishItem.create_item` and is
+        intended for collectors that create large numbers of items at once, an
+        ingest of a folder containing thousands of sequences for example.
+
+        Each entry in ``item_specs`` is a tuple of the form::
+
+            (type_spec, type_display, name, properties, context)
+
+        where ``properties`` is a dict of initial properties for the item (or
+        ``None``) and ``context`` is the :class:`sgtk.Context` to assign to the
+        item (or ``None`` to use this item's context).
+
+        Unlike :meth:`~PublishItem.create_item`, the tasks for the new items are
+        not refreshed as each item is created. Contexts that compare equal are
+        shared between the new items, the collector is notified of the context
+        of each item, and the publish plugins are then attached to all of the
+        new items at once, grouped by context and ``type_spec``.
+
+        :param item_specs: An iterable of item specification tuples.
+        :param collector: The collector plugin instance creating the items.
+
+        :returns: A list of the created :ref:`publish-api-item` instances, in
+            the order of the supplied specifications.
+        """
+
+        publish_manager = collector.manager
+
+        # contexts that compare equal are shared by all of the new items. the
+        # context repr is used as the key, as is done by the plugins cache.
+        shared_contexts = {}
+        parent_context = self.context
+
+        new_items = []
+        for (type_spec, type_display, name, properties, context) in item_specs:
+
+            context = context or parent_context
+            context = shared_contexts.setdefault(repr(context), context)
+
+            # create the item without a parent or context to prevent the
+            # per-item task refresh that happens when the context is set.
+            child_item = PublishItem(
+                name,
+                type_spec,
+                type_display,
+                collector,
+                None,
+                properties or {}
+            )
+            child_item._parent = self
+            child_item._context = context
+            new_items.append(child_item)
+
+        self._children.extend(new_items)
+
+        # let the collector for each context update the item properties
+        for item in new_items:
+            context_collector = publish_manager.load_collector(item.context)
+            context_collector.run_on_context_changed(item)
+
+        # attach the plugins to all of the new items at once
+        publish_manager._attach_plugins(new_items)
+
+        return new_items
+
     def get_property(self, name, default_value=None):
         """
         This is a convenience method that will retrieve a property set on the
@@ -444,6 +518,22 @@ class PublishItem(object):
             )
             return None
 
+    def notify_items_collected(self, items):
+        """
+        Notifies the publisher that the supplied items, created under this
+        item, are collected.
+
+        Collectors creating many items for a single path, such as when
+        ingesting a folder tree, can call this method on the parent item they
+        are supplied with once each batch of items is fully created, for the
+        items to be displayed before the collection of the path completes.
+        Does nothing outside of the collection of files.
+
+        :param list items: The collected :ref:`publish-api-item` instances.
+        """
+        if self._collected_callback and items:
+            self._collected_callback(items)
+
     def remove_item(self, child_item):
         """
         Remove the supplied child :ref:`publish-api-item` of this item.
@@ -608,6 +698,20 @@ class PublishItem(object):
             for sub_c in c.descendants:
                 yield sub_c
 
+    @property
+    def cancellation_token(self):
+        """
+        The :class:`~.api.CancellationToken` of the task currently processing
+        the item, ``None`` outside of the validate, publish and finalize phases.
+
+        Publish plugins can check the token during long running operations to
+        stop processing when the publish is cancelled or the task times out.
+
+        While files are collected, the token of the collection is available on
+        the parent item supplied to the collector.
+        """
+        return self._cancellation_token
+
     @property
     def collector(self):
         """
@@ -644,14 +748,23 @@ class PublishItem(object):
         if not self.context_change_allowed:
             raise AttributeError("Context change for item '%s' not allowed." % self.name)
 
+        # assigning the context the item already has, such as its parent's
+        # context when it is created, keeps the memoized accept results.
+        context_changed = self.context != item_context
+
         self._context = item_context
 
         # Process any associated tasks or child items as well
-        self._set_context_r(item_context)
+        self._set_context_r(item_context, context_changed)
 
-    def _set_context_r(self, context):
+    def _set_context_r(self, context, context_changed=True):
         """
         Update context for item, plus any associated tasks or child items
+
+        :param context: The new context of the item.
+        :param bool context_changed: ``True`` if the context differs from the
+            one the item had before, in which case the accept results memoized
+            for the item's key in the new context are discarded.
         """
         publish_manager = self._collector.manager
 
@@ -662,19 +775,32 @@ class PublishItem(object):
         collector.run_on_context_changed(self)
 
         # Next re-initialize the item's list of tasks
-        self.refresh_tasks(context, publish_manager)
+        self._refresh_tasks(context, publish_manager, context_changed)
 
         # Now traverse down the hierarchy and apply to all children
         for child in self.children:
             # If the child's context is not explicitly set,
             # then we need to update it as well
             if not child._context:
-                child._set_context_r(context)
+                child._set_context_r(context, context_changed)
 
     def refresh_tasks(self, context, publish_manager):
         """
         Refresh the list of tasks for this item based on the provided Context object
         """
+        self._refresh_tasks(context, publish_manager)
+
+    def _refresh_tasks(self, context, publish_manager, discard_accept_results=False):
+        """
+        Refresh the list of tasks for this item based on the provided Context
+        object.
+
+        :param context: The context to load the publish plugins for.
+        :param publish_manager: The publish manager loading the plugins.
+        :param bool discard_accept_results: If ``True``, the accept results
+            memoized for the item's key are discarded before the new tasks are
+            accepted.
+        """
         # Get the list of publish plugins for this context
         context_plugins = publish_manager.load_publish_plugins(context)
         logger.debug(
@@ -682,20 +808,49 @@ class PublishItem(object):
         )
 
         # Run the Item's filters on this list
+        valid_plugins = self._get_matching_plugins(context_plugins)
+
+        # Replace the current list of tasks
+        self._set_tasks(valid_plugins, discard_accept_results)
+
+    def _get_matching_plugins(self, publish_plugins):
+        """
+        Returns the subset of the supplied publish plugins whose item filters
+        match this item's type specification.
+
+        :param publish_plugins: A list of publish plugin instances to filter.
+        """
         valid_plugins = []
-        for context_plugin in context_plugins:
+        for publish_plugin in publish_plugins:
 
-            logger.debug("Checking plugin: %s" % (context_plugin,))
-            if self._filters_match(context_plugin):
-                valid_plugins.append(context_plugin)
+            logger.debug("Checking plugin: %s" % (publish_plugin,))
+            if self._filters_match(publish_plugin):
+                valid_plugins.append(publish_plugin)
 
+        return valid_plugins
+
+    def _set_tasks(self, publish_plugins, discard_accept_results=False):
+        """
+        Clears the current list of tasks and creates, then accepts, a new task
+        for each of the supplied publish plugins.
+
+        :param publish_plugins: A list of publish plugin instances.
+        :param bool discard_accept_results: If ``True``, the accept results
+            memoized for the item's key are discarded before the new tasks are
+            accepted.
+        """
         # Clear the current list of tasks
         self._tasks = []
-        for plugin in valid_plugins:
+        for plugin in publish_plugins:
 
             # Create a new task for this Item
             task = self.add_task(plugin)
 
+            # Memoized accept results may no longer hold for the item once its
+            # context has changed
+            if discard_accept_results:
+                plugin.discard_accept_result(task.settings, self)
+
             # Run task acceptance
             logger.debug("Running task acceptance method...")
             task.accept()
@@ -8,12 +8,23 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
+from collections import OrderedDict
+from contextlib import contextmanager
+import sys
+
 import sgtk
 
 from .tree import PublishTree
 from .plugins import CollectorPluginInstance, PublishPluginInstance
 from .plugins import setting
-from ..util import Threaded
+from ..registration import RegistrationError, RegistrationQueue
+from ..upload import get_upload_queue
+from ..context_cache import get_context_cache
+from ..path_analysis import get_path_analysis_cache
+from ..publish_cache import get_conflicting_publishes_cache, get_published_files_cache
+from ..schema import get_schema_cache
+from ..shotgun_pool import get_call_stats, get_shotgun_pool
+from ..util import Threaded, get_directory_listing_cache
 
 logger = sgtk.platform.get_logger(__name__)
 
@@ -60,7 +71,8 @@ class PublishManager(object):
         "_tree",
         "_collector_instance",
         "_plugins_cache",
-        "_post_phase_hook"
+        "_post_phase_hook",
+        "_registration_queue",
     ]
 
     ############################################################################
@@ -96,6 +108,9 @@ class PublishManager(object):
         # the current bundle (the publisher instance)
         self._bundle = sgtk.platform.current_bundle()
 
+        # record the Shotgun calls issued through the publisher's connection
+        get_call_stats().instrument(self._bundle.shotgun)
+
         # a logger to be used by the various collector/publish plugins
         self._logger = publish_logger or logger
 
@@ -108,6 +123,9 @@ class PublishManager(object):
         # a lookup of context to publish plugins.
         self._plugins_cache = PluginsCache()
 
+        # the publishes queued for registration by the publish plugins
+        self._registration_queue = RegistrationQueue()
+
         # initialize the collector plugin
         logger.debug("Loading collector plugin...")
         self._collector_instance = self.load_collector(self._bundle.context)
@@ -125,7 +143,7 @@ class PublishManager(object):
             base_class=self._bundle.base_hooks.PostPhaseHook
         )
 
-    def collect_files(self, file_paths):
+    def collect_files(self, file_paths, cancellation_token=None, collected_callback=None):
         """
         Run the collection logic to populate the publish tree with items for
         each supplied path.
@@ -135,15 +153,34 @@ class PublishManager(object):
         :ref:`publish-api-item` instances accordingly, each of which will be
         marked as :py:attr:`~.api.PublishItem.persistent`.
 
+        While a path is processed, the supplied cancellation token is available
+        to the collector via the :py:attr:`~.api.PublishItem.cancellation_token`
+        of the parent item, for long running collections to be stopped. Items
+        collected before the cancellation are kept.
+
         :param list file_paths: A list of file paths to collect as items to
             publish.
+        :param cancellation_token: An optional :class:`CancellationToken`.
+            Once cancelled, no more paths are collected.
+        :param collected_callback: An optional callable accepting a list of
+            items, called with the items the collector reports while a path is
+            collected, see :meth:`~.api.PublishItem.notify_items_collected`.
+            Allows the items to be displayed before the collection completes.
         :returns: A list of the created :ref:`publish-api-item` instances.
         """
 
         new_items = []
 
+        # paths may have been created or removed on disk since the previous
+        # collection, analyze them again
+        get_path_analysis_cache().clear()
+
         for file_path in file_paths:
 
+            if cancellation_token and cancellation_token.is_cancelled:
+                logger.debug("Collection cancelled: %s" % (cancellation_token.reason,))
+                break
+
             # get a list of all items in the tree prior to collection
             items_before = list(self.tree)
 
@@ -157,10 +194,17 @@ class PublishManager(object):
 
                 # we supply the root item of the tree for parenting of items
                 # that are collected.
-                self._collector_instance.run_process_file(
-                    self.tree.root_item,
-                    file_path
-                )
+                root_item = self.tree.root_item
+                root_item._cancellation_token = cancellation_token
+                root_item._collected_callback = collected_callback
+                try:
+                    self._collector_instance.run_process_file(
+                        root_item,
+                        file_path
+                    )
+                finally:
+                    root_item._cancellation_token = None
+                    root_item._collected_callback = None
 
             # get a list of all items in the tree after collection
             items_after = list(self.tree)
@@ -205,6 +249,9 @@ class PublishManager(object):
         # this will clear the tree of all non-persistent items.
         self.tree.clear(clear_persistent=False)
 
+        # a new publish session, start from fresh caches
+        self._clear_session_caches()
+
         # get a list of all items in the tree prior to collection (this should
         # be only the persistent items)
         items_before = list(self.tree)
@@ -242,7 +289,7 @@ class PublishManager(object):
         """
         self._tree.save_file(path)
 
-    def _process_tasks(self, task_generator, task_cb):
+    def _process_tasks(self, task_generator, task_cb, cancellation_token=None):
         """
         Processes tasks returned by the generator and invokes the passed in
         callback on each. The result of the task callback will be forwarded back
@@ -253,6 +300,8 @@ class PublishManager(object):
             The signature is
             def task_cb(task):
                 ...
+        :param cancellation_token: An optional :class:`CancellationToken`. Once
+            cancelled, no more tasks are processed.
         """
         # calling code can supply its own generator for tasks to process. if not
         # supplied, we'll use our own generator.
@@ -269,7 +318,16 @@ class PublishManager(object):
         # now begin iterating over tasks supplied by the generator
         while task:
 
-            return_value = task_cb(task)
+            if cancellation_token and cancellation_token.is_cancelled:
+                logger.info(
+                    "Processing cancelled: %s" % (cancellation_token.reason,)
+                )
+                break
+
+            # custom generators may yield task-like objects without a plugin
+            plugin_name = getattr(getattr(task, "plugin", None), "name", None)
+            with get_call_stats().scope(plugin=plugin_name):
+                return_value = task_cb(task)
 
             # send the return_value and get the next task. this is a bit annoying
             # since send() returns the next value of the generator. which is why
@@ -279,7 +337,7 @@ class PublishManager(object):
             except StopIteration:
                 break
 
-    def validate(self, task_generator=None):
+    def validate(self, task_generator=None, cancellation_token=None, tasks=None):
         """
         Validate items to be published.
 
@@ -308,7 +366,24 @@ class PublishManager(object):
 
             publish_manager.validate(task_generator=all_tasks_generator)
 
+        Validation can be stopped before the next task by cancelling the
+        supplied :class:`CancellationToken`. A task exceeding its plugin's hard
+        timeout is reported as failed with a :class:`PublishTimeoutError`.
+
+        Before the validation pass, the
+        :meth:`~.base_hooks.PublishPlugin.pre_validate` method of each plugin
+        is executed once with all of its tasks about to be validated, allowing
+        plugins to prepare the validation of many items at once. These are
+        all active tasks on active items, unless the ``tasks`` a custom
+        ``task_generator`` yields are supplied. The Shotgun values of the
+        template fields of the items' contexts are looked up once per distinct
+        context, see :class:`~.context_cache.ContextCache`.
+
         :param task_generator: A generator of :class:`~PublishTask` instances.
+        :param cancellation_token: An optional :class:`CancellationToken`.
+        :param list tasks: The :class:`~PublishTask` instances yielded by the
+            supplied ``task_generator``, for the pre validation of their
+            plugins. Defaults to all active tasks on active items.
 
         :returns: A list of tuples of (:class:`~PublishTask`,
             optional :class:`Exception`) that failed to validate.
@@ -324,7 +399,7 @@ class PublishManager(object):
             # the UI's generator to update the display of the task as it is
             # being processed.
             try:
-                is_valid = task.validate()
+                is_valid = task.validate(**_get_phase_kwargs(cancellation_token))
             except Exception, e:
                 is_valid = False
                 error = e
@@ -336,16 +411,33 @@ class PublishManager(object):
 
             return (is_valid, error)
 
-        self._process_tasks(task_generator, task_cb)
+        with self._record_shotgun_calls("validate"):
 
-        # execute the post validate method of the phase phase hook
-        self._post_phase_hook.post_validate(
-            self.tree,
-        )
+            # read the schema required to publish once for the whole session
+            get_schema_cache().prefetch(
+                [sgtk.util.get_published_file_entity_type(self._bundle.sgtk)]
+            )
+
+            # look the context data up again for this pass. it is kept for the
+            # following phases
+            get_context_cache().clear()
+
+            # results prefetched for the validation are only valid for this pass
+            self._clear_validation_caches()
+            try:
+                self._run_pre_phase("validate", tasks)
+                self._process_tasks(task_generator, task_cb, cancellation_token)
+            finally:
+                self._clear_validation_caches()
+
+            # execute the post validate method of the phase phase hook
+            self._post_phase_hook.post_validate(
+                self.tree,
+            )
 
         return failed_to_validate
 
-    def publish(self, task_generator=None):
+    def publish(self, task_generator=None, cancellation_token=None):
         """
         Publish items in the tree.
 
@@ -375,14 +467,45 @@ class PublishManager(object):
         If an exception is raised by one of the published task, the publishing
         is aborted and the exception is raised back to the caller.
 
+        Publishing can be stopped before the next task by cancelling the
+        supplied :class:`CancellationToken`. If a task is cancelled while
+        running, or exceeds its plugin's hard timeout, the plugin's
+        :meth:`~.base_hooks.PublishPlugin.undo` method is executed and a
+        :class:`PublishCancelledError` is raised back to the caller.
+
+        Publishes queued for registration by the tasks, via the
+        :attr:`registration_queue`, are registered once all tasks have been
+        processed, before the post publish hook is executed. A
+        :class:`~.registration.RegistrationError` is raised if any of them
+        failed to be registered.
+
         :param task_generator: A generator of :class:`~PublishTask` instances.
+        :param cancellation_token: An optional :class:`CancellationToken`.
         """
-        self._process_tasks(task_generator, lambda task: task.publish())
+        with self._record_shotgun_calls("publish"):
+            try:
+                self._process_tasks(
+                    task_generator,
+                    lambda task: task.publish(**_get_phase_kwargs(cancellation_token)),
+                    cancellation_token
+                )
+            except Exception:
+                # the publishes queued by the tasks processed before the error
+                # are registered, as they would have been without the queue,
+                # but only the original error is raised
+                exc_info = sys.exc_info()
+                try:
+                    self.registration_queue.flush()
+                except RegistrationError, e:
+                    logger.debug("Failed to register queued publishes: %s" % (e,))
+                raise exc_info[0], exc_info[1], exc_info[2]
 
-        # execute the post publish method of the phase phase hook
-        self._post_phase_hook.post_publish(self.tree)
+            self.registration_queue.flush()
 
-    def finalize(self, task_generator=None):
+            # execute the post publish method of the phase phase hook
+            self._post_phase_hook.post_publish(self.tree)
+
+    def finalize(self, task_generator=None, cancellation_token=None, tasks=None):
         """
         Finalize items in the tree.
 
@@ -412,18 +535,96 @@ class PublishManager(object):
         If an exception is raised by one of the finalized task, the finalization
         is aborted and the exception is raised back to the caller.
 
+        Finalization can be stopped before the next task by cancelling the
+        supplied :class:`CancellationToken`.
+
+        Before the finalize pass, the
+        :meth:`~.base_hooks.PublishPlugin.pre_finalize` method of each plugin
+        is executed once with all of its tasks about to be finalized, allowing
+        plugins to finalize many items at once. These are all active tasks on
+        active items, unless the ``tasks`` a custom ``task_generator`` yields
+        are supplied.
+
+        Files queued for upload for the items of the tree, via the
+        :attr:`upload_queue`, and not waited for by the finalized tasks are
+        waited for once all tasks have been processed, before the post
+        finalize hook is executed.
+        A :class:`~.upload.UploadError` is raised if any of them failed to
+        upload.
+
         :param task_generator: A generator of :class:`~PublishTask` instances.
-        """
-        self._process_tasks(task_generator, lambda task: task.finalize())
+        :param cancellation_token: An optional :class:`CancellationToken`.
+        :param list tasks: The :class:`~PublishTask` instances yielded by the
+            supplied ``task_generator``, for the pre finalization of their
+            plugins. Defaults to all active tasks on active items.
+        """
+        with self._record_shotgun_calls("finalize"):
+            self._run_pre_phase("finalize", tasks)
+            self._process_tasks(
+                task_generator,
+                lambda task: task.finalize(**_get_phase_kwargs(cancellation_token)),
+                cancellation_token
+            )
+
+            # the queue is shared with other managers and deferred replays
+            self.upload_queue.wait(
+                self.upload_queue.get_jobs(self.tree.root_item, *self.tree)
+            )
 
-        # execute the post finalize method of the phase phase hook
-        self._post_phase_hook.post_finalize(self.tree)
+            # execute the post finalize method of the phase phase hook
+            self._post_phase_hook.post_finalize(self.tree)
 
     @property
     def context(self):
         """Returns the execution context of the manager."""
         return self._bundle.context
 
+    @property
+    def registration_queue(self):
+        """
+        The :class:`~.registration.RegistrationQueue` publish plugins can
+        queue the registration of their publishes with during the publish
+        phase. It is flushed at the end of the :meth:`publish` pass. Each
+        manager owns its queue, publishing the tree of a manager never
+        registers the publishes queued by another.
+        """
+        return self._registration_queue
+
+    @property
+    def upload_queue(self):
+        """
+        The :class:`~.upload.UploadQueue` publish plugins can queue the upload
+        of files to Shotgun with, to be processed in the background. The
+        uploads of the items of the tree are waited for at the end of the
+        :meth:`finalize` pass.
+        """
+        return get_upload_queue()
+
+    @property
+    def stats(self):
+        """
+        A dictionary of statistics on the publish session, for profiling and
+        regression testing:
+
+        - ``shotgun_calls``: The Shotgun calls issued during the last run of
+          each phase, keyed by phase name, then plugin name, then category,
+          as returned by :attr:`~.shotgun_pool.ShotgunCallStats.stats`. Calls issued
+          outside of any plugin are recorded with a ``None`` plugin name.
+        - ``shotgun_pool``: The statistics of the connection pool, see
+          :attr:`~.shotgun_pool.ShotgunPool.stats`.
+        - ``registration``: The statistics of the :attr:`registration_queue`.
+        - ``uploads``: The statistics of the :attr:`upload_queue`.
+        - ``contexts``: The statistics of the context cache, see
+          :attr:`~.context_cache.ContextCache.stats`.
+        """
+        return {
+            "shotgun_calls": get_call_stats().stats,
+            "shotgun_pool": get_shotgun_pool().stats,
+            "registration": self.registration_queue.stats,
+            "uploads": self.upload_queue.stats,
+            "contexts": get_context_cache().stats,
+        }
+
     @property
     def logger(self):
         """
@@ -461,10 +662,37 @@ class PublishManager(object):
         For each item supplied, given it's context, load the appropriate plugins
         and add any matching tasks. If any tasks exist on the supplied items,
         they will be removed.
+
+        Items are grouped by context and type spec so that the publish plugins
+        are loaded and filtered only once per group.
         """
+        groups = OrderedDict()
         for item in items:
-            logger.debug("Processing item: %s" % (item,))
-            item.refresh_tasks(item.context, self)
+            context = item.context
+            group_key = (repr(context), item.type_spec)
+            groups.setdefault(group_key, (context, []))[1].append(item)
+
+        for (context, group_items) in groups.itervalues():
+
+            logger.debug(
+                "Processing %s items of type '%s'..." %
+                (len(group_items), group_items[0].type_spec)
+            )
+
+            # all items in the group share the same type spec, so the plugin
+            # filters only need to be evaluated for the first item.
+            context_plugins = self.load_publish_plugins(context)
+            valid_plugins = group_items[0]._get_matching_plugins(context_plugins)
+
+            for item in group_items:
+                logger.debug("Processing item: %s" % (item,))
+                item._set_tasks(valid_plugins)
+
+            for plugin in valid_plugins:
+                logger.debug(
+                    "Accept cache stats for %s: %s" %
+                    (plugin, plugin.accept_cache_stats)
+                )
 
     def load_collector(self, context):
         """
@@ -546,6 +774,91 @@ class PublishManager(object):
         # no existing, persistent item was collected with this path
         return False
 
+    def _clear_session_caches(self):
+        """
+        Discards the data cached by the publisher's services during the
+        previous publish session: folder listings, path analysis, context data
+        and Shotgun schemas.
+        """
+        get_directory_listing_cache().clear()
+        get_path_analysis_cache().clear()
+        get_context_cache().clear()
+        get_schema_cache().clear()
+
+    def _clear_validation_caches(self):
+        """
+        Discards the publishes cached by the publisher's services during a
+        validation pass, which are only valid for that pass.
+        """
+        get_conflicting_publishes_cache().clear()
+        get_published_files_cache().clear()
+
+    def _run_pre_phase(self, phase, tasks=None):
+        """
+        Executes the pre phase method of each publish plugin with all of its
+        supplied tasks.
+
+        :param str phase: The phase about to be executed, ``validate`` or
+            ``finalize``.
+        :param list tasks: The tasks about to be processed. Defaults to all
+            active tasks on active items in the tree, as processed by the
+            default task generator.
+        """
+        if tasks is None:
+            tasks = [
+                task for item in self.tree if item.active
+                for task in item.tasks if task.active
+            ]
+
+        plugins = []
+        plugin_tasks = {}
+        for task in tasks:
+            if task.plugin not in plugin_tasks:
+                plugins.append(task.plugin)
+                plugin_tasks[task.plugin] = []
+            plugin_tasks[task.plugin].append((task.settings, task.item))
+
+        for plugin in plugins:
+            logger.debug(
+                "Preparing %s of %s tasks for %s..." %
+                (phase, len(plugin_tasks[plugin]), plugin)
+            )
+            with get_call_stats().scope(plugin=plugin.name):
+                getattr(plugin, "run_pre_%s" % (phase,))(plugin_tasks[plugin])
+
+    @contextmanager
+    def _record_shotgun_calls(self, phase):
+        """
+        Context manager recording the Shotgun calls issued during the supplied
+        phase, replacing those of its previous run. A summary of the calls is
+        logged once the phase has been executed.
+
+        :param str phase: The name of the phase, ``validate``, ``publish`` or
+            ``finalize``.
+        """
+        call_stats = get_call_stats()
+        call_stats.clear(phase)
+        try:
+            with call_stats.scope(phase=phase):
+                yield
+        finally:
+            totals = call_stats.get_totals(phase=phase)
+            self.logger.debug(
+                "Issued %d Shotgun requests in %.2f seconds during %s." % (
+                    sum(total["count"] for total in totals.values()),
+                    sum(total["time"] for total in totals.values()),
+                    phase
+                ),
+                extra={
+                    "action_show_more_info": {
+                        "label": "Show Requests",
+                        "tooltip": "Show the Shotgun requests issued per plugin",
+                        "text": "<pre>%s</pre>" % (
+                            call_stats.format_report(phase=phase),)
+                    }
+                }
+            )
+
     def _task_generator(self):
         """
         This method generates all active tasks for all active items in the
@@ -579,3 +892,17 @@ class PublishManager(object):
 
                 status = (yield task)
                 logger.debug("Task %s status: %s" % (task, status))
+
+
+def _get_phase_kwargs(cancellation_token):
+    """
+    Returns the keyword arguments to supply to the phase methods of a task.
+
+    The token is only supplied when set so that task generators can keep
+    yielding task-like objects that don't accept it.
+
+    :param cancellation_token: A :class:`CancellationToken` or ``None``.
+    """
+    if cancellation_token is None:
+        return {}
+    return {"cancellation_token": cancellation_token}
@@ -15,6 +15,7 @@ import traceback
 import sgtk
 from .instance_base import PluginInstanceBase
 from .setting import *
+from ...util import process_events
 
 logger = sgtk.platform.get_logger(__name__)
 
@@ -69,8 +70,7 @@ class CollectorPluginInstance(PluginInstanceBase):
             )
         finally:
             if not sgtk.platform.current_engine().has_ui:
-                from sgtk.platform.qt import QtCore
-                QtCore.QCoreApplication.processEvents()
+                process_events()
 
     def run_process_current_session(self, item):
         """
@@ -98,8 +98,7 @@ class CollectorPluginInstance(PluginInstanceBase):
             )
         finally:
             if not sgtk.platform.current_engine().has_ui:
-                from sgtk.platform.qt import QtCore
-                QtCore.QCoreApplication.processEvents()
+                process_events()
 
     def run_on_context_changed(self, item):
         """
@@ -158,8 +157,7 @@ class CollectorPluginInstance(PluginInstanceBase):
                 self._logger.debug(success_msg)
         finally:
             if not sgtk.platform.current_engine().has_ui:
-                from sgtk.platform.qt import QtCore
-                QtCore.QCoreApplication.processEvents()
+                process_events()
 
 
 def _get_error_extra_info(error_msg):
@@ -15,6 +15,7 @@ import traceback
 import sgtk
 from .instance_base import PluginInstanceBase
 from .setting import *
+from ...util import process_events
 
 logger = sgtk.platform.get_logger(__name__)
 
@@ -38,6 +39,12 @@ class PublishPluginInstance(PluginInstanceBase):
 
         self._icon_pixmap = None
 
+        # accept results memoized by the key returned by the hook's
+        # accept_cache_key method
+        self._accept_cache = {}
+        self._accept_cache_hits = 0
+        self._accept_cache_misses = 0
+
         super(PublishPluginInstance, self).__init__(
             path,
             context,
@@ -193,8 +200,7 @@ class PublishPluginInstance(PluginInstanceBase):
             return {}
         finally:
             if not sgtk.platform.current_engine().has_ui:
-                from sgtk.platform.qt import QtCore
-                QtCore.QCoreApplication.processEvents()
+                process_events()
 
     @property
     def settings(self):
@@ -203,16 +209,52 @@ class PublishPluginInstance(PluginInstanceBase):
         """
         return self._settings
 
+    @property
+    def accept_cache_stats(self):
+        """
+        A dictionary of statistics about the memoization of accept results,
+        with the keys ``hits``, ``misses`` and ``size``.
+        """
+        return {
+            "hits": self._accept_cache_hits,
+            "misses": self._accept_cache_misses,
+            "size": len(self._accept_cache),
+        }
+
+    def clear_accept_cache(self):
+        """
+        Discards all memoized accept results.
+        """
+        self._accept_cache.clear()
+
+    def discard_accept_result(self, task_settings, item):
+        """
+        Discards the accept result memoized for the key of the given item, if
+        any.
+
+        :param item: Item to discard the memoized result for
+        """
+        cache_key = self._get_accept_cache_key(task_settings, item)
+        if cache_key is not None:
+            self._accept_cache.pop(cache_key, None)
+
     def run_accept(self, task_settings, item):
         """
         Executes the hook accept method for the given item
 
+        If the hook provides a key via ``accept_cache_key``, the result of a
+        previous call for the same key will be returned instead.
+
         :param item: Item to analyze
         :returns: dictionary with boolean keys accepted/visible/enabled/checked
         """
+        cache_key = self._get_accept_cache_key(task_settings, item)
+        if cache_key is not None and cache_key in self._accept_cache:
+            self._accept_cache_hits += 1
+            return dict(self._accept_cache[cache_key])
 
         try:
-            return self._hook_instance.accept(task_settings, item)
+            accept_data = self._hook_instance.accept(task_settings, item)
         except Exception:
             error_msg = traceback.format_exc()
             self._logger.error(
@@ -222,8 +264,67 @@ class PublishPluginInstance(PluginInstanceBase):
             return {"accepted": False}
         finally:
             if not sgtk.platform.current_engine().has_ui:
-                from sgtk.platform.qt import QtCore
-                QtCore.QCoreApplication.processEvents()
+                process_events()
+
+        if cache_key is not None:
+            self._accept_cache_misses += 1
+            self._accept_cache[cache_key] = dict(accept_data)
+
+        return accept_data
+
+    def _get_accept_cache_key(self, task_settings, item):
+        """
+        Returns the key used to memoize the accept result for the given item,
+        or ``None`` if the result should not be memoized.
+
+        :param item: Item to analyze
+        """
+        try:
+            cache_key = self._hook_instance.accept_cache_key(task_settings, item)
+            if cache_key is not None:
+                # make sure the key can actually be used
+                hash(cache_key)
+            return cache_key
+        except Exception:
+            error_msg = traceback.format_exc()
+            self._logger.warning(
+                "Error running accept_cache_key for %s" % self,
+                extra=_get_error_extra_info(error_msg)
+            )
+            return None
+
+    def run_pre_validate(self, tasks):
+        """
+        Executes the logic preparing the validation of many items for this
+        plugin instance.
+
+        :param tasks: List of ``(task_settings, item)`` tuples to prepare
+        """
+        try:
+            self._hook_instance.pre_validate(tasks)
+        except Exception:
+            # preparing the validation is an optimization only. the validation
+            # of each item will report any problem.
+            self.logger.debug(
+                "Error preparing validation for %s: %s" %
+                (self, traceback.format_exc())
+            )
+
+    def run_pre_finalize(self, tasks):
+        """
+        Executes the logic preparing the finalization of many items for this
+        plugin instance.
+
+        :param tasks: List of ``(task_settings, item)`` tuples to prepare
+        """
+        try:
+            self._hook_instance.pre_finalize(tasks)
+        except Exception:
+            # the finalization of each item will report any problem
+            self.logger.debug(
+                "Error preparing finalization for %s: %s" %
+                (self, traceback.format_exc())
+            )
 
     def run_validate(self, task_settings, item):
         """
@@ -269,6 +370,22 @@ class PublishPluginInstance(PluginInstanceBase):
         with self._handle_plugin_error("Finalize complete!", "Error finalizing: %s"):
             self._hook_instance.finalize(task_settings, item)
 
+    def run_undo(self, task_settings, item):
+        """
+        Executes the undo logic for this plugin instance.
+
+        Errors raised by the hook are logged but not raised, so that they don't
+        mask the error that caused the undo.
+
+        :param settings: Dictionary of settings
+        :param item: Item to analyze
+        """
+        try:
+            with self._handle_plugin_error("Undo complete!", "Error undoing: %s"):
+                self._hook_instance.undo(task_settings, item)
+        except Exception:
+            pass
+
     ############################################################################
     # ui methods
 
@@ -354,8 +471,7 @@ class PublishPluginInstance(PluginInstanceBase):
                 self._logger.debug(success_msg)
         finally:
             if not sgtk.platform.current_engine().has_ui:
-                from sgtk.platform.qt import QtCore
-                QtCore.QCoreApplication.processEvents()
+                process_events()
 
     def _load_plugin_icon(self):
         """
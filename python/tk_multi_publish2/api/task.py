@@ -8,7 +8,11 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
+from contextlib import contextmanager
+import time
+
 import sgtk
+from .cancellation import CancellationToken, PublishCancelledError, PublishTimeoutError
 from .plugins import PluginSetting, PublishPluginInstance
 
 logger = sgtk.platform.get_logger(__name__)
@@ -181,25 +185,112 @@ class PublishTask(object):
             self._enabled = False
             self._active = False
 
-    def publish(self):
+    def publish(self, cancellation_token=None):
         """
         Publish this Task
+
+        If the publish is cancelled or times out while the plugin is running,
+        the plugin's undo logic is executed before the error is raised.
+
+        :param cancellation_token: An optional :class:`CancellationToken`.
+
+        :raises: :class:`PublishTimeoutError` if the plugin's hard timeout
+            elapsed.
         """
-        self.plugin.run_publish(self.settings, self.item)
+        with self._cancellable(cancellation_token) as token:
+            try:
+                self.plugin.run_publish(self.settings, self.item)
+            except PublishCancelledError:
+                self.plugin.run_undo(self.settings, self.item)
+                raise
+
+            if token.timed_out:
+                self.plugin.run_undo(self.settings, self.item)
+                raise PublishTimeoutError(
+                    "Publish of '%s' aborted: %s" % (self.item.name, token.reason)
+                )
 
-    def finalize(self):
+    def finalize(self, cancellation_token=None):
         """
         Finalize this Task
+
+        :param cancellation_token: An optional :class:`CancellationToken`.
+
+        :raises: :class:`PublishTimeoutError` if the plugin's hard timeout
+            elapsed.
         """
-        self.plugin.run_finalize(self.settings, self.item)
+        with self._cancellable(cancellation_token) as token:
+            self.plugin.run_finalize(self.settings, self.item)
+
+            if token.timed_out:
+                raise PublishTimeoutError(
+                    "Finalize of '%s' aborted: %s" % (self.item.name, token.reason)
+                )
 
-    def validate(self):
+    def validate(self, cancellation_token=None):
         """
         Validate this Task
 
+        :param cancellation_token: An optional :class:`CancellationToken`.
+
         :returns: True if validation succeeded, False otherwise.
+
+        :raises: :class:`PublishTimeoutError` if the plugin's hard timeout
+            elapsed. The task should then be considered as having failed
+            validation.
+        """
+        with self._cancellable(cancellation_token) as token:
+            is_valid = self.plugin.run_validate(self.settings, self.item)
+
+            if token.timed_out:
+                raise PublishTimeoutError(
+                    "Validation of '%s' skipped: %s" % (self.item.name, token.reason)
+                )
+
+        return is_valid
+
+    @contextmanager
+    def _cancellable(self, cancellation_token):
+        """
+        Creates a scope in which the task's item exposes a
+        :class:`CancellationToken` derived from the supplied one and expiring
+        after the plugin's hard timeout.
+
+        A warning is reported if the scope lasts longer than the plugin's soft
+        timeout.
+
+        :param cancellation_token: An optional parent :class:`CancellationToken`.
+        """
+        soft_timeout = self._get_plugin_setting_value("Soft Timeout")
+        hard_timeout = self._get_plugin_setting_value("Hard Timeout")
+
+        token = CancellationToken(parent=cancellation_token, timeout=hard_timeout)
+        self._item._cancellation_token = token
+        start_time = time.time()
+        try:
+            yield token
+        finally:
+            self._item._cancellation_token = None
+
+            elapsed = time.time() - start_time
+            if soft_timeout and elapsed > soft_timeout and not token.timed_out:
+                self.plugin.logger.warning(
+                    "Plugin: '%s' took %.1f seconds to process '%s', exceeding "
+                    "its soft timeout of %s seconds." %
+                    (self.plugin.name, elapsed, self.item.name, soft_timeout)
+                )
+
+    def _get_plugin_setting_value(self, name):
+        """
+        Returns the value of the supplied plugin setting, or ``None`` if the
+        plugin doesn't define it.
+
+        :param str name: The name of the setting.
         """
-        return self.plugin.run_validate(self.settings, self.item)
+        setting = (self.plugin.settings or {}).get(name)
+        if setting is None:
+            return None
+        return setting.value
 
     @property
     def active(self):
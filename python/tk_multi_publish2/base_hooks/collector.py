@@ -244,6 +244,11 @@ class CollectorPlugin(PluginBase):
                 # an icon, populating the properties dictionary, etc.
                 session_item.properties["path"] = path
 
+        Implementations creating many items for a single path, such as when
+        ingesting a folder tree, can report each batch of items once created
+        via :meth:`~.api.PublishItem.notify_items_collected`, for them to be
+        displayed before the collection of the path completes.
+
         .. note:: See the hooks defined in the publisher app's ``hooks/`` folder
            for additional example implementations.
 
@@ -312,6 +317,54 @@ class CollectorPlugin(PluginBase):
         return item
 
 
+    def _add_items(self, settings, parent_item, item_specs):
+        """
+        Creates many generic items in a single pass
+
+        The bulk equivalent of :meth:`_add_item`. Items are created via
+        :meth:`~.api.PublishItem.create_items` so that plugins are attached to
+        all of the new items at once.
+
+        :param dict settings: Configured settings for this collector
+        :param parent_item: parent item instance
+        :param item_specs: A list of ``(item_name, item_type, context, properties)``
+            tuples, matching the arguments of :meth:`_add_item`
+
+        :returns: A list of the items that were created
+        """
+        publisher = self.parent
+
+        # the type info only needs to be resolved once per item type
+        item_infos = {}
+
+        create_specs = []
+        for (item_name, item_type, context, properties) in item_specs:
+
+            if item_type not in item_infos:
+                item_info = self._get_item_type_info(settings, item_type)
+                item_info["icon_path"] = publisher.expand_path(item_info["icon_path"])
+                item_infos[item_type] = item_info
+
+            create_specs.append(
+                (
+                    item_type,
+                    item_infos[item_type]["type_display"],
+                    item_name,
+                    properties,
+                    context
+                )
+            )
+
+        # create and populate the items
+        items = parent_item.create_items(create_specs, self.plugin)
+
+        # Set the icon paths
+        for item in items:
+            item.set_icon_from_path(item_infos[item.type_spec]["icon_path"])
+
+        return items
+
+
     def _get_item_type_info(self, settings, item_type):
         """
         Return the dictionary corresponding to this item's 'Item Types' settings.
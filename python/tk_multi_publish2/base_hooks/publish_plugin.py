@@ -8,14 +8,17 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
+import hashlib
 import os
-import stat
 import traceback
 import pprint
 import sgtk
 from sgtk.util import filesystem
 
 from .base import PluginBase
+from .. import deferred
+from .. import transfer
+from .. import upload
 
 class PublishPlugin(PluginBase):
     """
@@ -221,6 +224,88 @@ class PublishPlugin(PluginBase):
                     "A dict of plugin settings keyed by item type. Each entry in the dict "
                     "is itself a dict in which each item is the plugin attribute name and value."
                 ),
+            },
+            "Copy Threads": {
+                "type": "int",
+                "default_value": 1,
+                "description": (
+                    "The maximum number of files copied concurrently when "
+                    "publishing files, such as the frames of a sequence. "
+                    "Files are copied one at a time by default, higher values "
+                    "speed up the publish of sequences to network storage."
+                ),
+            },
+            "Transfer Mode": {
+                "type": "str",
+                "default_value": "copy",
+                "description": (
+                    "How files are transferred when publishing them. 'copy', "
+                    "the default, always copies the data of the files. 'auto' "
+                    "clones the files on file systems supporting copy-on-write, "
+                    "falling back to a copy. 'link' also hardlinks files to a "
+                    "publish location on the same device: the published files "
+                    "then share their data with the work files, which are made "
+                    "read-only along with them."
+                ),
+            },
+            "Checksum Algorithm": {
+                "type": "str",
+                "default_value": "",
+                "description": (
+                    "The name of a hashlib algorithm, such as md5 or sha1, used "
+                    "to compute the checksum of each published file while it "
+                    "is copied. The checksums are stored in the "
+                    "'publish_checksums' property of the item. Empty to "
+                    "disable checksums."
+                ),
+            },
+            "Verify Checksums": {
+                "type": "bool",
+                "default_value": False,
+                "description": (
+                    "Whether to verify the checksum of each copied file by "
+                    "reading it back from the publish location."
+                ),
+            },
+            "Resume Copies": {
+                "type": "bool",
+                "default_value": False,
+                "description": (
+                    "Whether to resume partial publishes. Published files "
+                    "identical to their source, based on their size and "
+                    "modification time and on their checksum if a checksum "
+                    "algorithm is defined, are not copied again. Files copied "
+                    "by a failed publish are kept for it to be resumed."
+                ),
+            },
+            "Batch Registration": {
+                "type": "bool",
+                "default_value": False,
+                "description": (
+                    "Whether to queue the registration of publishes in Shotgun "
+                    "until all tasks have been published, creating them in "
+                    "batches rather than one at a time. Plugins accessing the "
+                    "'sg_publish_data_list' property of an item during the "
+                    "publish phase register the queued publishes early."
+                ),
+            },
+            "Soft Timeout": {
+                "type": "int",
+                "default_value": 0,
+                "description": (
+                    "Number of seconds after which a warning is reported for a task "
+                    "still being processed by this plugin. 0 disables the timeout."
+                ),
+            },
+            "Hard Timeout": {
+                "type": "int",
+                "default_value": 0,
+                "description": (
+                    "Number of seconds after which a task processed by this plugin is "
+                    "cancelled. A task timing out is reported as failed during "
+                    "validation and aborts the publish, after undoing its work, during "
+                    "the publish phase. 0 disables the timeout."
+                ),
             }
         }
 
@@ -357,6 +442,80 @@ class PublishPlugin(PluginBase):
 
         return accept_data
 
+    def accept_cache_key(self, task_settings, item):
+        """
+        This method is called by the publisher before :meth:`accept` to allow
+        the acceptance result to be shared between similar items.
+
+        If a value other than ``None`` is returned, the result of
+        :meth:`accept` is memoized for that key and reused, without calling
+        :meth:`accept` again, for any other item returning an equal key. This
+        can greatly reduce the cost of collecting many items of the same type,
+        such as when dropping a large folder of files.
+
+        The key must be hashable and should capture everything the acceptance
+        logic depends on. The result memoized for the key of an item is
+        discarded when the item's context is changed.
+
+        The default implementation returns ``None`` which disables memoization.
+
+        Example implementation:
+
+        .. code-block:: python
+
+            def accept_cache_key(self, task_settings, item):
+
+                # acceptance only depends on the item type and whether a path
+                # was collected for the item
+                return (item.type, bool(item.properties.get("path")))
+
+        :param dict task_settings: The keys are strings, matching the keys returned
+            in the :data:`settings` property. The values are
+            :ref:`publish-api-setting` instances.
+        :param item: The :ref:`publish-api-item` instance to process for
+            acceptance.
+
+        :returns: A hashable key or ``None``.
+        """
+        return None
+
+    def pre_validate(self, tasks):
+        """
+        This method is called once by the publisher before the validation pass,
+        with all of the tasks of this plugin about to be validated.
+
+        It allows the plugin to prepare the validation of many items at once,
+        for example to query Shotgun for all of the items in a single request
+        rather than once per item in :meth:`validate`. Any data gathered should
+        be cached for :meth:`validate` to use. Errors are logged as debug
+        messages and are otherwise ignored, leaving :meth:`validate` to report
+        any issue for each item.
+
+        The default implementation does nothing.
+
+        Example implementation:
+
+        .. code-block:: python
+
+            def pre_validate(self, tasks):
+
+                publisher = self.parent
+
+                # find the conflicting publishes of all items at once
+                publisher.util.prefetch_conflicting_publishes(
+                    [
+                        (item.context, item.properties.path, item.name)
+                        for (task_settings, item) in tasks
+                    ]
+                )
+
+        :param list tasks: A list of ``(task_settings, item)`` tuples, where
+            ``task_settings`` is a dictionary of :ref:`publish-api-setting`
+            instances, as supplied to :meth:`validate`, and ``item`` the
+            :ref:`publish-api-item` instance to validate.
+        """
+        pass
+
     def validate(self, task_settings, item):
         """
         Validates the given item, ensuring it is ok to publish.
@@ -440,6 +599,26 @@ class PublishPlugin(PluginBase):
         """
         raise NotImplementedError
 
+    def pre_finalize(self, tasks):
+        """
+        This method is called once by the publisher before the finalize pass,
+        with all of the tasks of this plugin about to be finalized.
+
+        It allows the plugin to finalize many items at once, for example to
+        update the publishes of all the items in Shotgun with a single request
+        rather than once per item in :meth:`finalize`. Errors are logged as
+        debug messages and are otherwise ignored, leaving :meth:`finalize` to
+        process each item.
+
+        The default implementation does nothing.
+
+        :param list tasks: A list of ``(task_settings, item)`` tuples, where
+            ``task_settings`` is a dictionary of :ref:`publish-api-setting`
+            instances, as supplied to :meth:`finalize`, and ``item`` the
+            :ref:`publish-api-item` instance to finalize.
+        """
+        pass
+
     def finalize(self, task_settings, item):
         """
         Execute the finalize logic for the given item and settings.
@@ -650,50 +829,286 @@ class PublishPlugin(PluginBase):
     ############################################################################
     # protected helper methods
 
-    def _copy_files(self, src_files, dest_path, is_sequence=False):
+    def _copy_files(self, src_files, dest_path, is_sequence=False,
+                    progress_callback=None, cancellation_token=None, item=None,
+                    task_settings=None):
         """
         This method handles copying an item's path(s) to a designated location.
 
         If the item has "sequence_paths" set, it will attempt to copy all paths
         assuming they meet the required criteria.
+
+        The frame numbers of sequences are only parsed once and the files are
+        copied concurrently, using up to the number of threads defined by the
+        plugin's ``Copy Threads`` setting. Copies of all files are attempted
+        and any failures are reported together once they are done.
+
+        The strategy used to transfer each file, a hardlink, a clone or a
+        copy, depends on the plugin's ``Transfer Mode`` setting and on what
+        the file systems support.
+
+        If the plugin's ``Checksum Algorithm`` setting is defined, the checksum
+        of each file is computed as it is copied. The checksums are stored, in
+        the order of the files, in the ``publish_checksums`` property of the
+        supplied item, as returned by :func:`~.transfer.pack_checksums`.
+
+        If the plugin's ``Resume Copies`` setting is enabled, destination files
+        left identical to their source by a previous, partial, publish are not
+        copied again.
+
+        :param list src_files: The paths of the files to copy.
+        :param str dest_path: The destination path. For sequences, a path
+            containing a frame specification.
+        :param bool is_sequence: ``True`` if the files are the frames of a
+            sequence.
+        :param progress_callback: An optional callable accepting the number of
+            files copied so far and the total number of files to copy.
+        :param cancellation_token: An optional
+            :class:`~.api.CancellationToken` used to stop copying.
+        :param item: An optional :ref:`publish-api-item` to store the
+            checksums of the files on.
+        :param task_settings: The optional settings of the task the files are
+            copied for, overriding the plugin's settings.
+
+        :returns: A list of the copied destination files.
         """
+        jobs = transfer.get_transfer_jobs(src_files, dest_path, is_sequence)
+
+        file_transfer = transfer.FileTransfer(
+            max_workers=self._get_copy_threads(task_settings),
+            progress_callback=progress_callback,
+            cancellation_token=cancellation_token,
+            mode=self._get_transfer_mode(task_settings),
+            checksum_algorithm=self._get_checksum_algorithm(task_settings),
+            verify=self._get_setting_value("Verify Checksums", False, task_settings),
+            resume=self._get_setting_value("Resume Copies", False, task_settings)
+        )
+
+        processed_files = file_transfer.copy(jobs)
+
+        if item and file_transfer.checksum_algorithm:
+            item.properties.publish_checksums = transfer.pack_checksums(
+                file_transfer.checksum_algorithm,
+                [job.digest for job in jobs]
+            )
 
-        publisher = self.parent
+        self.logger.debug(
+            "Copied %d files to '%s' (%s)." % (
+                len(processed_files),
+                dest_path,
+                ", ".join(
+                    "%s: %d" % (strategy, count)
+                    for (strategy, count) in sorted(file_transfer.stats.items())
+                )
+            )
+        )
 
-        # ---- copy the src files to the dest location
-        processed_files = []
-        for src_file in src_files:
+        return processed_files
 
-            if is_sequence:
-                frame_num = publisher.util.get_frame_number(src_file)
-                dest_file = publisher.util.get_path_for_frame(dest_path, frame_num)
-            else:
-                dest_file = dest_path
 
-            # If the file paths are the same, lock permissions
-            if src_file == dest_file:
-                filesystem.freeze_permissions(dest_file)
-                continue
+    def _queue_publish_registration(self, item, publish_data, error_callback=None):
+        """
+        Queues the registration of a publish for the supplied item with the
+        publish manager's :class:`~.registration.RegistrationQueue`.
+
+        The publish depends on any publish queued for the parent item, whose
+        id will be added to its ``dependency_ids``. Once registered, at the
+        latest at the end of the publish phase, the publish is appended to the
+        item's ``sg_publish_data_list`` property.
+
+        :param item: The :ref:`publish-api-item` to register the publish for.
+        :param dict publish_data: The keyword arguments to supply to
+            ``sgtk.util.register_publish``.
+        :param error_callback: An optional callable accepting the
+            :class:`~.registration.RegistrationRequest`, called if the
+            registration failed.
+
+        :returns: The queued :class:`~.registration.RegistrationRequest`.
+        """
+        registration_queue = self.plugin.manager.registration_queue
+        return registration_queue.register_publish(
+            item,
+            publish_data,
+            dependencies=registration_queue.get_pending_requests(item.parent),
+            error_callback=error_callback
+        )
 
-            # copy the file
-            try:
-                dest_folder = os.path.dirname(dest_file)
-                filesystem.ensure_folder_exists(dest_folder)
-                filesystem.copy_file(src_file, dest_file,
-                          permissions=stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH,
-                          seal=True)
-            except Exception as e:
-                raise Exception(
-                    "Failed to copy file from '%s' to '%s'.\n%s" %
-                    (src_file, dest_file, traceback.format_exc())
-                )
 
-            self.logger.debug(
-                "Copied file '%s' to '%s'." % (src_file, dest_file)
+    def _is_registration_deferred(self):
+        """
+        Returns ``True`` if the registration of the publishes and the creation
+        of the Versions are deferred, see the ``deferred_registration`` app
+        setting.
+        """
+        return bool(self.parent.get_setting("deferred_registration", False))
+
+
+    def _defer_publish_registration(self, item, publish_data):
+        """
+        Writes the registration of a publish for the supplied item to the
+        :class:`~.deferred.DeferredRegistrationQueue`, to be replayed later.
+
+        The publish depends on any publish deferred for the parent item. The
+        key of the deferred registration is appended to the item's
+        ``deferred_publish_keys`` property.
+
+        :param item: The :ref:`publish-api-item` to register the publish for.
+        :param dict publish_data: The keyword arguments to supply to
+            ``sgtk.util.register_publish``.
+
+        :returns: The key of the deferred registration.
+        """
+        dependencies = []
+        if item.parent:
+            dependencies = item.parent.properties.get("deferred_publish_keys") or []
+
+        key = deferred.get_deferred_registration_queue().defer_publish(
+            publish_data, dependencies=dependencies)
+
+        item.properties.deferred_publish_keys = (
+            item.properties.get("deferred_publish_keys") or []) + [key]
+        return key
+
+
+    def _defer_version_creation(self, item, version_data, uploads=None):
+        """
+        Writes the creation of a Version for the supplied item to the
+        :class:`~.deferred.DeferredRegistrationQueue`, to be replayed later.
+
+        The Version is linked to the publishes deferred for the item and
+        created once they are registered. The key of the deferred creation is
+        stored in the item's ``deferred_version_key`` property.
+
+        :param item: The :ref:`publish-api-item` to create the Version for.
+        :param dict version_data: The fields of the Version to create.
+        :param list uploads: A list of ``(path, field_name)`` tuples of the
+            files to upload to the Version once created. A ``None`` field name
+            uploads the file as the Version's thumbnail. The files are copied,
+            so that changes made to them before the replay aren't uploaded.
+
+        :returns: The key of the deferred creation.
+        """
+        key = deferred.get_deferred_registration_queue().defer_version(
+            version_data,
+            published_files=item.properties.get("deferred_publish_keys") or [],
+            uploads=uploads
+        )
+        item.properties.deferred_version_key = key
+        return key
+
+
+    def _cancel_deferred_registrations(self, keys):
+        """
+        Cancels deferred registrations, typically when undoing a publish.
+
+        :param list keys: The keys of the deferred registrations.
+        """
+        deferred.get_deferred_registration_queue().cancel(keys)
+
+
+    def _get_registered_publishes(self, item):
+        """
+        Returns the publishes already registered for the supplied item,
+        excluding those still queued for registration with the publish
+        manager's :class:`~.registration.RegistrationQueue`.
+
+        :param item: A :ref:`publish-api-item`.
+
+        :returns: A list of publish dictionaries.
+        """
+        return self.plugin.manager.registration_queue.get_registered_publishes(item)
+
+
+    def _queue_upload(self, item, entity_type, entity_id, path, field_name=None):
+        """
+        Queues the upload of a file to a Shotgun entity with the publish
+        manager's :class:`~.upload.UploadQueue`. The file is uploaded in the
+        background while the following tasks are processed.
+
+        :param item: The :ref:`publish-api-item` to upload the file for.
+        :param str entity_type: The type of the entity to upload the file to.
+        :param int entity_id: The id of the entity to upload the file to.
+        :param str path: The path of the file to upload.
+        :param str field_name: The field to upload the file to, ``None`` to
+            upload it as the entity's thumbnail.
+
+        :returns: The queued :class:`~.upload.UploadJob`.
+        """
+        upload_queue = upload.get_upload_queue()
+        if field_name is None:
+            return upload_queue.upload_thumbnail(item, entity_type, entity_id, path)
+        return upload_queue.upload(item, entity_type, entity_id, path, field_name)
+
+
+    def _wait_for_uploads(self, item):
+        """
+        Waits for the uploads queued for the supplied item, logging an error
+        for each failed upload.
+
+        :param item: The :ref:`publish-api-item` to wait for the uploads of.
+
+        :raises: :class:`~.upload.UploadError` if any of the uploads failed.
+        """
+        upload_queue = upload.get_upload_queue()
+        jobs = upload_queue.get_jobs(item)
+        if not jobs:
+            return
+
+        self.logger.info("Waiting for %d uploads..." % (len(jobs),))
+        upload_queue.wait(jobs, raise_on_error=False)
+
+        failures = [job for job in jobs if job.error is not None]
+        for job in failures:
+            self.logger.error(
+                "Failed to upload file: %s" % (job.path,),
+                extra={
+                    "action_show_more_info": {
+                        "label": "Show Error Log",
+                        "tooltip": "Show the error of the last upload attempt",
+                        "text": job.error
+                    }
+                }
             )
-            processed_files.append(dest_file)
+        if failures:
+            raise upload.UploadError(failures, len(jobs))
 
-        return processed_files
+
+    def _get_existing_files(self, src_files, dest_path, is_sequence=False):
+        """
+        Returns the files already existing at the destination the supplied
+        files would be copied to, split between those identical to their
+        source, as left by a partial publish, and those diverging from it.
+
+        For sequences, any other existing frame matching the destination path
+        is considered divergent.
+
+        :param list src_files: The paths of the files to copy.
+        :param str dest_path: The destination path. For sequences, a path
+            containing a frame specification.
+        :param bool is_sequence: ``True`` if the files are the frames of a
+            sequence.
+
+        :returns: A tuple of the lists of unchanged and divergent files.
+        """
+        jobs = transfer.get_transfer_jobs(src_files, dest_path, is_sequence)
+
+        if is_sequence:
+            dest_pattern = self.parent.util.get_path_for_frame(dest_path, "*")
+            existing_files = set(self.parent.util.glob_files(dest_pattern))
+        else:
+            existing_files = set(
+                job.destination for job in jobs if os.path.exists(job.destination)
+            )
+
+        unchanged = []
+        for job in jobs:
+            if job.destination in existing_files and transfer.is_unchanged(
+                    job.source, job.destination):
+                unchanged.append(job.destination)
+
+        divergent = sorted(existing_files.difference(unchanged))
+
+        return (unchanged, divergent)
 
 
     def _symlink_files(self, src_files, dest_path, is_sequence=False):
@@ -705,26 +1120,31 @@ class PublishPlugin(PluginBase):
         assuming they meet the required criteria.
         """
 
-        publisher = self.parent
+        jobs = transfer.get_transfer_jobs(src_files, dest_path, is_sequence)
+
+        # create each destination folder once
+        dest_folders = set(os.path.dirname(job.destination) for job in jobs)
+        for dest_folder in sorted(dest_folders):
+            filesystem.ensure_folder_exists(dest_folder)
 
         # ---- symlink the publish files to the publish symlink path
         processed_files = []
-        for src_file in src_files:
+        for job in jobs:
 
-            if is_sequence:
-                frame_num = publisher.util.get_frame_number(src_file)
-                dest_file = publisher.util.get_path_for_frame(dest_path, frame_num)
-            else:
-                dest_file = dest_path
+            (src_file, dest_file) = (job.source, job.destination)
 
             # If the file paths are the same, skip...
             if src_file == dest_file:
                 continue
 
+            # ...as well as links kept by a partial publish being resumed
+            if os.path.islink(dest_file) and \
+                    os.path.realpath(dest_file) == os.path.realpath(src_file):
+                processed_files.append(dest_file)
+                continue
+
             # symlink the file
             try:
-                dest_folder = os.path.dirname(dest_file)
-                filesystem.ensure_folder_exists(dest_folder)
                 filesystem.symlink_file(src_file, dest_file)
             except Exception as e:
                 raise Exception(
@@ -740,6 +1160,85 @@ class PublishPlugin(PluginBase):
         return processed_files
 
 
+    def _get_copy_threads(self, task_settings=None):
+        """
+        Returns the maximum number of files to copy concurrently, as defined
+        by the ``Copy Threads`` setting. Defaults to ``1`` if the setting isn't
+        defined.
+
+        :param task_settings: The optional settings of a task, overriding the
+            plugin's settings.
+        """
+        return self._get_setting_value("Copy Threads", None, task_settings) or 1
+
+
+    def _get_transfer_mode(self, task_settings=None):
+        """
+        Returns the mode used to transfer files, as defined by the
+        ``Transfer Mode`` setting. Defaults to ``copy`` if the setting isn't
+        defined or is invalid.
+
+        :param task_settings: The optional settings of a task, overriding the
+            plugin's settings.
+        """
+        mode = self._get_setting_value("Transfer Mode", None, task_settings)
+        if not mode:
+            return transfer.TRANSFER_MODE_COPY
+
+        if mode not in transfer.TRANSFER_MODES:
+            self.logger.warning(
+                "Invalid transfer mode '%s', copying files instead. Expected "
+                "one of: %s" % (mode, ", ".join(transfer.TRANSFER_MODES))
+            )
+            return transfer.TRANSFER_MODE_COPY
+
+        return mode
+
+
+    def _get_checksum_algorithm(self, task_settings=None):
+        """
+        Returns the name of the algorithm used to compute the checksums of the
+        published files, as defined by the ``Checksum Algorithm`` setting.
+        ``None`` if the setting isn't defined or is invalid.
+
+        :param task_settings: The optional settings of a task, overriding the
+            plugin's settings.
+        """
+        algorithm = self._get_setting_value("Checksum Algorithm", None, task_settings)
+        if not algorithm:
+            return None
+
+        try:
+            hashlib.new(algorithm)
+        except ValueError:
+            self.logger.warning(
+                "Unsupported checksum algorithm '%s', checksums will not be "
+                "computed." % (algorithm,)
+            )
+            return None
+
+        return algorithm
+
+
+    def _get_setting_value(self, name, default=None, task_settings=None):
+        """
+        Returns the value of the supplied setting, or the default if the
+        setting isn't defined.
+
+        :param str name: The name of the setting.
+        :param default: The value returned if the setting isn't defined.
+        :param task_settings: The settings of the task being processed, as
+            supplied to the plugin's methods. They include the overrides of
+            the item type, the plugin's settings are used if not supplied.
+        """
+        if task_settings is None:
+            task_settings = self.plugin.settings
+        setting = task_settings.get(name)
+        if setting is None:
+            return default
+        return setting.value
+
+
     def _delete_files(self, paths_to_delete):
         """
         This method handles deleting an item's path(s) from a designated location.
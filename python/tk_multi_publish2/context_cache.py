@@ -0,0 +1,200 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import sgtk
+
+from .threaded import Threaded
+
+logger = sgtk.platform.get_logger(__name__)
+
+
+
+class ContextCache(Threaded):
+    """
+    Cache of the context data looked up for the items of a publish tree.
+
+    Items retargeted to many entities would otherwise each trigger the same
+    Shotgun lookups when their contexts are built and their template fields
+    are resolved. Contexts built from entities and template fields are
+    memoized, see :meth:`context_from_entities` and :meth:`as_template_fields`,
+    so that the Shotgun values of the template keys are looked up once per
+    distinct context and template rather than once per item. The cache is
+    cleared by the publish manager before each validation pass.
+    """
+
+    def __init__(self):
+        """
+        Construction
+        """
+        Threaded.__init__(self)
+        self._contexts = {}
+        self._template_fields = {}
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def stats(self):
+        """
+        A dictionary with the number of cache ``hits`` and ``misses`` as well as
+        the current number of cached contexts and template fields, ``size``.
+        """
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "size": len(self._contexts) + len(self._template_fields),
+        }
+
+    @Threaded.exclusive
+    def clear(self):
+        """
+        Discards all cached data. The statistics are kept.
+        """
+        self._contexts.clear()
+        self._template_fields.clear()
+
+    def context_from_entities(self, tk, entities, previous_context=None):
+        """
+        Returns the context of the supplied entities, as returned by
+        ``tk.context_from_entities``, building it once for each distinct list
+        of entities.
+
+        :param tk: The ``sgtk.Sgtk`` instance to build the context with.
+        :param list entities: The entity dictionaries of the context.
+        :param previous_context: The context to build the new context from.
+
+        :returns: A context.
+        """
+        key = (
+            tuple(sorted(get_entity_key(entity) for entity in entities)),
+            _get_context_key(previous_context),
+        )
+
+        context = self._get(self._contexts, key)
+        if context is None:
+            context = tk.context_from_entities(entities, previous_context=previous_context)
+            self._add(self._contexts, key, context)
+
+        return context
+
+    def as_template_fields(self, context, template=None, validate=False):
+        """
+        Returns the template fields of the supplied context, as returned by
+        ``context.as_template_fields``, resolving them once for each distinct
+        context and template.
+
+        :param context: The context to get the fields of.
+        :param template: The template to get the fields for.
+        :param bool validate: Whether to validate the fields.
+
+        :returns: A dictionary of template fields.
+
+        :raises: Any error raised by ``context.as_template_fields``.
+        """
+        key = (
+            _get_context_key(context),
+            getattr(template, "name", None),
+            validate,
+        )
+
+        fields = self._get(self._template_fields, key)
+        if fields is None:
+            if template is None:
+                fields = context.as_template_fields()
+            else:
+                fields = context.as_template_fields(template, validate=validate)
+            self._add(self._template_fields, key, fields)
+
+        return dict(fields)
+
+    @Threaded.exclusive
+    def _get(self, values, key):
+        """
+        Returns the value cached for the supplied key, ``None`` if it isn't
+        cached.
+        """
+        value = values.get(key)
+        if value is not None:
+            self._hits += 1
+        else:
+            self._misses += 1
+        return value
+
+    @Threaded.exclusive
+    def _add(self, values, key, value):
+        """
+        Caches the supplied value.
+        """
+        values[key] = value
+
+
+def _get_context_entities(context):
+    """
+    Returns the entity dictionaries of the supplied context.
+    """
+    entities = [
+        context.project,
+        context.entity,
+        context.step,
+        context.task,
+    ] + list(getattr(context, "additional_entities", None) or [])
+    return [entity for entity in entities if entity and entity.get("id")]
+
+
+def _get_context_key(context):
+    """
+    Returns a hashable key for the supplied context.
+    """
+    if context is None:
+        return None
+    return tuple(
+        get_entity_key(entity) for entity in _get_context_entities(context)
+    ) + (get_entity_key(context.user),)
+
+
+# the context cache shared by all callers
+_context_cache = ContextCache()
+
+
+def get_context_cache():
+    """
+    Returns the :class:`ContextCache` shared by the publisher.
+
+    :returns: A :class:`ContextCache` instance.
+    """
+    return _context_cache
+
+
+def get_context_template_fields(context, template=None, validate=False):
+    """
+    Returns the template fields of the supplied context, using the publisher's
+    :class:`ContextCache`.
+
+    :param context: The context to get the fields of.
+    :param template: The template to get the fields for.
+    :param bool validate: Whether to validate the fields.
+
+    :returns: A dictionary of template fields.
+
+    :raises: Any error raised by ``context.as_template_fields``.
+    """
+    return _context_cache.as_template_fields(context, template, validate=validate)
+
+
+def get_entity_key(entity):
+    """
+    Returns a hashable key for the supplied entity dictionary.
+
+    :param dict entity: An entity dictionary with "type" and "id" keys.
+
+    :returns: A ``(type, id)`` tuple or ``None`` if no entity was supplied.
+    """
+    if not entity:
+        return None
+    return (entity["type"], entity["id"])
@@ -0,0 +1,775 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import json
+import os
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # not available on windows, where files are locked via msvcrt
+    fcntl = None
+    import msvcrt
+
+import sgtk
+from sgtk.util import filesystem
+
+from . import util
+from .registration import RegistrationQueue
+from .schema import get_schema_fields
+from .upload import get_upload_queue
+
+logger = sgtk.platform.get_logger(__name__)
+
+# the kinds of deferred registration entries
+PUBLISH = "publish"
+VERSION = "version"
+
+# the names of the queue file, of its lock files and of the folder holding
+# copies of the files to upload, within the queue's folder
+_QUEUE_FILE_NAME = "queue.jsonl"
+_LOCK_FILE_NAME = "queue.lock"
+_REPLAY_LOCK_FILE_NAME = "replay.lock"
+_FILES_FOLDER_NAME = "files"
+
+# the number of seconds to wait between attempts to lock a file on windows
+_LOCK_RETRY_DELAY = 0.1
+
+# the maximum number of keys supplied to a single "in" filter when looking up
+# the entities created by previous replays
+_MAX_FILTER_VALUES = 500
+
+
+class DeferredRegistrationQueue(object):
+    """
+    Durable, local, queue of the Shotgun registrations deferred by the
+    publisher.
+
+    In deferred registration mode, publish plugins copy and seal the published
+    files as usual but, rather than registering the publishes and creating the
+    Versions in Shotgun, write the corresponding requests to the queue. The
+    queue is later replayed, see :meth:`replay`, when the Shotgun site is
+    available, typically from a scheduled job.
+
+    The queue is an append-only file of json lines. Each registration is
+    identified by a unique key, its idempotency key. A registration is
+    recorded as done, with the entity it created, as soon as the
+    ``shotgun.batch`` call creating it returns, and is never replayed again,
+    even if the replay is interrupted before the queue is compacted.
+
+    The key is also stored on the created entity, in the field set by the
+    ``deferred_registration_key_field`` setting, and entities holding the key
+    of a pending registration are looked up before it is replayed. This
+    prevents registrations from being created twice when the result of a
+    batch call is lost, such as when the call times out after Shotgun
+    created the entities, or when the process is killed before the done
+    markers are written. If the field isn't configured, or doesn't exist in
+    the site's schema, such registrations are created again.
+
+    The queue file is locked, across threads and processes, while it is read,
+    appended to or compacted, but not while registrations are replayed, so
+    that publishes can be deferred during a replay. Replays are serialized by
+    a lock of their own.
+
+    Thumbnails and the files to upload to Versions are copied to the queue's
+    folder when their registration is deferred, as they are typically
+    temporary or work files which can change before the replay.
+    """
+
+    def __init__(self, folder=None):
+        """
+        :param str folder: The folder holding the queue. If not supplied, a
+            folder of the publisher's cache location is used.
+        """
+        self._folder = folder
+        self._queue_lock = threading.RLock()
+        self._lock_depth = 0
+        self._replay_lock = threading.Lock()
+
+    @property
+    def folder(self):
+        """
+        The folder holding the queue.
+        """
+        if self._folder is None:
+            publisher = sgtk.platform.current_bundle()
+            self._folder = os.path.join(
+                publisher.cache_location, "deferred_registrations")
+        return self._folder
+
+    @property
+    def path(self):
+        """
+        The path of the queue file.
+        """
+        return os.path.join(self.folder, _QUEUE_FILE_NAME)
+
+    def defer_publish(self, publish_data, dependencies=None):
+        """
+        Writes the registration of a publish to the queue.
+
+        :param dict publish_data: The keyword arguments to supply to
+            ``sgtk.util.register_publish``. The ``tk`` instance is not stored,
+            the ``context`` is stored as a dictionary.
+        :param list dependencies: The keys of the deferred publishes the
+            publish depends on. Their ids are added to the ``dependency_ids``
+            of the publish when replayed.
+
+        :returns: The key of the deferred registration.
+        """
+        key = uuid.uuid4().hex
+
+        data = dict(publish_data)
+        data.pop("tk", None)
+        context = data.get("context")
+        if context is not None:
+            data["context"] = context.to_dict()
+        data["thumbnail_path"] = self._copy_file(
+            data.get("thumbnail_path"), key)
+
+        self._append([{
+            "key": key,
+            "type": PUBLISH,
+            "created": time.time(),
+            "data": data,
+            "dependencies": list(dependencies or []),
+        }])
+        return key
+
+    def defer_version(self, version_data, published_files=None, uploads=None):
+        """
+        Writes the creation of a Version to the queue.
+
+        :param dict version_data: The fields of the Version to create.
+        :param list published_files: The keys of the deferred publishes to
+            link the Version to, in addition to any ``published_files`` of the
+            Version data.
+        :param list uploads: A list of ``(path, field_name)`` tuples of the
+            files to upload to the Version once created. A ``None`` field name
+            uploads the file as the Version's thumbnail. The files are copied
+            to the queue's folder.
+
+        :returns: The key of the deferred registration.
+        """
+        key = uuid.uuid4().hex
+
+        upload_entries = []
+        for (index, (path, field_name)) in enumerate(uploads or []):
+            upload_entries.append({
+                "path": self._copy_file(path, key, index),
+                "field_name": field_name,
+            })
+
+        self._append([{
+            "key": key,
+            "type": VERSION,
+            "created": time.time(),
+            "data": version_data,
+            "published_files": list(published_files or []),
+            "uploads": upload_entries,
+        }])
+        return key
+
+    def cancel(self, keys):
+        """
+        Cancels the supplied deferred registrations, which won't be replayed.
+
+        :param list keys: The keys of the deferred registrations.
+        """
+        if keys:
+            self._append([{"cancelled": key} for key in keys])
+
+    def get_pending(self):
+        """
+        Returns the registrations left to replay.
+
+        :returns: A list of entry dictionaries, in the order they were
+            deferred. Each entry has a ``key``, a ``type``, ``publish`` or
+            ``version``, and the ``data`` of the registration.
+        """
+        (entries, _) = self._read()
+        return entries
+
+    def replay(self, batch_size=100):
+        """
+        Replays the deferred registrations.
+
+        Publishes are registered first, in batches, via a
+        :class:`~.registration.RegistrationQueue`, parents before the
+        publishes depending on them. The status of their conflicting publishes
+        is then cleared. Versions are created next, in batches, once all the
+        publishes they are linked to are registered, and their files are
+        uploaded.
+
+        Registrations failing to replay are kept in the queue for the next
+        replay, along with those depending on them. The queue is compacted
+        once replayed. Registrations can be deferred while the queue is
+        replayed, they are replayed by the next replay.
+
+        :param int batch_size: The maximum number of entities created by a
+            single ``shotgun.batch`` call.
+
+        :returns: A dictionary with the number of publishes ``registered``,
+            the number of ``versions`` created, the number of ``failed``
+            registrations and uploads and the number of registrations left
+            ``pending`` in the queue.
+        """
+        with self._replaying():
+            (entries, done) = self._read()
+            if not entries:
+                return {"registered": 0, "versions": 0, "failed": 0, "pending": 0}
+
+            logger.debug("Replaying %d deferred registrations..." % (len(entries),))
+
+            (registered, publish_failures) = self._replay_publishes(
+                [entry for entry in entries if entry["type"] == PUBLISH],
+                done,
+                batch_size
+            )
+            (versions, version_failures) = self._replay_versions(
+                [entry for entry in entries if entry["type"] == VERSION],
+                done,
+                batch_size
+            )
+
+            pending = self._compact()
+
+        return {
+            "registered": registered,
+            "versions": versions,
+            "failed": publish_failures + version_failures,
+            "pending": pending,
+        }
+
+    def _replay_publishes(self, entries, done, batch_size):
+        """
+        Registers the publishes of the supplied entries, recording them as
+        done.
+
+        :returns: The number of publishes registered and of failures.
+        """
+        publisher = sgtk.platform.current_bundle()
+        publish_entity_type = sgtk.util.get_published_file_entity_type(publisher.sgtk)
+
+        # publishes created by a previous replay whose result was lost
+        key_field = self._get_key_field(publish_entity_type)
+        try:
+            created = self._find_created(
+                publish_entity_type,
+                key_field,
+                entries,
+                ["name", "path", "path_cache", "path_cache_storage"]
+            )
+        except Exception:
+            logger.warning(
+                "Failed to look up the publishes of previous replays: %s" %
+                (traceback.format_exc(),)
+            )
+            return (0, len(entries))
+        self._record_done(created, done)
+
+        # record the publishes as soon as they are created for them not to be
+        # registered again
+        keys = {}
+
+        def record_created(created_requests):
+            markers = []
+            for request in created_requests:
+                key = keys[id(request)]
+                done[key] = {
+                    "type": request.sg_publish_data["type"],
+                    "id": request.sg_publish_data["id"],
+                }
+                markers.append({"done": key, "entity": done[key]})
+            self._append(markers)
+
+        registration_queue = RegistrationQueue(
+            batch_size=batch_size, created_callback=record_created)
+        requests = []
+        requests_by_key = {}
+        recovered_requests = []
+        for entry in entries:
+            if entry["key"] in created:
+                recovered_requests.append((entry, created[entry["key"]]))
+                continue
+
+            publish_data = dict(entry["data"])
+            publish_data["tk"] = publisher.sgtk
+            if publish_data.get("context") is not None:
+                publish_data["context"] = sgtk.Context.from_dict(
+                    publisher.sgtk, publish_data["context"])
+
+            # store the key with the publish for the replay to be idempotent
+            if key_field:
+                sg_fields = dict(publish_data.get("sg_fields") or {})
+                sg_fields[key_field] = entry["key"]
+                publish_data["sg_fields"] = sg_fields
+
+            # dependencies registered by a previous replay
+            publish_data["dependency_ids"] = list(
+                publish_data.get("dependency_ids") or []
+            ) + [
+                done[key]["id"] for key in entry["dependencies"] if key in done
+            ]
+
+            request = registration_queue.register(
+                publish_data,
+                dependencies=[
+                    requests_by_key[key] for key in entry["dependencies"]
+                    if key in requests_by_key
+                ]
+            )
+            requests.append((entry, request))
+            requests_by_key[entry["key"]] = request
+            keys[id(request)] = entry["key"]
+
+        registration_queue.flush(raise_on_error=False)
+
+        cleared_requests = []
+        num_failures = 0
+        for (entry, request) in requests:
+            if request.sg_publish_data is None:
+                num_failures += 1
+                logger.warning(
+                    "Failed to register deferred publish '%s': %s" %
+                    (entry["data"].get("name"), request.error)
+                )
+                continue
+
+            cleared_requests.append(
+                (request.publish_data["context"], request.sg_publish_data))
+
+        # the status of the conflicting publishes of the recovered publishes
+        # may not have been cleared
+        for (entry, sg_publish_data) in recovered_requests:
+            context = entry["data"].get("context")
+            if context is not None:
+                context = sgtk.Context.from_dict(publisher.sgtk, context)
+            cleared_requests.append((context, sg_publish_data))
+
+        if cleared_requests:
+            try:
+                util.clear_status_for_conflicting_publishes_batch(cleared_requests)
+            except Exception:
+                logger.warning(
+                    "Failed to clear the status of conflicting publishes: %s" %
+                    (traceback.format_exc(),)
+                )
+
+        return (len(cleared_requests), num_failures)
+
+    def _replay_versions(self, entries, done, batch_size):
+        """
+        Creates the Versions of the supplied entries, whose publishes are all
+        registered, and uploads their files, recording them as done.
+
+        :returns: The number of Versions created and of failures.
+        """
+        publisher = sgtk.platform.current_bundle()
+        publish_entity_type = sgtk.util.get_published_file_entity_type(publisher.sgtk)
+
+        ready = []
+        for entry in entries:
+            missing = [key for key in entry["published_files"] if key not in done]
+            if missing:
+                logger.debug(
+                    "Deferring Version '%s' until its publishes are registered." %
+                    (entry["data"].get("code"),)
+                )
+                continue
+            ready.append(entry)
+
+        # Versions created by a previous replay whose result was lost. their
+        # files weren't uploaded, see below.
+        key_field = self._get_key_field("Version")
+        try:
+            created = self._find_created("Version", key_field, ready)
+        except Exception:
+            logger.warning(
+                "Failed to look up the Versions of previous replays: %s" %
+                (traceback.format_exc(),)
+            )
+            return (0, len(ready))
+        self._record_done(created, done)
+
+        num_created = 0
+        num_failures = 0
+        upload_jobs = []
+        for entry in ready:
+            if entry["key"] in created:
+                num_created += 1
+                for upload in entry["uploads"]:
+                    upload_jobs.append(
+                        self._queue_upload(
+                            created[entry["key"]], upload["path"], upload["field_name"])
+                    )
+        ready = [entry for entry in ready if entry["key"] not in created]
+
+        for chunk_start in range(0, len(ready), batch_size):
+            chunk = ready[chunk_start:chunk_start + batch_size]
+
+            batch_data = []
+            for entry in chunk:
+                data = dict(entry["data"])
+                data["published_files"] = list(
+                    data.get("published_files") or []
+                ) + [
+                    {"type": publish_entity_type, "id": done[key]["id"]}
+                    for key in entry["published_files"]
+                ]
+                # store the key with the Version for the replay to be
+                # idempotent
+                if key_field:
+                    data[key_field] = entry["key"]
+                batch_data.append({
+                    "request_type": "create",
+                    "entity_type": "Version",
+                    "data": data,
+                })
+
+            try:
+                versions = publisher.shotgun.batch(batch_data)
+            except Exception:
+                num_failures += len(chunk)
+                logger.warning(
+                    "Failed to create %d deferred Versions: %s" %
+                    (len(chunk), traceback.format_exc())
+                )
+                continue
+
+            markers = []
+            for (entry, version) in zip(chunk, versions):
+                done[entry["key"]] = {"type": version["type"], "id": version["id"]}
+                markers.append({"done": entry["key"], "entity": done[entry["key"]]})
+            self._append(markers)
+            num_created += len(markers)
+
+            # the files are uploaded once the Versions are recorded, those of
+            # Versions recovered by the next replay haven't been uploaded
+            for (entry, version) in zip(chunk, versions):
+                for upload in entry["uploads"]:
+                    upload_jobs.append(
+                        self._queue_upload(version, upload["path"], upload["field_name"])
+                    )
+
+        # the Versions are created, failed uploads are reported but not
+        # attempted again by the next replay
+        get_upload_queue().wait(upload_jobs, raise_on_error=False)
+        for job in upload_jobs:
+            if job.error is not None:
+                num_failures += 1
+                logger.warning(
+                    "Failed to upload '%s' to Version %s: %s" %
+                    (job.path, job.entity_id, job.error)
+                )
+
+        return (num_created, num_failures)
+
+    def _get_key_field(self, entity_type):
+        """
+        Returns the field storing the keys of the deferred registrations on
+        the entities of the supplied type.
+
+        :param str entity_type: The type of the entities created by the
+            registrations.
+
+        :returns: The name of the field, or ``None`` if the field isn't
+            configured or doesn't exist in the schema of the entity type.
+        """
+        publisher = sgtk.platform.current_bundle()
+        key_field = publisher.get_setting("deferred_registration_key_field")
+        if not key_field:
+            return None
+
+        try:
+            fields = get_schema_fields(entity_type)
+        except Exception:
+            logger.warning(
+                "Failed to read the fields of %s: %s" %
+                (entity_type, traceback.format_exc())
+            )
+            return None
+
+        if key_field not in fields:
+            logger.debug(
+                "%s has no field '%s', the registrations of interrupted replays "
+                "may be created again." % (entity_type, key_field)
+            )
+            return None
+
+        return key_field
+
+    def _find_created(self, entity_type, key_field, entries, fields=None):
+        """
+        Finds the entities holding the keys of the supplied registrations,
+        which were created by a previous replay whose result was lost.
+
+        :param str entity_type: The type of the entities created by the
+            registrations.
+        :param str key_field: The field storing the keys on the entities, see
+            :meth:`_get_key_field`. No entity is found if ``None``.
+        :param list entries: The entries of the registrations.
+        :param list fields: Additional fields to return for the entities.
+
+        :returns: A dictionary of the entities, keyed by entry key.
+        """
+        if not key_field or not entries:
+            return {}
+
+        publisher = sgtk.platform.current_bundle()
+
+        keys = sorted(entry["key"] for entry in entries)
+        created = {}
+        # keep the "in" filters of a single find() to a reasonable size
+        for chunk_start in range(0, len(keys), _MAX_FILTER_VALUES):
+            chunk_keys = keys[chunk_start:chunk_start + _MAX_FILTER_VALUES]
+            entities = publisher.shotgun.find(
+                entity_type,
+                [[key_field, "in", chunk_keys]],
+                [key_field] + list(fields or [])
+            )
+            for entity in entities:
+                created[entity[key_field]] = entity
+
+        if created:
+            logger.debug(
+                "Found %d %s entities created by previous replays." %
+                (len(created), entity_type)
+            )
+        return created
+
+    def _record_done(self, created, done):
+        """
+        Records the supplied registrations as done.
+
+        :param dict created: The entities created for the registrations,
+            keyed by entry key.
+        :param dict done: The entities created for the done entries, updated
+            in place.
+        """
+        markers = []
+        for (key, entity) in sorted(created.items()):
+            done[key] = {"type": entity["type"], "id": entity["id"]}
+            markers.append({"done": key, "entity": done[key]})
+        self._append(markers)
+
+    def _queue_upload(self, version, path, field_name):
+        """
+        Queues the upload of a file to the supplied Version.
+
+        :returns: The queued :class:`~.upload.UploadJob`.
+        """
+        upload_queue = get_upload_queue()
+        if field_name is None:
+            return upload_queue.upload_thumbnail(None, version["type"], version["id"], path)
+        return upload_queue.upload(None, version["type"], version["id"], path, field_name)
+
+    def _copy_file(self, path, key, index=0):
+        """
+        Copies the supplied file of a deferred registration to the queue's
+        folder.
+
+        :param str path: The path of the file to copy.
+        :param str key: The key of the deferred registration.
+        :param int index: The index of the file amongst those of the
+            registration.
+
+        :returns: The path of the copy, or the supplied path if it isn't a
+            file.
+        """
+        if not path or not os.path.isfile(path):
+            return path
+
+        files_folder = os.path.join(self.folder, _FILES_FOLDER_NAME)
+        filesystem.ensure_folder_exists(files_folder)
+
+        # copies are named after the key of their registration, see _compact
+        copy_path = os.path.join(
+            files_folder,
+            "%s.%d%s" % (key, index, os.path.splitext(path)[1])
+        )
+        # the data only, sealed files would leave read-only copies that can't
+        # be removed on windows
+        shutil.copyfile(path, copy_path)
+        return copy_path
+
+    def _append(self, entries):
+        """
+        Durably appends the supplied entries to the queue file.
+        """
+        if not entries:
+            return
+
+        lines = "".join("%s\n" % (json.dumps(entry),) for entry in entries)
+        with self._locked():
+            with open(self.path, "a") as fh:
+                fh.write(lines)
+                fh.flush()
+                os.fsync(fh.fileno())
+
+    def _read(self):
+        """
+        Reads the queue file.
+
+        :returns: A tuple with the list of pending entries, in order, and a
+            dictionary of the entities created for the done entries, keyed by
+            entry key.
+        """
+        with self._locked():
+            if not os.path.exists(self.path):
+                return ([], {})
+            with open(self.path) as fh:
+                lines = fh.readlines()
+
+        entries = []
+        done = {}
+        cancelled = set()
+        for (line_number, line) in enumerate(lines):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # a line left partially written by an interrupted process
+                logger.warning(
+                    "Ignoring invalid line %d of the deferred registration "
+                    "queue '%s'." % (line_number + 1, self.path)
+                )
+                continue
+
+            if "done" in record:
+                done[record["done"]] = record["entity"]
+            elif "cancelled" in record:
+                cancelled.add(record["cancelled"])
+            else:
+                entries.append(record)
+
+        pending = [
+            entry for entry in entries
+            if entry["key"] not in done and entry["key"] not in cancelled
+        ]
+        return (pending, done)
+
+    def _compact(self):
+        """
+        Rewrites the queue file with its pending entries only, keeping the
+        done markers of the publishes pending entries depend on. The file
+        copies of the other entries are deleted.
+
+        :returns: The number of pending entries.
+        """
+        with self._locked():
+            (entries, done) = self._read()
+
+            required_keys = set()
+            for entry in entries:
+                required_keys.update(entry.get("dependencies", []))
+                required_keys.update(entry.get("published_files", []))
+
+            records = [
+                {"done": key, "entity": done[key]}
+                for key in sorted(required_keys) if key in done
+            ] + entries
+
+            temp_path = "%s.tmp" % (self.path,)
+            with open(temp_path, "w") as fh:
+                for record in records:
+                    fh.write("%s\n" % (json.dumps(record),))
+                fh.flush()
+                os.fsync(fh.fileno())
+            if os.path.exists(self.path) and os.name == "nt":
+                # rename doesn't replace existing files on windows
+                os.remove(self.path)
+            os.rename(temp_path, self.path)
+
+            # remove the file copies which aren't needed anymore
+            files_folder = os.path.join(self.folder, _FILES_FOLDER_NAME)
+            if os.path.isdir(files_folder):
+                pending_keys = set(entry["key"] for entry in entries)
+                for file_name in os.listdir(files_folder):
+                    if file_name.split(".")[0] not in pending_keys:
+                        os.remove(os.path.join(files_folder, file_name))
+
+        return len(entries)
+
+    @contextmanager
+    def _locked(self):
+        """
+        Locks the queue file for the exclusive use of the current thread and
+        process. The lock is reentrant.
+        """
+        with self._queue_lock:
+            self._lock_depth += 1
+            try:
+                if self._lock_depth > 1:
+                    yield
+                else:
+                    with _lock_file(os.path.join(self.folder, _LOCK_FILE_NAME)):
+                        yield
+            finally:
+                self._lock_depth -= 1
+
+    @contextmanager
+    def _replaying(self):
+        """
+        Locks the queue for the exclusive use of the current replay, across
+        threads and processes. The queue file itself isn't locked.
+        """
+        with self._replay_lock:
+            with _lock_file(os.path.join(self.folder, _REPLAY_LOCK_FILE_NAME)):
+                yield
+
+
+@contextmanager
+def _lock_file(path):
+    """
+    Exclusively locks the supplied lock file, waiting for any other process or
+    thread holding it to release it.
+
+    :param str path: The path of the lock file, created if needed.
+    """
+    filesystem.ensure_folder_exists(os.path.dirname(path))
+    with open(path, "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            # msvcrt locks a range of bytes from the current position
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except IOError:
+                    time.sleep(_LOCK_RETRY_DELAY)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# the deferred registration queue shared by all callers
+_deferred_registration_queue = DeferredRegistrationQueue()
+
+
+def get_deferred_registration_queue():
+    """
+    Returns the :class:`DeferredRegistrationQueue` shared by the publisher.
+
+    :returns: A :class:`DeferredRegistrationQueue` instance.
+    """
+    return _deferred_registration_queue
@@ -13,7 +13,7 @@ import traceback
 import sgtk
 from sgtk.platform.qt import QtCore, QtGui
 
-from .api import PublishManager, PublishItem, PublishTask
+from .api import CancellationToken, PublishManager, PublishItem, PublishTask
 from .ui.dialog import Ui_Dialog
 from .progress import ProgressHandler
 from .summary_overlay import SummaryOverlay
@@ -163,6 +163,7 @@ class AppDialog(QtGui.QWidget):
         # hide the stop processing button by default
         self.ui.stop_processing.hide()
         self._stop_processing_flagged = False
+        self._cancellation_token = None
         self.ui.stop_processing.clicked.connect(self._trigger_stop_processing)
 
         # help button
@@ -813,7 +814,17 @@ class AppDialog(QtGui.QWidget):
 
             self._overlay.show_loading()
             self.ui.button_container.hide()
-            new_items = self._publish_manager.collect_files(str_files)
+
+            # allow long running collections, such as recursive folder
+            # ingests, to be stopped
+            self._cancellation_token = CancellationToken()
+            self.ui.stop_processing.show()
+
+            new_items = self._publish_manager.collect_files(
+                str_files,
+                cancellation_token=self._cancellation_token,
+                collected_callback=self._on_items_collected
+            )
             num_items_created = len(new_items)
             num_errors = self._progress_handler.pop()
 
@@ -832,6 +843,9 @@ class AppDialog(QtGui.QWidget):
             self._synchronize_tree()
 
         finally:
+            self._stop_processing_flagged = False
+            self._cancellation_token = None
+            self.ui.stop_processing.hide()
             self._overlay.hide()
             self.ui.button_container.show()
 
@@ -857,6 +871,18 @@ class AppDialog(QtGui.QWidget):
         # lastly, select the summary
         self.ui.items_tree.select_first_item()
 
+    def _on_items_collected(self, items):
+        """
+        Displays the items reported by the collector while dropped files are
+        collected, without waiting for the collection to complete.
+
+        :param items: The collected publish api items.
+        """
+        # show the items collected so far rather than the loading overlay.
+        # the collection can still be stopped.
+        self._overlay.hide()
+        self.ui.items_tree.add_items(items)
+
     def _synchronize_tree(self):
         """
         Redraws the ui and rebuilds data based on
@@ -1011,6 +1037,7 @@ class AppDialog(QtGui.QWidget):
 
         if is_standalone:
             self._prepare_tree(number_phases=1)
+            self._cancellation_token = CancellationToken()
 
         # inform the progress system of the current mode
         self._progress_handler.set_phase(self._progress_handler.PHASE_VALIDATE)
@@ -1020,7 +1047,10 @@ class AppDialog(QtGui.QWidget):
         self.ui.stop_processing.show()
         try:
             failed_to_validate = self._publish_manager.validate(
-                task_generator=self._validate_task_generator(is_standalone))
+                task_generator=self._validate_task_generator(is_standalone),
+                cancellation_token=self._cancellation_token,
+                tasks=self._get_checked_tasks()
+            )
             num_issues = len(failed_to_validate)
         finally:
             self._progress_handler.pop()
@@ -1034,6 +1064,7 @@ class AppDialog(QtGui.QWidget):
             if is_standalone:
                 # reset process aborted flag
                 self._stop_processing_flagged = False
+                self._cancellation_token = None
                 self.ui.stop_processing.hide()
                 # reset the progress
                 self._progress_handler.reset_progress()
@@ -1056,6 +1087,9 @@ class AppDialog(QtGui.QWidget):
         # back on the tasks.
         self._prepare_tree(number_phases=3)
 
+        # allows the publish to be stopped, including from within the plugins
+        self._cancellation_token = CancellationToken()
+
         try:
             # show cancel button
             self.ui.stop_processing.show()
@@ -1111,7 +1145,8 @@ class AppDialog(QtGui.QWidget):
 
             try:
                 self._publish_manager.publish(
-                    task_generator=self._publish_task_generator()
+                    task_generator=self._publish_task_generator(),
+                    cancellation_token=self._cancellation_token
                 )
             except Exception:
                 # ensure the full error shows up in the log file
@@ -1131,7 +1166,10 @@ class AppDialog(QtGui.QWidget):
 
                 try:
                     self._publish_manager.finalize(
-                        task_generator=self._finalize_task_generator())
+                        task_generator=self._finalize_task_generator(),
+                        cancellation_token=self._cancellation_token,
+                        tasks=self._get_checked_tasks()
+                    )
                 except Exception:
                     # ensure the full error shows up in the log file
                     logger.error("Finalize error stack:\n%s" % (traceback.format_exc(),))
@@ -1152,6 +1190,7 @@ class AppDialog(QtGui.QWidget):
             self.ui.stop_processing.hide()
             # reset abort state
             self._stop_processing_flagged = False
+            self._cancellation_token = None
             # reset the progress
             self._progress_handler.reset_progress()
 
@@ -1223,6 +1262,18 @@ class AppDialog(QtGui.QWidget):
 
         return tree_items
 
+    def _get_checked_tasks(self):
+        """
+        Retrieves the tasks of the checked task items of the tree, which are
+        the tasks yielded by the task generators.
+
+        :returns: A list of :class:`~.api.PublishTask` instances.
+        """
+        return [
+            ui_item.task for ui_item in self._get_tree_items()
+            if isinstance(ui_item, TreeNodeTask) and ui_item.checked
+        ]
+
     def _task_generator(self, stage_name):
         """
         This method yields tree items for our various stages. It will update the UI
@@ -1475,6 +1526,8 @@ class AppDialog(QtGui.QWidget):
         """
         logger.info("Processing aborted.")
         self._stop_processing_flagged = True
+        if self._cancellation_token:
+            self._cancellation_token.cancel("Processing aborted by user.")
 
     def _show_no_items_error(self):
         """
@@ -0,0 +1,181 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import copy
+import os
+from collections import OrderedDict
+
+import sgtk
+
+from .threaded import Threaded
+
+logger = sgtk.platform.get_logger(__name__)
+
+
+class PathAnalysisCache(Threaded):
+    """
+    Bounded, least recently used, cache of the analysis of file paths.
+
+    Template matches and file path components are memoized per pipeline
+    configuration and normalized path. Lookups reuse the publisher's toolkit
+    instance rather than building a new one for each path.
+
+    .. note:: Whether a path is a folder is only checked the first time the
+        path is analyzed. The publish manager clears the cache whenever it
+        starts collecting items, call :meth:`clear` if paths were created or
+        removed on disk since.
+    """
+    def __init__(self, max_size=16384):
+        """
+        Construction
+
+        :param int max_size: The maximum number of paths to keep analysis for.
+        """
+        Threaded.__init__(self)
+        self._max_size = max_size
+        self._templates = OrderedDict()
+        self._components = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def stats(self):
+        """
+        A dictionary with the number of cache ``hits`` and ``misses`` as well as
+        the current number of cached entries, ``size``.
+        """
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "size": len(self._templates) + len(self._components),
+        }
+
+    @Threaded.exclusive
+    def clear(self):
+        """
+        Discards all cached analysis. The statistics are kept.
+        """
+        self._templates.clear()
+        self._components.clear()
+
+    def get_template(self, path):
+        """
+        Returns the template matching the supplied path.
+
+        :param str path: The normalized path to match.
+
+        :returns: A :class:`sgtk.Template` or ``None``.
+        """
+        tk = sgtk.platform.current_bundle().sgtk
+        key = (tk.pipeline_configuration.get_path(), path)
+
+        (found, template) = self._get(self._templates, key)
+        if not found:
+            template = tk.template_from_path(path)
+            self._add(self._templates, key, template)
+        return template
+
+    def get_components(self, path):
+        """
+        Returns the file path components for the supplied path. See
+        :func:`~.util.get_file_path_components` for the form of the returned data.
+
+        :param str path: The normalized path to analyze.
+
+        :returns: A new dictionary of path components.
+        """
+        tk = sgtk.platform.current_bundle().sgtk
+        key = (tk.pipeline_configuration.get_path(), path)
+
+        (found, file_info) = self._get(self._components, key)
+        if not found:
+            file_info = self._analyze(path)
+            self._add(self._components, key, file_info)
+
+        # callers are free to modify the returned dictionary
+        return copy.copy(file_info)
+
+    def _analyze(self, path):
+        """
+        Computes the file path components for the supplied path.
+        """
+        logger.debug("Getting file path components for path: '%s'..." % (path,))
+
+        # break it up into the major components
+        (folder, filename) = os.path.split(path)
+
+        if os.path.isdir(path):
+            # folder
+            extension = None
+        else:
+            # file. extract the extension and remove the "."
+            template = self.get_template(path)
+            fields = template.get_fields(path) if template else {}
+            if "extension" in fields:
+                extension = fields["extension"]
+            else:
+                (_, extension) = os.path.splitext(filename)
+            if extension:
+                extension = extension.lstrip(".")
+            else:
+                # prevent extension = ""
+                extension = None
+
+        file_info = dict(
+            path=path,
+            folder=folder,
+            filename=filename,
+            extension=extension,
+        )
+
+        logger.debug(
+            "Extracted components from path '%s': %s" %
+            (path, file_info)
+        )
+
+        return file_info
+
+    @Threaded.exclusive
+    def _get(self, cache, key):
+        """
+        Returns a tuple of whether the key was found in the supplied cache and
+        the cached value. Found entries become the most recently used.
+        """
+        if key in cache:
+            self._hits += 1
+            value = cache.pop(key)
+            cache[key] = value
+            return (True, value)
+
+        self._misses += 1
+        return (False, None)
+
+    @Threaded.exclusive
+    def _add(self, cache, key, value):
+        """
+        Adds a value to the supplied cache, evicting the least recently used
+        entries beyond the maximum size.
+        """
+        cache[key] = value
+        while len(cache) > self._max_size:
+            cache.popitem(last=False)
+
+
+# the path analysis cache shared by all callers
+_path_analysis_cache = PathAnalysisCache()
+
+
+def get_path_analysis_cache():
+    """
+    Returns the :class:`PathAnalysisCache` shared by the publisher.
+
+    :returns: A :class:`PathAnalysisCache` instance.
+    """
+    return _path_analysis_cache
@@ -14,6 +14,7 @@ import sgtk
 
 from .progress_details_widget import ProgressDetailsWidget
 from .publish_logging import PublishLogWrapper
+from ..util import process_events
 from .publish_actions import (
     show_folder,
     show_in_shotgun,
@@ -212,7 +213,8 @@ class ProgressHandler(object):
         self._progress_details.log_tree.setCurrentItem(item)
         self._log_messages.append("%s%s" % (" " * (self._current_indent * 2), message))
 
-        QtCore.QCoreApplication.processEvents()
+        # errors are always displayed right away
+        process_events(force=(status == self.ERROR))
 
     @property
     def logger(self):
@@ -0,0 +1,478 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+from collections import OrderedDict
+
+import sgtk
+
+from .context_cache import get_entity_key
+from .threaded import Threaded
+
+logger = sgtk.platform.get_logger(__name__)
+
+# the maximum number of values supplied to a single "in" filter
+_MAX_FILTER_VALUES = 500
+
+
+class ConflictingPublishesCache(Threaded):
+    """
+    Cache of the conflicting publishes found for the items of a validation
+    pass.
+
+    The cache is filled in bulk via :meth:`prefetch`, typically from the
+    :meth:`~.base_hooks.PublishPlugin.pre_validate` method of publish plugins,
+    so that the validation of each item reads its conflicting publishes from
+    the cache instead of querying Shotgun. It is cleared by the publish
+    manager before and after each validation pass.
+    """
+
+    def __init__(self):
+        """
+        Construction
+        """
+        Threaded.__init__(self)
+        self._publishes = {}
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def stats(self):
+        """
+        A dictionary with the number of cache ``hits`` and ``misses`` as well as
+        the current number of cached entries, ``size``.
+        """
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "size": len(self._publishes),
+        }
+
+    @Threaded.exclusive
+    def clear(self):
+        """
+        Discards all cached publishes. The statistics are kept.
+        """
+        self._publishes.clear()
+
+    def prefetch(self, publish_requests, filters=None):
+        """
+        Finds and caches the conflicting publishes of the supplied requests
+        which are not cached yet. See :func:`get_conflicting_publishes_batch`.
+
+        :param publish_requests: A list of ``(context, path, publish_name)``
+            tuples.
+        :param filters: A list of additional SG find() filters to apply to the
+            publish search.
+        """
+        keys = []
+        missing_keys = set()
+        missing_requests = []
+        for (context, path, publish_name) in publish_requests:
+            key = self._get_key(context, path, publish_name, filters)
+            if key not in self._publishes and key not in missing_keys:
+                keys.append(key)
+                missing_keys.add(key)
+                missing_requests.append((context, path, publish_name))
+
+        if not missing_requests:
+            return
+
+        results = get_conflicting_publishes_batch(missing_requests, filters)
+        self._add(zip(keys, results))
+
+    @Threaded.exclusive
+    def get(self, context, path, publish_name, filters=None):
+        """
+        Returns the cached conflicting publishes for the supplied arguments.
+
+        :returns: A list of publish dictionaries or ``None`` if no publishes
+            were cached for these arguments.
+        """
+        key = self._get_key(context, path, publish_name, filters)
+        if key in self._publishes:
+            self._hits += 1
+            return list(self._publishes[key])
+
+        self._misses += 1
+        return None
+
+    @Threaded.exclusive
+    def _add(self, entries):
+        """
+        Caches the supplied ``(key, publishes)`` pairs.
+        """
+        self._publishes.update(entries)
+
+    def _get_key(self, context, path, publish_name, filters):
+        """
+        Returns the cache key for the supplied arguments.
+        """
+        return (
+            repr(context),
+            sgtk.util.ShotgunPath.normalize(path),
+            publish_name,
+            repr(filters)
+        )
+
+
+# the conflicting publishes cache shared by all callers
+_conflicting_publishes_cache = ConflictingPublishesCache()
+
+
+def get_conflicting_publishes_cache():
+    """
+    Returns the :class:`ConflictingPublishesCache` shared by the publisher.
+
+    :returns: A :class:`ConflictingPublishesCache` instance.
+    """
+    return _conflicting_publishes_cache
+
+
+def prefetch_conflicting_publishes(publish_requests, filters=None):
+    """
+    Finds the conflicting publishes of many items at once and caches them for
+    the current validation pass, so that subsequent calls to
+    :func:`get_conflicting_publishes` with the same arguments don't query
+    Shotgun.
+
+    :param publish_requests: A list of ``(context, path, publish_name)``
+        tuples.
+    :param filters: A list of additional SG find() filters to apply to the
+        publish search.
+    """
+    _conflicting_publishes_cache.prefetch(publish_requests, filters)
+
+
+class PublishedFilesCache(Threaded):
+    """
+    Cache of the publishes of the contexts looked up during a validation pass.
+
+    All of the publishes of a context are found with a single query the first
+    time the context is looked up. Lookups by publish name and type, such as
+    those done to determine the next version number of each item, are then
+    resolved locally.
+
+    Contexts are discarded from the cache whenever a publish is registered
+    for them, and the cache is cleared by the publish manager before and after
+    each validation pass.
+    """
+
+    def __init__(self):
+        """
+        Construction
+        """
+        Threaded.__init__(self)
+        self._publishes = {}
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def stats(self):
+        """
+        A dictionary with the number of cache ``hits`` and ``misses`` as well as
+        the current number of cached contexts, ``size``.
+        """
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "size": len(self._publishes),
+        }
+
+    @Threaded.exclusive
+    def clear(self):
+        """
+        Discards all cached publishes. The statistics are kept.
+        """
+        self._publishes.clear()
+
+    def find(self, context, publish_name=None, publish_type=None):
+        """
+        Returns the publishes of the supplied context matching the supplied
+        name and type.
+
+        :param context: The context to find the publishes of.
+        :param str publish_name: If set, only publishes whose name starts with
+            this name are returned.
+        :param str publish_type: If set, only publishes of this type are
+            returned.
+
+        :returns: A list of publish dictionaries, with the standard "id" and
+            "type" as well as the "name" and "version_number" fields.
+        """
+        key = self._get_key(context.project, context.entity, context.task)
+
+        publishes = self._get(key)
+        if publishes is None:
+            publishes = self._find(context)
+            self._add(key, publishes)
+
+        # shotgun compares strings case insensitively
+        publish_name = publish_name.lower() if publish_name else None
+        publish_type = publish_type.lower() if publish_type else None
+
+        return [
+            dict(publish) for (publish, name, type_code) in publishes
+            if (not publish_name or name.startswith(publish_name)) and
+            (not publish_type or type_code == publish_type)
+        ]
+
+    @Threaded.exclusive
+    def discard(self, sg_publish_data):
+        """
+        Discards the cached publishes of the contexts the supplied publish
+        belongs to.
+
+        :param dict sg_publish_data: A registered publish, with its "project",
+            "entity" and "task" fields.
+        """
+        project = get_entity_key(sg_publish_data.get("project"))
+        entity = get_entity_key(sg_publish_data.get("entity"))
+        task = get_entity_key(sg_publish_data.get("task"))
+
+        for key in self._publishes.keys():
+            (key_project, key_entity, key_task) = key
+            if key_project == project and \
+                    key_entity in (None, entity) and key_task in (None, task):
+                del self._publishes[key]
+
+    def _find(self, context):
+        """
+        Finds all the publishes of the supplied context in Shotgun.
+
+        :returns: A list of ``(publish, lower case name, lower case type)``
+            tuples.
+        """
+        publisher = sgtk.platform.current_bundle()
+
+        publish_entity_type = sgtk.util.get_published_file_entity_type(publisher.sgtk)
+        if publish_entity_type == "PublishedFile":
+            publish_type_field = "published_file_type.PublishedFileType.code"
+        else:
+            publish_type_field = "tank_type.TankType.code"
+
+        # construct filters from the context:
+        filters = [["project", "is", context.project]]
+        if context.entity:
+            filters.append(["entity", "is", context.entity])
+        if context.task:
+            filters.append(["task", "is", context.task])
+
+        logger.debug("Finding all publishes for context: %s" % (context,))
+        sg_publishes = publisher.shotgun.find(
+            publish_entity_type,
+            filters,
+            ["name", "version_number", publish_type_field]
+        )
+
+        return [
+            (
+                publish,
+                (publish.get("name") or "").lower(),
+                (publish.pop(publish_type_field, None) or "").lower()
+            )
+            for publish in sg_publishes
+        ]
+
+    @Threaded.exclusive
+    def _get(self, key):
+        """
+        Returns the cached publishes for the supplied key, ``None`` if there
+        are none.
+        """
+        if key in self._publishes:
+            self._hits += 1
+            return self._publishes[key]
+
+        self._misses += 1
+        return None
+
+    @Threaded.exclusive
+    def _add(self, key, publishes):
+        """
+        Caches the supplied publishes.
+        """
+        self._publishes[key] = publishes
+
+    def _get_key(self, project, entity, task):
+        """
+        Returns the cache key for the supplied context entities.
+        """
+        return (
+            get_entity_key(project),
+            get_entity_key(entity),
+            get_entity_key(task)
+        )
+
+
+# the published files cache shared by all callers
+_published_files_cache = PublishedFilesCache()
+
+
+def get_published_files_cache():
+    """
+    Returns the :class:`PublishedFilesCache` shared by the publisher.
+
+    :returns: A :class:`PublishedFilesCache` instance.
+    """
+    return _published_files_cache
+
+
+def find_publishes(context, publish_name=None, publish_type=None):
+    """
+    Returns the existing publishes of the supplied context matching the
+    supplied name and type, using the publisher's :class:`PublishedFilesCache`.
+
+    :param context: The context to find the publishes of.
+    :param str publish_name: If set, only publishes whose name starts with this
+        name are returned.
+    :param str publish_type: If set, only publishes of this type are returned.
+
+    :returns: A list of publish dictionaries, with the standard "id" and "type"
+        as well as the "name" and "version_number" fields.
+    """
+    return _published_files_cache.find(context, publish_name, publish_type)
+
+
+def get_conflicting_publishes(context, path, publish_name, filters=None):
+    """
+    Returns a list of SG published file dicts for any existing publishes that
+    match the supplied context, path, and publish_name.
+
+    :param context: The context to search publishes for
+    :param path: The path to match against previous publishes
+    :param publish_name: The name of the publish.
+    :param filters: A list of additional SG find() filters to apply to the
+        publish search.
+
+    :return: A list of ``dict``s representing existing publishes that match
+        the supplied arguments. The paths returned are the standard "id", and
+        "type" as well as the "path" field.
+
+    This method is typically used by publish plugin hooks to determine if there
+    are existing publishes for a given context, publish_name, and path and
+    warning appropriately.
+
+    Publishes prefetched for the current validation pass, via
+    :func:`prefetch_conflicting_publishes`, are returned without querying
+    Shotgun.
+    """
+    publishes = _conflicting_publishes_cache.get(
+        context, path, publish_name, filters)
+    if publishes is not None:
+        return publishes
+
+    return get_conflicting_publishes_batch(
+        [(context, path, publish_name)],
+        filters
+    )[0]
+
+
+def get_conflicting_publishes_batch(publish_requests, filters=None):
+    """
+    Returns the existing publishes conflicting with each of the supplied
+    requests. This is the bulk equivalent of :func:`get_conflicting_publishes`.
+
+    Requests are grouped by project, entity and task, and a single SG find()
+    is issued for each group, rather than one per request. The paths of the
+    returned publishes are then matched against the requested paths locally.
+
+    :param publish_requests: A list of ``(context, path, publish_name)``
+        tuples.
+    :param filters: A list of additional SG find() filters to apply to the
+        publish search.
+
+    :return: A list holding, for each request and in the same order, the list
+        of ``dict``s representing existing publishes that match the request.
+        The publishes include the standard "id" and "type" as well as the
+        "path", "code" and "name" fields.
+    """
+
+    publisher = sgtk.platform.current_bundle()
+
+    logger.debug(
+        "Getting conflicting publishes for %s paths..." % (len(publish_requests),))
+
+    # ask core to do a dry_run of a publish with the supplied criteria. this is
+    # a workaround for our inability to filter publishes by path. so for now,
+    # get a dictionary of data that would be used to create a matching publish
+    # and use that to get publishes via a call to find(). Then we'll filter
+    # those by their path field. Once we have the ability in SG to filter by
+    # path, we can replace this whole method with a simple call to find().
+    groups = OrderedDict()
+    for (index, (context, path, publish_name)) in enumerate(publish_requests):
+        publish_data = sgtk.util.register_publish(
+            publisher.sgtk,
+            context,
+            path,
+            publish_name,
+            version_number=None,
+            dry_run=True
+        )
+        logger.debug("Publish dry run data: %s" % (publish_data,))
+
+        # publishes are matched by code, name and normalized path within the
+        # group of requests sharing the same project, entity and task
+        group_key = tuple(
+            get_entity_key(publish_data[field])
+            for field in ["project", "entity", "task"]
+        )
+        match_key = (
+            publish_data["code"],
+            publish_data["name"],
+            sgtk.util.ShotgunPath.normalize(path)
+        )
+        (_, requests) = groups.setdefault(group_key, (publish_data, {}))
+        requests.setdefault(match_key, []).append(index)
+
+    results = [[] for _ in publish_requests]
+    for (publish_data, requests) in groups.itervalues():
+
+        # keep the "in" filters of a single find() to a reasonable size
+        match_keys = sorted(requests)
+        for chunk_start in range(0, len(match_keys), _MAX_FILTER_VALUES):
+            chunk_keys = match_keys[chunk_start:chunk_start + _MAX_FILTER_VALUES]
+
+            # now build up the filters to match against
+            publish_filters = [filters] if filters else []
+            for field in ["entity", "project", "task"]:
+                publish_filters.append([field, "is", publish_data[field]])
+            publish_filters.append(
+                ["code", "in", sorted(set(key[0] for key in chunk_keys))])
+            publish_filters.append(
+                ["name", "in", sorted(set(key[1] for key in chunk_keys))])
+            logger.debug("Build publish filters: %s" % (publish_filters,))
+
+            publishes = publisher.shotgun.find(
+                "PublishedFile",
+                publish_filters,
+                ["path", "code", "name"]
+            )
+
+            # next, extract the publish path from each of the returned
+            # publishes and compare it against the requested paths. if the
+            # paths match, we add the publish to the publishes of the request.
+            logger.debug("Comparing publish paths...")
+            chunk_requests = dict((key, requests[key]) for key in chunk_keys)
+            for publish in publishes:
+                publish_path = sgtk.util.resolve_publish_path(
+                    publisher.sgtk, publish)
+                if not publish_path:
+                    continue
+
+                # ensure the published path is normalized for comparison
+                match_key = (
+                    publish["code"],
+                    publish["name"],
+                    sgtk.util.ShotgunPath.normalize(publish_path)
+                )
+                for index in chunk_requests.get(match_key, []):
+                    results[index].append(publish)
+
+    return results
@@ -210,6 +210,26 @@ class PublishTreeWidget(QtGui.QTreeWidget):
         else:
             self._summary_node.setHidden(False)
 
+    def add_items(self, publish_items):
+        """
+        Adds nodes for the supplied items, without the full synchronization
+        done by :meth:`build_tree`. This allows items to be displayed while
+        they are being collected.
+
+        Only top level items are added, their children are added along with
+        them.
+
+        :param publish_items: A list of publish api item instances which
+            aren't in the tree yet.
+        """
+        root_item = self._publish_manager.tree.root_item
+        for publish_item in publish_items:
+            if publish_item.parent == root_item:
+                self.__add_item(publish_item)
+
+        # show the summary once there is more than one item
+        self._summary_node.setHidden(len(root_item.children) < 2)
+
     def __ensure_context_node_exists(self, context):
         """
         Make sure a node representing the context exists in the tree
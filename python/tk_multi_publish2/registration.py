@@ -0,0 +1,646 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+import traceback
+import weakref
+
+import sgtk
+
+from .publish_cache import get_published_files_cache
+from .threaded import Threaded
+
+logger = sgtk.platform.get_logger(__name__)
+
+# the maximum number of failures detailed in a RegistrationError message
+_MAX_REPORTED_FAILURES = 10
+
+# the item property holding the publishes registered for an item
+_PUBLISH_DATA_LIST_KEY = "sg_publish_data_list"
+
+# the arguments of register_publish specific to each publish of a group of
+# publishes sharing their context, type and other arguments
+_PER_PUBLISH_ARGS = [
+    "comment",
+    "dependency_ids",
+    "dependency_paths",
+    "name",
+    "path",
+    "sg_fields",
+    "thumbnail_path",
+    "version_number",
+]
+
+
+class RegistrationError(sgtk.TankError):
+    """
+    Raised when one or more queued publishes failed to be registered.
+
+    The ``failures`` attribute holds the failed :class:`RegistrationRequest`
+    instances.
+    """
+    def __init__(self, failures, num_requests):
+        """
+        :param list failures: The failed :class:`RegistrationRequest` instances.
+        :param int num_requests: The total number of requests that were
+            processed.
+        """
+        self.failures = failures
+
+        lines = [
+            "Failed to register %d of %d publishes." % (len(failures), num_requests)
+        ]
+        for request in failures[:_MAX_REPORTED_FAILURES]:
+            if request.item is None:
+                lines.append(
+                    "Failed to register publish '%s'.\n%s" %
+                    (request.publish_data.get("name"), request.error)
+                )
+            else:
+                lines.append(
+                    "Failed to register publish '%s' for item '%s'.\n%s" %
+                    (request.publish_data.get("name"), request.item.name, request.error)
+                )
+        if len(failures) > _MAX_REPORTED_FAILURES:
+            lines.append(
+                "... and %d more." % (len(failures) - _MAX_REPORTED_FAILURES,)
+            )
+
+        super(RegistrationError, self).__init__("\n".join(lines))
+
+
+class RegistrationRequest(object):
+    """
+    A publish queued for registration.
+    """
+    __slots__ = [
+        "item",
+        "publish_data",
+        "dependencies",
+        "error_callback",
+        "sg_publish_data",
+        "error",
+    ]
+
+    def __init__(self, item, publish_data, dependencies=None, error_callback=None):
+        """
+        :param item: The :ref:`publish-api-item` the publish is registered for,
+            ``None`` for publishes registered independently of any item.
+        :param dict publish_data: The keyword arguments to supply to
+            ``sgtk.util.register_publish``.
+        :param list dependencies: Requests whose publishes the publish depends
+            on.
+        :param error_callback: An optional callable accepting the request,
+            called if the registration fails.
+        """
+        self.item = item
+        self.publish_data = publish_data
+        self.dependencies = dependencies or []
+        self.error_callback = error_callback
+        self.sg_publish_data = None
+        self.error = None
+
+    @property
+    def is_done(self):
+        """
+        ``True`` if the request was processed, successfully or not.
+        """
+        return self.sg_publish_data is not None or self.error is not None
+
+
+class RegistrationQueue(Threaded):
+    """
+    Queue of the publishes to register with Shotgun.
+
+    Publish plugins can queue the registration of their publishes during the
+    publish phase rather than registering each of them with a call to
+    ``sgtk.util.register_publish``. Each publish manager owns a queue, see
+    :attr:`~.api.PublishManager.registration_queue`, which it flushes once the
+    publish phase has processed all tasks. The publishes are created via
+    ``shotgun.batch`` calls, a chunk of publishes at a time. The publishes a
+    queued publish depends on are created first, so that their ids can be
+    used as dependencies.
+
+    Core is asked for the data of a single publish of each group of publishes
+    sharing their context, type and storage root, via a dry run of
+    ``sgtk.util.register_publish``. The data of the other publishes of the
+    group is derived from it.
+
+    Each registered publish is appended to the ``sg_publish_data_list``
+    property of its item. Until then, the property is set as a lazy value
+    which flushes the queue when accessed, so that plugins requiring the
+    publishes of an item during the publish phase still find them.
+    """
+
+    def __init__(self, batch_size=100, created_callback=None):
+        """
+        :param int batch_size: The maximum number of entities created by a
+            single ``shotgun.batch`` call.
+        :param created_callback: An optional callable accepting a list of
+            :class:`RegistrationRequest` instances, called as soon as the
+            publishes of a ``shotgun.batch`` call are created, before their
+            dependencies and thumbnails are.
+        """
+        Threaded.__init__(self)
+        self._batch_size = batch_size
+        self._created_callback = created_callback
+        self._requests = []
+        # the publish lists of the items with pending requests, keyed by id
+        self._publish_lists = {}
+        # failures not raised yet and the number of requests processed since
+        self._failures = []
+        self._num_processed = 0
+        self._num_batches = 0
+        self._num_registered = 0
+
+    @property
+    def stats(self):
+        """
+        A dictionary with the number of ``pending`` requests, the number of
+        publishes ``registered`` and the number of ``batches`` issued.
+        """
+        return {
+            "pending": len(self._requests),
+            "registered": self._num_registered,
+            "batches": self._num_batches,
+        }
+
+    def register_publish(self, item, publish_data, dependencies=None,
+                         error_callback=None):
+        """
+        Queues the registration of a publish.
+
+        :param item: The :ref:`publish-api-item` the publish is registered for.
+        :param dict publish_data: The keyword arguments to supply to
+            ``sgtk.util.register_publish``. The ids of the publishes registered
+            for the dependency requests are added to its ``dependency_ids``.
+        :param list dependencies: Pending :class:`RegistrationRequest`
+            instances whose publishes the publish depends on, typically those
+            returned by :meth:`get_pending_requests` for the parent item.
+        :param error_callback: An optional callable accepting the request,
+            called once the queue is flushed if the registration failed.
+
+        :returns: The queued :class:`RegistrationRequest`.
+        """
+        request = RegistrationRequest(item, publish_data, dependencies, error_callback)
+
+        if id(item) not in self._publish_lists:
+            # the publishes already registered for the item
+            publish_list = item.properties.get(_PUBLISH_DATA_LIST_KEY) or []
+            self._publish_lists[id(item)] = (item, publish_list)
+
+        self._add(request)
+
+        # flush the queue if the publishes of the item are required before the
+        # end of the publish phase. the provider is stored in the item's
+        # properties, it only references the item weakly to avoid a cycle.
+        item_ref = weakref.ref(item)
+        item.properties.set_lazy(
+            _PUBLISH_DATA_LIST_KEY,
+            lambda: self._get_publish_list(item_ref())
+        )
+
+        return request
+
+    def register(self, publish_data, dependencies=None, error_callback=None):
+        """
+        Queues the registration of a publish which isn't created for an item,
+        such as a publish whose registration was deferred. The registered
+        publish is available from the request's ``sg_publish_data`` once the
+        queue has been flushed.
+
+        :param dict publish_data: The keyword arguments to supply to
+            ``sgtk.util.register_publish``.
+        :param list dependencies: Pending :class:`RegistrationRequest`
+            instances whose publishes the publish depends on.
+        :param error_callback: An optional callable accepting the request,
+            called once the queue is flushed if the registration failed.
+
+        :returns: The queued :class:`RegistrationRequest`.
+        """
+        request = RegistrationRequest(None, publish_data, dependencies, error_callback)
+        self._add(request)
+        return request
+
+    def get_registered_publishes(self, item):
+        """
+        Returns the publishes already registered for the supplied item,
+        without flushing the queue.
+
+        :param item: A :ref:`publish-api-item`.
+
+        :returns: A list of publish dictionaries.
+        """
+        entry = self._publish_lists.get(id(item))
+        if entry and entry[0] is item:
+            return list(entry[1])
+
+        properties = item.properties
+        if (_PUBLISH_DATA_LIST_KEY in properties and
+                properties.is_resolved(_PUBLISH_DATA_LIST_KEY)):
+            return list(properties[_PUBLISH_DATA_LIST_KEY] or [])
+        return []
+
+    def get_pending_requests(self, item):
+        """
+        Returns the pending requests for the supplied item.
+
+        :param item: A :ref:`publish-api-item`.
+
+        :returns: A list of :class:`RegistrationRequest` instances.
+        """
+        return [request for request in self._requests if request.item is item]
+
+    def flush(self, raise_on_error=True):
+        """
+        Registers all queued publishes.
+
+        The error callback of each failed request is called once all
+        publishes have been processed.
+
+        :param bool raise_on_error: Whether to raise if a registration failed.
+            Failures are otherwise raised by the next flush raising errors.
+
+        :returns: The list of processed :class:`RegistrationRequest` instances.
+
+        :raises: :class:`RegistrationError` if a registration failed, since the
+            last time failures were raised.
+        """
+        requests = self._take()
+        if not requests:
+            self._raise_failures(raise_on_error)
+            return []
+
+        logger.debug("Registering %d queued publishes..." % (len(requests),))
+
+        remaining = requests
+        while remaining:
+            # the requests whose dependencies were all processed
+            ready = []
+            waiting = []
+            for request in remaining:
+                failed_dependencies = [
+                    dependency for dependency in request.dependencies
+                    if dependency.error is not None
+                ]
+                if failed_dependencies:
+                    request.error = (
+                        "Failed to register the publishes it depends on."
+                    )
+                elif all(dependency.is_done for dependency in request.dependencies):
+                    ready.append(request)
+                else:
+                    waiting.append(request)
+
+            if not ready:
+                # dependencies that were never queued
+                for request in waiting:
+                    request.error = "The publishes it depends on were not registered."
+                break
+
+            self._register(ready)
+            remaining = waiting
+
+        self._update_items(requests)
+
+        failures = [request for request in requests if request.error is not None]
+        for request in failures:
+            if request.error_callback:
+                request.error_callback(request)
+
+        self._add_failures(failures, len(requests))
+        self._raise_failures(raise_on_error)
+
+        return requests
+
+    def _register(self, requests):
+        """
+        Registers the publishes of the supplied requests, whose dependencies
+        were all registered.
+        """
+        publisher = sgtk.platform.current_bundle()
+
+        # ask core for the data of the publishes, as they would be created by
+        # register_publish, once per group of similar publishes
+        group_data = {}
+        entity_requests = []
+        for request in requests:
+            publish_data = dict(request.publish_data)
+            publish_data["dependency_ids"] = list(
+                publish_data.get("dependency_ids") or []
+            ) + [
+                dependency.sg_publish_data["id"]
+                for dependency in request.dependencies
+            ]
+            request.publish_data = publish_data
+
+            try:
+                data = self._get_entity_data(publish_data, group_data)
+            except Exception:
+                request.error = traceback.format_exc()
+                continue
+
+            entity_type = data.pop("type")
+            entity_requests.append((request, entity_type, data))
+
+        # create the publishes
+        for chunk_start in range(0, len(entity_requests), self._batch_size):
+            chunk = entity_requests[chunk_start:chunk_start + self._batch_size]
+            try:
+                results = publisher.shotgun.batch([
+                    {
+                        "request_type": "create",
+                        "entity_type": entity_type,
+                        "data": data,
+                    }
+                    for (_, entity_type, data) in chunk
+                ])
+            except Exception:
+                # batches are atomic, none of the publishes were created
+                error = traceback.format_exc()
+                for (request, _, _) in chunk:
+                    request.error = error
+                continue
+
+            self._count_batch(len(results))
+            for ((request, _, _), sg_publish_data) in zip(chunk, results):
+                request.sg_publish_data = sg_publish_data
+                # the next version numbers of the context have changed
+                get_published_files_cache().discard(sg_publish_data)
+
+            if self._created_callback:
+                self._created_callback([request for (request, _, _) in chunk])
+
+        registered = [request for request in requests if request.sg_publish_data]
+        self._create_dependencies(registered)
+        self._upload_thumbnails(registered)
+
+    def _get_entity_data(self, publish_data, group_data):
+        """
+        Returns the data of the entity to create for the supplied
+        ``register_publish`` arguments, including its ``type``.
+
+        The data is derived from that of a previous publish of the same group,
+        found in the supplied dictionary. Core is otherwise asked for it via
+        a dry run, whose data is added to the dictionary for the following
+        publishes of the group.
+        """
+        key = tuple(sorted(
+            (name, id(value) if name == "tk" else repr(value))
+            for (name, value) in publish_data.iteritems()
+            if name not in _PER_PUBLISH_ARGS
+        ))
+
+        if key in group_data:
+            data = _derive_entity_data(group_data[key], publish_data)
+            if data is not None:
+                return data
+
+        data = sgtk.util.register_publish(dry_run=True, **publish_data)
+        group_data.setdefault(key, (publish_data, dict(data)))
+        return data
+
+    def _create_dependencies(self, requests):
+        """
+        Creates the dependency entities of the supplied registered publishes.
+        """
+        publisher = sgtk.platform.current_bundle()
+
+        publish_entity_type = sgtk.util.get_published_file_entity_type(publisher.sgtk)
+        if publish_entity_type == "PublishedFile":
+            (dependency_entity_type, publish_field, dependent_field) = (
+                "PublishedFileDependency",
+                "published_file",
+                "dependent_published_file"
+            )
+        else:
+            (dependency_entity_type, publish_field, dependent_field) = (
+                "TankDependency",
+                "tank_published_file",
+                "dependent_tank_published_file"
+            )
+
+        # look up the publishes of all dependency paths at once
+        dependency_paths = set()
+        for request in requests:
+            dependency_paths.update(request.publish_data.get("dependency_paths") or [])
+        publishes_by_path = {}
+        if dependency_paths:
+            publishes_by_path = sgtk.util.find_publish(
+                publisher.sgtk,
+                sorted(dependency_paths)
+            )
+
+        dependency_requests = []
+        for request in requests:
+            dependents = [
+                {"type": publish_entity_type, "id": dependency_id}
+                for dependency_id in request.publish_data.get("dependency_ids") or []
+            ]
+            for path in request.publish_data.get("dependency_paths") or []:
+                if path in publishes_by_path:
+                    dependents.append(publishes_by_path[path])
+                else:
+                    logger.debug(
+                        "No publish found for dependency path '%s'." % (path,))
+
+            for dependent in dependents:
+                dependency_requests.append((
+                    request,
+                    {
+                        "request_type": "create",
+                        "entity_type": dependency_entity_type,
+                        "data": {
+                            publish_field: request.sg_publish_data,
+                            dependent_field: {
+                                "type": dependent["type"],
+                                "id": dependent["id"]
+                            },
+                        },
+                    }
+                ))
+
+        for chunk_start in range(0, len(dependency_requests), self._batch_size):
+            chunk = dependency_requests[chunk_start:chunk_start + self._batch_size]
+            try:
+                publisher.shotgun.batch([batch_request for (_, batch_request) in chunk])
+            except Exception:
+                # the publishes were created, report them as failed for them
+                # to be undone
+                error = traceback.format_exc()
+                for (request, _) in chunk:
+                    request.error = error
+                continue
+            self._count_batch(0)
+
+    def _upload_thumbnails(self, requests):
+        """
+        Uploads the thumbnails of the supplied registered publishes.
+        """
+        publisher = sgtk.platform.current_bundle()
+
+        for request in requests:
+            thumbnail_path = request.publish_data.get("thumbnail_path")
+            if not thumbnail_path or request.error is not None:
+                continue
+
+            try:
+                publisher.shotgun.upload_thumbnail(
+                    request.sg_publish_data["type"],
+                    request.sg_publish_data["id"],
+                    thumbnail_path
+                )
+            except Exception:
+                logger.warning(
+                    "Failed to upload the thumbnail of publish %s: %s" %
+                    (request.sg_publish_data["id"], traceback.format_exc())
+                )
+
+    def _update_items(self, requests):
+        """
+        Stores the registered publishes on the items of the supplied
+        requests.
+        """
+        for request in requests:
+            if request.sg_publish_data is None or request.item is None:
+                continue
+            (_, publish_list) = self._publish_lists[id(request.item)]
+            publish_list.append(request.sg_publish_data)
+
+        for (item, publish_list) in self._pop_publish_lists(requests):
+            if publish_list:
+                item.properties[_PUBLISH_DATA_LIST_KEY] = publish_list
+            elif _PUBLISH_DATA_LIST_KEY in item.properties:
+                del item.properties[_PUBLISH_DATA_LIST_KEY]
+
+    def _get_publish_list(self, item):
+        """
+        Returns the publishes of the supplied item, once the queue has been
+        flushed.
+        """
+        # failures of other items are raised at the end of the publish phase
+        self.flush(raise_on_error=False)
+        return item.properties.get(_PUBLISH_DATA_LIST_KEY, [])
+
+    def _raise_failures(self, raise_on_error):
+        """
+        Raises a :class:`RegistrationError` for the failures not raised yet,
+        if requested.
+        """
+        if not raise_on_error:
+            return
+
+        (failures, num_processed) = self._take_failures()
+        if failures:
+            raise RegistrationError(failures, num_processed)
+
+    @Threaded.exclusive
+    def _add(self, request):
+        """
+        Queues the supplied request.
+        """
+        self._requests.append(request)
+
+    @Threaded.exclusive
+    def _take(self):
+        """
+        Returns and dequeues all pending requests.
+        """
+        (requests, self._requests) = (self._requests, [])
+        return requests
+
+    @Threaded.exclusive
+    def _add_failures(self, failures, num_processed):
+        """
+        Records the supplied failures, out of the supplied number of processed
+        requests.
+        """
+        self._failures.extend(failures)
+        self._num_processed += num_processed
+
+    @Threaded.exclusive
+    def _take_failures(self):
+        """
+        Returns and forgets the failures not raised yet, along with the number
+        of requests processed since failures were last raised.
+        """
+        result = (self._failures, self._num_processed)
+        (self._failures, self._num_processed) = ([], 0)
+        return result
+
+    @Threaded.exclusive
+    def _pop_publish_lists(self, requests):
+        """
+        Returns and forgets the publish lists of the items of the supplied
+        requests, as ``(item, publish_list)`` tuples.
+        """
+        publish_lists = []
+        for request in requests:
+            if request.item is None:
+                continue
+            entry = self._publish_lists.pop(id(request.item), None)
+            if entry:
+                publish_lists.append(entry)
+        return publish_lists
+
+    @Threaded.exclusive
+    def _count_batch(self, num_registered):
+        """
+        Records a batch call, which registered the supplied number of
+        publishes.
+        """
+        self._num_batches += 1
+        self._num_registered += num_registered
+
+
+def _derive_entity_data(group_entry, publish_data):
+    """
+    Derives the entity data of a publish from the data core returned for
+    another publish of the same group, supplied as a ``(register_publish
+    arguments, entity data)`` tuple.
+
+    :returns: The entity data or ``None`` if the path of the publish isn't
+        within the storage root of the other publish, its data then has to be
+        built by core.
+    """
+    (group_publish_data, group_entity_data) = group_entry
+
+    # the data of publishes outside of the storages, such as urls, depends on
+    # their path
+    group_path_data = group_entity_data.get("path") or {}
+    group_path_cache = group_entity_data.get("path_cache")
+    if not group_path_cache or not group_path_data.get("local_path"):
+        return None
+
+    # the storage root is the part of the path the path cache is relative to
+    group_path = group_publish_data["path"].replace(os.sep, "/")
+    if not group_path.endswith("/" + group_path_cache):
+        return None
+    storage_root = group_path[:-len(group_path_cache)]
+
+    path = publish_data["path"]
+    if not path.replace(os.sep, "/").startswith(storage_root):
+        return None
+
+    data = dict(group_entity_data)
+    for field in group_publish_data.get("sg_fields") or {}:
+        data.pop(field, None)
+
+    data.update({
+        "code": os.path.basename(path),
+        "description": publish_data.get("comment", ""),
+        "name": publish_data.get("name"),
+        "version_number": publish_data.get("version_number"),
+        "path": dict(group_path_data, local_path=path),
+        "path_cache": path.replace(os.sep, "/")[len(storage_root):],
+    })
+    data.update(publish_data.get("sg_fields") or {})
+
+    return data
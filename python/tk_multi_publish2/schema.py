@@ -0,0 +1,156 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import time
+
+import sgtk
+
+from .threaded import Threaded
+
+logger = sgtk.platform.get_logger(__name__)
+
+
+class SchemaCache(Threaded):
+    """
+    Cache of the Shotgun schema of the entity types used during a publish
+    session.
+
+    The fields of an entity type are read once per site and entity type and
+    shared by all hooks, until they expire after the cache's time to live.
+    Failed reads are not cached.
+    """
+
+    # the default number of seconds cached schemas are valid for
+    DEFAULT_TTL = 600
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        """
+        Construction
+
+        :param float ttl: The number of seconds cached schemas are valid for.
+        """
+        Threaded.__init__(self)
+        self._ttl = ttl
+        self._schemas = {}
+        self._hits = 0
+        self._misses = 0
+        self._reads = 0
+
+    @property
+    def stats(self):
+        """
+        A dictionary with the number of cache ``hits`` and ``misses``, the
+        number of schema ``reads`` issued to Shotgun and the current number of
+        cached entity types, ``size``.
+        """
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "reads": self._reads,
+            "size": len(self._schemas),
+        }
+
+    @Threaded.exclusive
+    def clear(self):
+        """
+        Discards all cached schemas. The statistics are kept.
+        """
+        self._schemas.clear()
+
+    def get_fields(self, entity_type):
+        """
+        Returns the fields of the supplied entity type, as returned by
+        ``shotgun.schema_field_read``.
+
+        :param str entity_type: The entity type to get the fields of.
+
+        :returns: A dictionary of field names and their schema.
+
+        :raises: Any error raised by Shotgun when reading the schema.
+        """
+        shotgun = sgtk.platform.current_bundle().shotgun
+        key = (getattr(shotgun, "base_url", None), entity_type)
+
+        fields = self._get(key)
+        if fields is None:
+            self._count_read()
+            fields = shotgun.schema_field_read(entity_type)
+            self._add(key, fields)
+
+        return fields
+
+    def prefetch(self, entity_types):
+        """
+        Reads the schema of the supplied entity types which are not cached yet.
+        Failures are logged and otherwise ignored.
+
+        :param list entity_types: The entity types to read the schema of.
+        """
+        for entity_type in entity_types:
+            try:
+                self.get_fields(entity_type)
+            except Exception, e:
+                logger.debug(
+                    "Failed to prefetch the '%s' schema: %s" % (entity_type, e))
+
+    @Threaded.exclusive
+    def _get(self, key):
+        """
+        Returns the cached fields for the supplied key if they haven't expired,
+        ``None`` otherwise.
+        """
+        entry = self._schemas.get(key)
+        if entry and time.time() - entry[0] < self._ttl:
+            self._hits += 1
+            return entry[1]
+
+        self._misses += 1
+        return None
+
+    @Threaded.exclusive
+    def _add(self, key, fields):
+        """
+        Caches the supplied fields.
+        """
+        self._schemas[key] = (time.time(), fields)
+
+    @Threaded.exclusive
+    def _count_read(self):
+        """
+        Records a schema read.
+        """
+        self._reads += 1
+
+
+# the schema cache shared by all callers
+_schema_cache = SchemaCache()
+
+
+def get_schema_cache():
+    """
+    Returns the :class:`SchemaCache` shared by the publisher.
+
+    :returns: A :class:`SchemaCache` instance.
+    """
+    return _schema_cache
+
+
+def get_schema_fields(entity_type):
+    """
+    Returns the fields of the supplied Shotgun entity type, using the
+    publisher's :class:`SchemaCache`.
+
+    :param str entity_type: The entity type to get the fields of.
+
+    :returns: A dictionary of field names and their schema.
+
+    :raises: Any error raised by Shotgun when reading the schema.
+    """
+    return _schema_cache.get_fields(entity_type)
@@ -0,0 +1,490 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import threading
+import time
+from contextlib import contextmanager
+
+import sgtk
+
+from .threaded import Threaded
+
+logger = sgtk.platform.get_logger(__name__)
+
+
+class ShotgunCallStats(Threaded):
+    """
+    Statistics on the Shotgun API calls issued by the publisher.
+
+    Connections are instrumented via :meth:`instrument`, after which each call
+    of a find, create, update, batch, upload or schema method is counted,
+    along with the time it took. Calls are recorded for the phase and plugin
+    of the scope they were issued in, see :meth:`scope`. Scopes are tracked
+    per thread, calls issued by threads outside of any scope are recorded
+    with a ``None`` phase and plugin.
+    """
+
+    # the category of each instrumented Shotgun API method
+    CATEGORIES = {
+        "find": "find",
+        "find_one": "find",
+        "summarize": "find",
+        "text_search": "find",
+        "create": "create",
+        "update": "update",
+        "delete": "update",
+        "revive": "update",
+        "batch": "batch",
+        "upload": "upload",
+        "upload_thumbnail": "upload",
+        "upload_filmstrip_thumbnail": "upload",
+        "schema_read": "schema",
+        "schema_entity_read": "schema",
+        "schema_field_read": "schema",
+    }
+
+    # the attribute flagging instrumented connections
+    _INSTRUMENTED_ATTR = "_tk_multi_publish2_instrumented"
+
+    def __init__(self):
+        """
+        Construction
+        """
+        Threaded.__init__(self)
+        # the [count, time] of the calls, keyed by (phase, plugin, category)
+        self._calls = {}
+        self._local = threading.local()
+
+    @property
+    def stats(self):
+        """
+        A dictionary of the calls recorded, keyed by phase, then plugin name,
+        then category. Each value is a dictionary with the ``count`` of calls
+        and the ``time`` they took, in seconds::
+
+            {
+                "validate": {
+                    "Publish to Shotgun": {
+                        "find": {"count": 3, "time": 0.12},
+                    },
+                },
+            }
+        """
+        stats = {}
+        for ((phase, plugin, category), (count, seconds)) in self._calls.items():
+            stats.setdefault(phase, {}).setdefault(plugin, {})[category] = {
+                "count": count,
+                "time": seconds,
+            }
+        return stats
+
+    def get_totals(self, phase=None, plugin=None):
+        """
+        Returns the calls recorded for the supplied phase and plugin, or for
+        all of them if not supplied, summed per category.
+
+        :param str phase: An optional phase name, such as ``validate``.
+        :param str plugin: An optional plugin name.
+
+        :returns: A dictionary of ``{"count": count, "time": time}``
+            dictionaries, keyed by category.
+        """
+        totals = {}
+        for ((call_phase, call_plugin, category), (count, seconds)) in self._calls.items():
+            if phase is not None and call_phase != phase:
+                continue
+            if plugin is not None and call_plugin != plugin:
+                continue
+            total = totals.setdefault(category, {"count": 0, "time": 0.0})
+            total["count"] += count
+            total["time"] += seconds
+        return totals
+
+    def format_report(self, phase=None):
+        """
+        Returns a human readable report of the calls recorded for the supplied
+        phase, or for all phases, per plugin and category.
+
+        :param str phase: An optional phase name, such as ``validate``.
+
+        :returns: A string.
+        """
+        lines = []
+        for ((call_phase, plugin, category), (count, seconds)) in sorted(self._calls.items()):
+            if phase is not None and call_phase != phase:
+                continue
+            lines.append(
+                "%-10s %-40s %-8s %6d calls %8.3fs" %
+                (call_phase or "-", plugin or "-", category, count, seconds)
+            )
+        return "\n".join(lines)
+
+    @Threaded.exclusive
+    def clear(self, phase=None):
+        """
+        Forgets the calls recorded for the supplied phase, or for all phases.
+
+        :param str phase: An optional phase name, such as ``validate``.
+        """
+        if phase is None:
+            self._calls = {}
+            return
+        for key in self._calls.keys():
+            if key[0] == phase:
+                del self._calls[key]
+
+    @contextmanager
+    def scope(self, phase=None, plugin=None):
+        """
+        Context manager recording the calls issued by the current thread for
+        the supplied phase and plugin. Nested scopes inherit the phase and
+        plugin they don't supply from their enclosing scope::
+
+            with call_stats.scope(phase="validate"):
+                with call_stats.scope(plugin=plugin.name):
+                    plugin.run_validate(settings, item)
+
+        :param str phase: The name of the phase.
+        :param str plugin: The name of the plugin.
+        """
+        scopes = self._get_scopes()
+        (outer_phase, outer_plugin) = scopes[-1] if scopes else (None, None)
+        scopes.append((phase or outer_phase, plugin or outer_plugin))
+        try:
+            yield
+        finally:
+            scopes.pop()
+
+    def instrument(self, connection):
+        """
+        Instruments the supplied Shotgun connection for its calls to be
+        recorded. Connections are only instrumented once.
+
+        :param connection: A ``shotgun_api3.Shotgun`` connection.
+
+        :returns: The supplied connection.
+        """
+        if getattr(connection, self._INSTRUMENTED_ATTR, False):
+            return connection
+
+        for (method_name, category) in self.CATEGORIES.iteritems():
+            method = getattr(connection, method_name, None)
+            if method is not None:
+                setattr(
+                    connection,
+                    method_name,
+                    self._wrap(method, category)
+                )
+
+        setattr(connection, self._INSTRUMENTED_ATTR, True)
+        return connection
+
+    def _wrap(self, method, category):
+        """
+        Returns a function calling the supplied method and recording the call.
+        """
+        def wrapper(*args, **kwargs):
+            start_time = time.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._record(category, time.time() - start_time)
+
+        return wrapper
+
+    def _get_scopes(self):
+        """
+        Returns the stack of (phase, plugin) scopes of the current thread.
+        """
+        scopes = getattr(self._local, "scopes", None)
+        if scopes is None:
+            scopes = self._local.scopes = []
+        return scopes
+
+    def _record(self, category, seconds):
+        """
+        Records a call of the supplied category for the current scope.
+        """
+        scopes = self._get_scopes()
+        (phase, plugin) = scopes[-1] if scopes else (None, None)
+        self._add((phase, plugin, category), seconds)
+
+    @Threaded.exclusive
+    def _add(self, key, seconds):
+        """
+        Adds a call which took the supplied time to the supplied key.
+        """
+        entry = self._calls.get(key)
+        if entry is None:
+            self._calls[key] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+
+# the statistics on the Shotgun calls of all connections
+_call_stats = ShotgunCallStats()
+
+
+def get_call_stats():
+    """
+    Returns the :class:`ShotgunCallStats` shared by the publisher.
+
+    :returns: A :class:`ShotgunCallStats` instance.
+    """
+    return _call_stats
+
+
+class ShotgunPool(Threaded):
+    """
+    Pool of Shotgun connections, handing out a connection per thread.
+
+    Shotgun connections are not safe to share across threads. Hooks running
+    work on several threads can call :meth:`get` from each of them to issue
+    their queries through a connection of their own, created for the current
+    user on the first call of a thread.
+
+    Connections are kept for reuse by the following calls of the same thread.
+    Once their thread has exited, they are handed out to new threads.
+    Connections left idle for longer than the pool's idle timeout are evicted,
+    as are the least recently used connections once the pool exceeds its
+    maximum size. The pool should therefore be sized for the number of threads
+    issuing queries concurrently, evicted threads creating a new connection on
+    their next call.
+
+    The requests issued through the connections of the pool are counted per
+    method, see :attr:`request_counts`.
+    """
+
+    DEFAULT_MAX_SIZE = 8
+    DEFAULT_IDLE_TIMEOUT = 300
+
+    def __init__(self, max_size=None, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 connection_factory=None):
+        """
+        :param int max_size: The maximum number of connections kept by the
+            pool. If not supplied, it is read from the ``shotgun_pool_size``
+            setting of the publisher on first use.
+        :param float idle_timeout: The number of seconds after which an unused
+            connection is evicted.
+        :param connection_factory: An optional callable returning a new
+            Shotgun connection. Connections are created for the current user
+            by default.
+        """
+        Threaded.__init__(self)
+        self._max_size = max_size
+        self._idle_timeout = idle_timeout
+        self._connection_factory = connection_factory or _create_shotgun_connection
+        # the [connection, last used time] of each thread, keyed by thread
+        self._connections = {}
+        # the [connection, last used time] released by exited threads
+        self._free_connections = []
+        self._request_counts = {}
+        self._num_created = 0
+        self._num_evicted = 0
+
+    @property
+    def max_size(self):
+        """
+        The maximum number of connections kept by the pool.
+        """
+        if self._max_size is None:
+            publisher = sgtk.platform.current_bundle()
+            self._max_size = max(
+                1,
+                publisher.get_setting("shotgun_pool_size", self.DEFAULT_MAX_SIZE)
+            )
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, max_size):
+        self._max_size = max(1, max_size)
+
+    @property
+    def stats(self):
+        """
+        A dictionary with the number of connections in the pool, ``size``,
+        the number of connections ``created`` and ``evicted`` and the total
+        number of ``requests`` issued.
+        """
+        return {
+            "size": len(self._connections) + len(self._free_connections),
+            "created": self._num_created,
+            "evicted": self._num_evicted,
+            "requests": sum(self._request_counts.values()),
+        }
+
+    @property
+    def request_counts(self):
+        """
+        A dictionary of the number of requests issued through the pool, keyed
+        by Shotgun API method name, such as ``find`` or ``create``.
+        """
+        return dict(self._request_counts)
+
+    def get(self):
+        """
+        Returns the Shotgun connection of the current thread.
+
+        :returns: A proxy to a ``shotgun_api3.Shotgun`` connection, counting
+            the requests issued through it.
+        """
+        thread = threading.current_thread()
+        max_size = self.max_size
+
+        connection = self._acquire(thread)
+        if connection is None:
+            connection = PooledShotgunConnection(
+                self,
+                _call_stats.instrument(self._connection_factory())
+            )
+            self._add(thread, connection, max_size)
+        return connection
+
+    @Threaded.exclusive
+    def clear(self):
+        """
+        Evicts all the connections of the pool.
+        """
+        self._num_evicted += len(self._connections) + len(self._free_connections)
+        self._connections = {}
+        self._free_connections = []
+
+    @Threaded.exclusive
+    def _acquire(self, thread):
+        """
+        Returns the connection of the supplied thread, or a connection released
+        by an exited thread, ``None`` if a new connection is required.
+        """
+        self._evict()
+
+        now = time.time()
+        entry = self._connections.get(thread)
+        if entry is None:
+            if not self._free_connections:
+                return None
+            entry = self._free_connections.pop()
+            self._connections[thread] = entry
+
+        entry[1] = now
+        return entry[0]
+
+    @Threaded.exclusive
+    def _add(self, thread, connection, max_size):
+        """
+        Stores the new connection of the supplied thread, evicting the least
+        recently used connections exceeding the maximum size of the pool.
+        """
+        self._connections[thread] = [connection, time.time()]
+        self._num_created += 1
+
+        # connections of exited threads are evicted first
+        excess = len(self._connections) + len(self._free_connections) - max_size
+        while excess > 0 and self._free_connections:
+            self._free_connections.pop(0)
+            self._num_evicted += 1
+            excess -= 1
+
+        if excess > 0:
+            # evicted connections are not shared, their threads can keep using
+            # them until they get a new connection from the pool
+            others = sorted(
+                (entry[1], id(other_thread), other_thread)
+                for (other_thread, entry) in self._connections.iteritems()
+                if other_thread is not thread
+            )
+            for (_, _, other_thread) in others[:excess]:
+                del self._connections[other_thread]
+                self._num_evicted += 1
+
+    def _evict(self):
+        """
+        Releases the connections of exited threads and evicts idle
+        connections. Must be called with the lock acquired.
+        """
+        expiry_time = time.time() - self._idle_timeout
+
+        for (thread, entry) in self._connections.items():
+            if entry[1] < expiry_time:
+                del self._connections[thread]
+                self._num_evicted += 1
+            elif not thread.is_alive():
+                del self._connections[thread]
+                self._free_connections.append(entry)
+
+        num_free = len(self._free_connections)
+        self._free_connections = [
+            entry for entry in self._free_connections if entry[1] >= expiry_time
+        ]
+        self._num_evicted += num_free - len(self._free_connections)
+
+    @Threaded.exclusive
+    def _count_request(self, method_name):
+        """
+        Records a request issued through a connection of the pool.
+        """
+        self._request_counts[method_name] = self._request_counts.get(method_name, 0) + 1
+
+
+class PooledShotgunConnection(object):
+    """
+    Proxy to a Shotgun connection handed out by a :class:`ShotgunPool`,
+    counting the requests issued through it.
+    """
+
+    def __init__(self, pool, connection):
+        """
+        :param pool: The :class:`ShotgunPool` the connection belongs to.
+        :param connection: The ``shotgun_api3.Shotgun`` connection.
+        """
+        self._pool = pool
+        self._connection = connection
+
+    @property
+    def connection(self):
+        """
+        The proxied ``shotgun_api3.Shotgun`` connection.
+        """
+        return self._connection
+
+    def __getattr__(self, name):
+        value = getattr(self._connection, name)
+        if name.startswith("_") or not callable(value):
+            return value
+
+        def request(*args, **kwargs):
+            self._pool._count_request(name)
+            return value(*args, **kwargs)
+
+        return request
+
+
+def _create_shotgun_connection():
+    """
+    Returns a new Shotgun connection for the current user, or for the script
+    user configured for the pipeline if there is no authenticated user.
+    """
+    user = sgtk.get_authenticated_user()
+    if user is None:
+        return sgtk.util.shotgun.create_sg_connection()
+    return user.create_sg_connection()
+
+
+# the pool of connections shared by all hooks, see ShotgunPool.get
+_shotgun_pool = ShotgunPool()
+
+
+def get_shotgun_pool():
+    """
+    Returns the :class:`ShotgunPool` shared by the publisher.
+
+    :returns: A :class:`ShotgunPool` instance.
+    """
+    return _shotgun_pool
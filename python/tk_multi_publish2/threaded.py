@@ -0,0 +1,54 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import threading
+
+
+class Threaded(object):
+    """
+    Threaded base class that contains a threading.Lock member and an
+    'exclusive' function decorator that implements exclusive access
+    to the contained code using the lock
+    """
+    def __init__(self):
+        """
+        Construction
+        """
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def exclusive(func):
+        """
+        Static method intended to be used as a function decorator in derived
+        classes.  Use it by doing:
+
+            @Threaded.exclusive
+            def my_method(self, ...):
+                ...
+
+        :param func:    Function to decorate/wrap
+        :returns:       Wrapper function that executes the function inside the acquired lock
+        """
+        def wrapper(self, *args, **kwargs):
+            """
+            Internal wrapper method that executes the function with the specified arguments
+            inside the acquired lock
+
+            :param *args:       The function parameters
+            :param **kwargs:    The function named parameters
+            :returns:           The result of the function call
+            """
+            self._lock.acquire()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                self._lock.release()
+
+        return wrapper
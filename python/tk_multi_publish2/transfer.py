@@ -0,0 +1,676 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import errno
+import hashlib
+import os
+import Queue
+import stat
+import sys
+import threading
+import traceback
+
+try:
+    import fcntl
+except ImportError:
+    # not available on windows
+    fcntl = None
+
+import sgtk
+from sgtk.util import filesystem
+
+from . import util
+
+logger = sgtk.platform.get_logger(__name__)
+
+# substituted for the frame number when resolving a destination path pattern.
+# it is then split on to build the destination path of each frame.
+_FRAME_MARKER = "__TK_PUBLISH2_FRAME__"
+
+# the maximum number of failures detailed in a TransferError message
+_MAX_REPORTED_FAILURES = 10
+
+# the permissions of sealed, published files
+_READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+# the ioctl request cloning a file on copy-on-write file systems (linux)
+_FICLONE = 0x40049409
+
+# the number of bytes read at once when copying or hashing files
+_CHUNK_SIZE = 1024 * 1024
+
+# errors reported when a file system or kernel doesn't support a strategy
+_UNSUPPORTED_ERRORS = set(
+    getattr(errno, name) for name in
+    ("EXDEV", "EPERM", "EINVAL", "ENOSYS", "ENOTTY", "EOPNOTSUPP", "ENOTSUP")
+    if hasattr(errno, name)
+)
+
+# transfer modes, as configured by the "Transfer Mode" plugin setting.
+# "copy", the default, always copies the bytes of the files, "auto" lets the
+# file system clone the files where supported and "link" also hardlinks files
+# to destinations on the same device.
+TRANSFER_MODE_COPY = "copy"
+TRANSFER_MODE_AUTO = "auto"
+TRANSFER_MODE_LINK = "link"
+TRANSFER_MODES = (TRANSFER_MODE_COPY, TRANSFER_MODE_AUTO, TRANSFER_MODE_LINK)
+
+# strategies used to transfer a file, reported per file
+HARDLINK = "hardlink"
+REFLINK = "reflink"
+COPY = "copy"
+IN_PLACE = "in place"
+UNCHANGED = "unchanged"
+
+
+class TransferError(sgtk.TankError):
+    """
+    Raised when one or more files failed to be transferred.
+
+    The ``failures`` attribute holds a list of ``(TransferJob, error)`` tuples,
+    where ``error`` is the formatted traceback of the failure.
+    """
+    def __init__(self, failures, num_jobs):
+        """
+        :param list failures: A list of ``(TransferJob, error)`` tuples.
+        :param int num_jobs: The total number of files that were transferred.
+        """
+        self.failures = failures
+
+        lines = [
+            "Failed to copy %d of %d files." % (len(failures), num_jobs)
+        ]
+        for (job, error) in failures[:_MAX_REPORTED_FAILURES]:
+            lines.append(
+                "Failed to copy file from '%s' to '%s'.\n%s" %
+                (job.source, job.destination, error)
+            )
+        if len(failures) > _MAX_REPORTED_FAILURES:
+            lines.append(
+                "... and %d more." % (len(failures) - _MAX_REPORTED_FAILURES,)
+            )
+
+        super(TransferError, self).__init__("\n".join(lines))
+
+
+class TransferJob(object):
+    """
+    A file to transfer to a destination path.
+
+    Once transferred, ``strategy`` holds the strategy used for the file. One
+    of ``hardlink``, ``reflink``, ``copy``, ``in place`` or
+    ``unchanged``, for existing files skipped by a resumed transfer. If
+    checksums were requested, ``digest`` holds the hex digest of the file.
+    """
+    __slots__ = ["source", "destination", "strategy", "digest"]
+
+    def __init__(self, source, destination):
+        """
+        :param str source: The path of the file to transfer.
+        :param str destination: The path to transfer the file to.
+        """
+        self.source = source
+        self.destination = destination
+        self.strategy = None
+        self.digest = None
+
+    def __repr__(self):
+        return "<%s: %s -> %s>" % (
+            self.__class__.__name__, self.source, self.destination
+        )
+
+
+def get_transfer_jobs(src_files, dest_path, is_sequence=False):
+    """
+    Returns the jobs required to transfer the supplied files to the destination
+    path.
+
+    For sequences, the frame number of the first source file and the frame
+    specification of the destination path are parsed once, via the
+    ``path_info`` hook. The paths of the remaining frames are then derived
+    from these without any further parsing.
+
+    :param list src_files: The paths of the files to transfer.
+    :param str dest_path: The destination path. For sequences, a path
+        containing a frame specification such as ``%04d``.
+    :param bool is_sequence: ``True`` if the source files are the frames of a
+        sequence.
+
+    :returns: A list of :class:`TransferJob` instances, in the order of the
+        source files.
+    """
+    if not is_sequence:
+        return [TransferJob(src_file, dest_path) for src_file in src_files]
+
+    if not src_files:
+        return []
+
+    # split the destination path around its frame specification
+    dest_pattern = util.get_path_for_frame(dest_path, _FRAME_MARKER)
+    if dest_pattern and _FRAME_MARKER in dest_pattern:
+        (dest_head, dest_tail) = dest_pattern.split(_FRAME_MARKER, 1)
+    else:
+        dest_head = dest_tail = None
+
+    jobs = []
+    for (src_file, frame_num) in zip(src_files, util.get_frame_numbers(src_files)):
+        if dest_head is None or frame_num is None:
+            # not something we can derive, let the hook resolve the path
+            dest_file = util.get_path_for_frame(dest_path, frame_num)
+        else:
+            dest_file = "%s%s%s" % (dest_head, frame_num, dest_tail)
+        jobs.append(TransferJob(src_file, dest_file))
+
+    return jobs
+
+
+def is_unchanged(source, destination):
+    """
+    Returns ``True`` if the destination file is identical to its source, based
+    on their size and modification time, as left by a resumable
+    :class:`FileTransfer`.
+
+    :param str source: The path of the source file.
+    :param str destination: The path of the destination file.
+    """
+    try:
+        src_stat = os.stat(source)
+        dest_stat = os.stat(destination)
+    except OSError:
+        return False
+
+    if (src_stat.st_dev, src_stat.st_ino) == (dest_stat.st_dev, dest_stat.st_ino):
+        # hardlinked
+        return True
+
+    # compare whole seconds, the precision of some file systems
+    return (
+        src_stat.st_size == dest_stat.st_size and
+        int(src_stat.st_mtime) == int(dest_stat.st_mtime)
+    )
+
+
+def pack_checksums(algorithm, digests):
+    """
+    Returns a compact, serializable representation of the supplied digests.
+
+    The hex digests of all files, sharing the same length, are concatenated
+    into a single string rather than stored as a list::
+
+        {"algorithm": "md5", "digests": "9e107d9d372bb6826bd81d3542a419d6..."}
+
+    :param str algorithm: The name of the ``hashlib`` algorithm used.
+    :param list digests: The hex digests of the files, in order.
+
+    :returns: A dictionary.
+    """
+    return {"algorithm": algorithm, "digests": "".join(digests)}
+
+
+def unpack_checksums(checksums):
+    """
+    Returns the list of hex digests of checksums packed by
+    :func:`pack_checksums`.
+
+    :param dict checksums: The packed checksums.
+
+    :returns: A list of hex digests, in order.
+    """
+    digests = checksums["digests"]
+    size = hashlib.new(checksums["algorithm"]).digest_size * 2
+    return [digests[i:i + size] for i in range(0, len(digests), size)]
+
+
+class FileTransfer(object):
+    """
+    Copies files to their destination using a bounded pool of threads.
+
+    Destination folders are created once, up front. Failures are collected for
+    all files and reported together, once every file has been processed, via
+    a :class:`TransferError`.
+
+    Progress is reported, from the calling thread, via the optional callback.
+    It is called after each file with the number of files processed so far
+    and the total number of files.
+
+    Depending on the transfer mode, each file is transferred with the first of
+    these strategies supported for its destination:
+
+    - ``hardlink``: ``link`` mode only, when the source and destination are on
+      the same device. Sealing the published file also makes the source file
+      read-only since they share their data, as for in-place publishes.
+    - ``reflink``: A copy-on-write clone of the file, on linux file systems
+      supporting it.
+    - ``copy``: A buffered copy of the file, the only strategy of the
+      ``copy`` mode.
+
+    Published files are sealed, made read-only, whatever the strategy.
+
+    If a checksum algorithm is supplied, the digest of each file is computed
+    with a single read of its data. Copies are streamed through the hash and
+    linked or cloned files are hashed from their source. Whatever the
+    strategy, the size of each transferred file is verified against its
+    source and a :class:`~sgtk.TankError` is raised for files left short.
+    Their digest is also recomputed from the destination if ``verify`` is
+    set.
+
+    A resumable transfer skips the destination files left identical by a
+    previous, partial, transfer. Files are identical if they have the same
+    size and modification time, which resumable transfers preserve, and the
+    same digest if checksums are requested. Other existing destination files
+    are replaced.
+    """
+
+    def __init__(self, max_workers=1, progress_callback=None,
+                 cancellation_token=None, mode=TRANSFER_MODE_COPY,
+                 checksum_algorithm=None, verify=False, resume=False):
+        """
+        :param int max_workers: The maximum number of files copied concurrently.
+        :param progress_callback: An optional callable accepting the number of
+            files processed and the total number of files.
+        :param cancellation_token: An optional
+            :class:`~.api.CancellationToken`. Once cancelled, no more files
+            are copied and the corresponding error is raised.
+        :param str mode: The transfer mode, one of ``copy``, ``auto`` or
+            ``link``.
+        :param str checksum_algorithm: The name of an optional ``hashlib``
+            algorithm, such as ``md5`` or ``sha1``, used to compute the
+            digest of each file.
+        :param bool verify: ``True`` to verify the digest of the copied files
+            by reading them back from their destination.
+        :param bool resume: ``True`` to skip the destination files identical
+            to their source.
+        """
+        if mode not in TRANSFER_MODES:
+            raise sgtk.TankError(
+                "Invalid transfer mode '%s'. Expected one of: %s" %
+                (mode, ", ".join(TRANSFER_MODES))
+            )
+
+        if checksum_algorithm:
+            try:
+                hashlib.new(checksum_algorithm)
+            except ValueError:
+                raise sgtk.TankError(
+                    "Unsupported checksum algorithm '%s'." % (checksum_algorithm,)
+                )
+
+        self._max_workers = max(1, max_workers)
+        self._progress_callback = progress_callback
+        self._cancellation_token = cancellation_token
+        self._mode = mode
+        self._checksum_algorithm = checksum_algorithm
+        self._verify = verify
+        self._resume = resume
+
+        # the (strategy, folder) pairs a strategy isn't supported for, so it
+        # isn't attempted again for every frame of a sequence
+        self._unsupported = set()
+        # whether the (source folder, destination folder) pairs are on the
+        # same device
+        self._same_device = {}
+        self._strategy_counts = {}
+
+    @property
+    def checksum_algorithm(self):
+        """
+        The name of the algorithm used to compute the digest of each file,
+        ``None`` if checksums are not computed.
+        """
+        return self._checksum_algorithm
+
+    @property
+    def stats(self):
+        """
+        A dictionary of the number of files transferred, keyed by strategy.
+        """
+        return dict(self._strategy_counts)
+
+    def copy(self, jobs):
+        """
+        Copies the file of each supplied job to its destination.
+
+        Destination files are made read-only. Files whose source and
+        destination are the same have their permissions locked instead, and
+        are only read to compute their digest when checksums are requested.
+
+        :param list jobs: A list of :class:`TransferJob` instances.
+
+        :returns: A list of the destination paths of the copied files.
+
+        :raises: :class:`TransferError` if any of the files failed to copy.
+        """
+        # If the file paths are the same, lock permissions
+        copy_jobs = []
+        in_place_jobs = []
+        for job in jobs:
+            if job.source == job.destination:
+                filesystem.freeze_permissions(job.destination)
+                in_place_jobs.append(job)
+            else:
+                copy_jobs.append(job)
+
+        # files published in place still need their digest
+        process_jobs = copy_jobs
+        if self._checksum_algorithm:
+            process_jobs = copy_jobs + in_place_jobs
+
+        # create each destination folder once
+        dest_folders = set(os.path.dirname(job.destination) for job in copy_jobs)
+        for dest_folder in sorted(dest_folders):
+            filesystem.ensure_folder_exists(dest_folder)
+
+        failures = []
+        num_processed = 0
+        for (job, error) in self._run(process_jobs):
+            num_processed += 1
+            if error:
+                failures.append((job, error))
+            else:
+                self._strategy_counts[job.strategy] = (
+                    self._strategy_counts.get(job.strategy, 0) + 1
+                )
+                logger.debug(
+                    "Copied file '%s' to '%s' (%s)." %
+                    (job.source, job.destination, job.strategy)
+                )
+            if self._progress_callback:
+                self._progress_callback(num_processed, len(process_jobs))
+
+        if self._cancellation_token:
+            self._cancellation_token.raise_if_cancelled()
+
+        if failures:
+            raise TransferError(failures, len(process_jobs))
+
+        return [job.destination for job in copy_jobs]
+
+    def _run(self, jobs):
+        """
+        Copies the files of the supplied jobs, yielding a ``(job, error)``
+        tuple, in the calling thread, as each of them is processed.
+        """
+        num_workers = min(self._max_workers, len(jobs))
+        if num_workers <= 1:
+            # not worth the threads
+            for job in jobs:
+                yield (job, self._copy(job))
+            return
+
+        job_queue = Queue.Queue()
+        for job in jobs:
+            job_queue.put(job)
+
+        result_queue = Queue.Queue()
+
+        def worker():
+            while True:
+                try:
+                    job = job_queue.get_nowait()
+                except Queue.Empty:
+                    return
+                result_queue.put((job, self._copy(job)))
+
+        threads = [threading.Thread(target=worker) for _ in range(num_workers)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            for _ in range(len(jobs)):
+                yield result_queue.get()
+        finally:
+            for thread in threads:
+                thread.join()
+
+    def _copy(self, job):
+        """
+        Copies the file of a single job.
+
+        :returns: ``None`` on success, the formatted error otherwise.
+        """
+        if self._cancellation_token and self._cancellation_token.is_cancelled:
+            return "Cancelled: %s" % (self._cancellation_token.reason,)
+
+        try:
+            if job.source == job.destination:
+                job.strategy = IN_PLACE
+                job.digest = _hash_file(job.source, self._checksum_algorithm)
+            else:
+                job.strategy = self._transfer(job)
+        except Exception:
+            return traceback.format_exc()
+
+    def _transfer(self, job):
+        """
+        Transfers a file to its destination, unless resuming and it is already
+        there.
+
+        :returns: The strategy used.
+        """
+        if not self._resume:
+            return self._transfer_data(job)
+
+        if os.path.lexists(job.destination):
+            if self._is_unchanged(job):
+                return UNCHANGED
+
+            logger.debug("Replacing divergent file '%s'." % (job.destination,))
+            _remove_file(job.destination)
+
+        strategy = self._transfer_data(job)
+
+        # allow the file to be identified as unchanged when resuming again
+        if strategy != HARDLINK:
+            src_stat = os.stat(job.source)
+            os.utime(job.destination, (src_stat.st_atime, src_stat.st_mtime))
+
+        return strategy
+
+    def _is_unchanged(self, job):
+        """
+        Returns ``True`` if the destination file of the job is identical to its
+        source, computing the digest of the job if checksums are requested.
+        """
+        if not is_unchanged(job.source, job.destination):
+            return False
+
+        if self._checksum_algorithm:
+            job.digest = _hash_file(job.source, self._checksum_algorithm)
+            if _hash_file(job.destination, self._checksum_algorithm) != job.digest:
+                return False
+
+        return True
+
+    def _transfer_data(self, job):
+        """
+        Transfers a file to its destination with the first supported strategy,
+        computing its digest if checksums are requested.
+
+        :returns: The strategy used.
+        """
+        (source, destination) = (job.source, job.destination)
+
+        strategy = None
+        if self._mode != TRANSFER_MODE_COPY and not os.path.exists(destination):
+            dest_folder = os.path.dirname(destination)
+
+            if self._mode == TRANSFER_MODE_LINK and self._is_same_device(
+                    os.path.dirname(source), dest_folder):
+                if self._attempt(HARDLINK, dest_folder, _hardlink, source, destination):
+                    strategy = HARDLINK
+
+            if not strategy and self._attempt(
+                    REFLINK, dest_folder, _reflink, source, destination):
+                strategy = REFLINK
+
+        if strategy:
+            _verify_size(source, destination)
+            if self._checksum_algorithm:
+                # the files share the same data, read it once from the source
+                job.digest = _hash_file(source, self._checksum_algorithm)
+            return strategy
+
+        if not self._checksum_algorithm:
+            filesystem.copy_file(
+                source,
+                destination,
+                permissions=_READ_ONLY,
+                seal=True
+            )
+            _verify_size(source, destination)
+            return COPY
+
+        job.digest = _copy_and_hash(source, destination, self._checksum_algorithm)
+        os.chmod(destination, _READ_ONLY)
+
+        if self._verify:
+            dest_digest = _hash_file(destination, self._checksum_algorithm)
+            if dest_digest != job.digest:
+                raise sgtk.TankError(
+                    "Checksum mismatch for '%s': expected %s, got %s." %
+                    (destination, job.digest, dest_digest)
+                )
+
+        return COPY
+
+    def _attempt(self, strategy, dest_folder, func, source, destination):
+        """
+        Transfers a file with the supplied strategy function, unless it is
+        known not to be supported for the destination folder.
+
+        :returns: ``True`` if the file was transferred, ``False`` otherwise.
+        """
+        if (strategy, dest_folder) in self._unsupported:
+            return False
+
+        try:
+            if not func(source, destination):
+                self._unsupported.add((strategy, dest_folder))
+                return False
+        except EnvironmentError as e:
+            # don't leave a partial file behind for the next strategy
+            if os.path.exists(destination):
+                _remove_file(destination)
+            if e.errno not in _UNSUPPORTED_ERRORS:
+                raise
+            logger.debug(
+                "Transfer strategy '%s' not supported for '%s': %s" %
+                (strategy, dest_folder, e)
+            )
+            self._unsupported.add((strategy, dest_folder))
+            return False
+
+        os.chmod(destination, _READ_ONLY)
+        return True
+
+    def _is_same_device(self, src_folder, dest_folder):
+        """
+        Returns ``True`` if the supplied folders are on the same device.
+        """
+        key = (src_folder, dest_folder)
+        if key not in self._same_device:
+            self._same_device[key] = (
+                os.stat(src_folder).st_dev == os.stat(dest_folder).st_dev
+            )
+        return self._same_device[key]
+
+
+def _hardlink(source, destination):
+    """
+    Hardlinks the source file to the destination.
+
+    :returns: ``False`` if hardlinks aren't supported on the platform.
+    """
+    if not hasattr(os, "link"):
+        return False
+    os.link(source, destination)
+    return True
+
+
+def _reflink(source, destination):
+    """
+    Clones the source file to the destination on copy-on-write file systems.
+
+    :returns: ``False`` if clones aren't supported on the platform.
+    """
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    with open(source, "rb") as src_fh:
+        with open(destination, "wb") as dest_fh:
+            fcntl.ioctl(dest_fh.fileno(), _FICLONE, src_fh.fileno())
+    return True
+
+
+def _verify_size(source, destination):
+    """
+    Raises a :class:`~sgtk.TankError` if the destination file doesn't have the
+    size of its source, for example if it was left short by a full disk.
+    """
+    size = os.path.getsize(source)
+    dest_size = os.path.getsize(destination)
+    if dest_size != size:
+        raise sgtk.TankError(
+            "Size mismatch for '%s': expected %d bytes, got %d." %
+            (destination, size, dest_size)
+        )
+
+
+def _remove_file(path):
+    """
+    Removes the supplied file, making it writable first: sealed files can't be
+    removed on Windows.
+    """
+    if not os.path.islink(path):
+        os.chmod(path, os.stat(path).st_mode | stat.S_IWUSR)
+    os.remove(path)
+
+
+def _hash_file(path, algorithm):
+    """
+    Returns the hex digest of the supplied file.
+    """
+    hasher = hashlib.new(algorithm)
+    with open(path, "rb") as fh:
+        while True:
+            chunk = fh.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _copy_and_hash(source, destination, algorithm):
+    """
+    Copies the source file to the destination, computing its digest as it is
+    streamed. The size of the destination is verified once it is written.
+
+    :returns: The hex digest of the file.
+    """
+    hasher = hashlib.new(algorithm)
+    size = 0
+    with open(source, "rb") as src_fh:
+        with open(destination, "wb") as dest_fh:
+            while True:
+                chunk = src_fh.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                dest_fh.write(chunk)
+                size += len(chunk)
+
+    dest_size = os.path.getsize(destination)
+    if dest_size != size:
+        raise sgtk.TankError(
+            "Size mismatch for '%s': expected %d bytes, got %d." %
+            (destination, size, dest_size)
+        )
+
+    return hasher.hexdigest()
@@ -0,0 +1,369 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import Queue
+import threading
+import time
+import traceback
+
+import sgtk
+
+from .shotgun_pool import get_shotgun_pool
+from .threaded import Threaded
+
+logger = sgtk.platform.get_logger(__name__)
+
+# the maximum number of failures detailed in an UploadError message
+_MAX_REPORTED_FAILURES = 10
+
+# the number of seconds an idle worker waits for a new upload before exiting
+_WORKER_IDLE_TIMEOUT = 5.0
+
+
+class UploadError(sgtk.TankError):
+    """
+    Raised when one or more queued uploads failed.
+
+    The ``failures`` attribute holds the failed :class:`UploadJob` instances.
+    """
+    def __init__(self, failures, num_jobs):
+        """
+        :param list failures: The failed :class:`UploadJob` instances.
+        :param int num_jobs: The total number of uploads that were processed.
+        """
+        self.failures = failures
+
+        lines = [
+            "Failed to upload %d of %d files." % (len(failures), num_jobs)
+        ]
+        for job in failures[:_MAX_REPORTED_FAILURES]:
+            lines.append(
+                "Failed to upload '%s' to %s %s after %d attempts.\n%s" %
+                (job.path, job.entity_type, job.entity_id, job.attempts, job.error)
+            )
+        if len(failures) > _MAX_REPORTED_FAILURES:
+            lines.append(
+                "... and %d more." % (len(failures) - _MAX_REPORTED_FAILURES,)
+            )
+
+        super(UploadError, self).__init__("\n".join(lines))
+
+
+class UploadJob(object):
+    """
+    A file queued for upload to a Shotgun entity.
+
+    Once processed, ``attempts`` holds the number of times the upload was
+    attempted and, if all of them failed, ``error`` holds the formatted
+    traceback of the last failure.
+    """
+    __slots__ = [
+        "item",
+        "entity_type",
+        "entity_id",
+        "path",
+        "field_name",
+        "attempts",
+        "error",
+        "_done",
+    ]
+
+    def __init__(self, item, entity_type, entity_id, path, field_name=None):
+        """
+        :param item: The :ref:`publish-api-item` the file is uploaded for.
+        :param str entity_type: The type of the entity to upload the file to.
+        :param int entity_id: The id of the entity to upload the file to.
+        :param str path: The path of the file to upload.
+        :param str field_name: The field to upload the file to, ``None`` to
+            upload it as the entity's thumbnail.
+        """
+        self.item = item
+        self.entity_type = entity_type
+        self.entity_id = entity_id
+        self.path = path
+        self.field_name = field_name
+        self.attempts = 0
+        self.error = None
+        self._done = threading.Event()
+
+    @property
+    def is_thumbnail(self):
+        """
+        ``True`` if the file is uploaded as the entity's thumbnail.
+        """
+        return self.field_name is None
+
+    @property
+    def is_done(self):
+        """
+        ``True`` if the upload was processed, successfully or not.
+        """
+        return self._done.is_set()
+
+    def wait(self):
+        """
+        Blocks until the upload has been processed.
+        """
+        # waiting with a timeout keeps the wait interruptible
+        while not self._done.wait(1.0):
+            pass
+
+    def __repr__(self):
+        return "<%s: %s -> %s %s>" % (
+            self.__class__.__name__, self.path, self.entity_type, self.entity_id
+        )
+
+
+class UploadQueue(Threaded):
+    """
+    Queue of the files to upload to Shotgun in the background.
+
+    Publish plugins can queue the upload of media and thumbnails rather than
+    blocking on ``shotgun.upload`` calls, so that the uploads overlap with the
+    following tasks. Uploads are processed by a bounded pool of worker
+    threads, started as uploads are queued and exiting once idle. Each worker
+    uses its own Shotgun connection from the publisher's
+    :class:`~.shotgun_pool.ShotgunPool`, the connections not being thread safe.
+
+    Failed uploads are attempted again, waiting twice as long before each
+    new attempt. Plugins wait for the uploads of their items in the finalize
+    phase, via :meth:`wait`, which reports their failures. The publish manager
+    waits for the other uploads of the items of its tree at the end of the
+    finalize phase.
+    """
+
+    def __init__(self, max_workers=2, max_attempts=3, retry_delay=2.0):
+        """
+        :param int max_workers: The maximum number of files uploaded
+            concurrently.
+        :param int max_attempts: The number of times an upload is attempted
+            before it is reported as failed.
+        :param float retry_delay: The number of seconds to wait before the
+            second attempt of an upload, doubled for each following attempt.
+        """
+        Threaded.__init__(self)
+        self._max_workers = max(1, max_workers)
+        self._max_attempts = max(1, max_attempts)
+        self._retry_delay = retry_delay
+
+        self._job_queue = Queue.Queue()
+        self._jobs = []
+        self._num_workers = 0
+        self._num_uploaded = 0
+        self._num_retries = 0
+
+    @property
+    def stats(self):
+        """
+        A dictionary with the number of ``pending`` uploads, the number of
+        files ``uploaded``, the number of ``retries`` and the number of
+        running ``workers``.
+        """
+        return {
+            "pending": len([job for job in self._jobs if not job.is_done]),
+            "uploaded": self._num_uploaded,
+            "retries": self._num_retries,
+            "workers": self._num_workers,
+        }
+
+    def upload(self, item, entity_type, entity_id, path, field_name):
+        """
+        Queues the upload of a file to a field of a Shotgun entity.
+
+        :param item: The :ref:`publish-api-item` the file is uploaded for.
+        :param str entity_type: The type of the entity to upload the file to.
+        :param int entity_id: The id of the entity to upload the file to.
+        :param str path: The path of the file to upload.
+        :param str field_name: The field to upload the file to.
+
+        :returns: The queued :class:`UploadJob`.
+        """
+        job = UploadJob(item, entity_type, entity_id, path, field_name)
+        self._add(job)
+        return job
+
+    def upload_thumbnail(self, item, entity_type, entity_id, path):
+        """
+        Queues the upload of the thumbnail of a Shotgun entity.
+
+        :param item: The :ref:`publish-api-item` the thumbnail is uploaded
+            for.
+        :param str entity_type: The type of the entity to upload the
+            thumbnail to.
+        :param int entity_id: The id of the entity to upload the thumbnail to.
+        :param str path: The path of the thumbnail to upload.
+
+        :returns: The queued :class:`UploadJob`.
+        """
+        job = UploadJob(item, entity_type, entity_id, path)
+        self._add(job)
+        return job
+
+    def get_jobs(self, *items):
+        """
+        Returns the uploads queued for the supplied items which weren't waited
+        for yet.
+
+        :param items: One or more :ref:`publish-api-item` instances.
+
+        :returns: A list of :class:`UploadJob` instances.
+        """
+        item_ids = set(id(item) for item in items)
+        return [job for job in self._jobs if id(job.item) in item_ids]
+
+    def wait(self, jobs=None, raise_on_error=True):
+        """
+        Waits for the supplied uploads, or all queued uploads, to be processed.
+
+        Processed uploads are forgotten by the queue, their failures are
+        reported once.
+
+        :param list jobs: The :class:`UploadJob` instances to wait for. All
+            queued uploads which weren't waited for yet are waited for if not
+            supplied.
+        :param bool raise_on_error: Whether to raise if an upload failed. The
+            ``error`` of each processed job can be checked otherwise.
+
+        :returns: The list of processed :class:`UploadJob` instances.
+
+        :raises: :class:`UploadError` if any of the uploads waited for failed.
+        """
+        if jobs is None:
+            jobs = list(self._jobs)
+
+        if jobs:
+            logger.debug("Waiting for %d uploads..." % (len(jobs),))
+        for job in jobs:
+            job.wait()
+        self._forget(jobs)
+
+        failures = [job for job in jobs if job.error is not None]
+        if raise_on_error and failures:
+            raise UploadError(failures, len(jobs))
+
+        return jobs
+
+    def _worker(self):
+        """
+        Processes queued uploads until the queue has been idle for a while.
+        """
+        while True:
+            try:
+                job = self._job_queue.get(timeout=_WORKER_IDLE_TIMEOUT)
+            except Queue.Empty:
+                if self._exit_worker():
+                    return
+                continue
+
+            try:
+                shotgun = get_shotgun_pool().get()
+            except Exception:
+                job.error = traceback.format_exc()
+                self._count_job(job)
+                continue
+
+            self._upload(shotgun, job)
+
+    def _upload(self, shotgun, job):
+        """
+        Uploads the file of the supplied job, retrying on failure.
+        """
+        while True:
+            job.attempts += 1
+            try:
+                if job.is_thumbnail:
+                    shotgun.upload_thumbnail(
+                        job.entity_type, job.entity_id, job.path)
+                else:
+                    shotgun.upload(
+                        job.entity_type, job.entity_id, job.path, job.field_name)
+            except Exception:
+                job.error = traceback.format_exc()
+                if job.attempts >= self._max_attempts:
+                    logger.debug("Failed to upload %s: %s" % (job, job.error))
+                    self._count_job(job)
+                    return
+
+                delay = self._retry_delay * (2 ** (job.attempts - 1))
+                logger.debug(
+                    "Failed to upload %s, retrying in %s seconds: %s" %
+                    (job, delay, job.error)
+                )
+                self._count_retry()
+                time.sleep(delay)
+                continue
+
+            job.error = None
+            logger.debug("Uploaded %s." % (job,))
+            self._count_job(job)
+            return
+
+    @Threaded.exclusive
+    def _add(self, job):
+        """
+        Queues the supplied job, starting a new worker if the maximum number
+        of workers isn't running yet.
+        """
+        self._jobs.append(job)
+        self._job_queue.put(job)
+
+        if self._num_workers < self._max_workers:
+            self._num_workers += 1
+            thread = threading.Thread(target=self._worker)
+            thread.daemon = True
+            thread.start()
+
+    @Threaded.exclusive
+    def _exit_worker(self):
+        """
+        Returns ``True`` if an idle worker should exit, ``False`` if jobs were
+        queued in the meantime.
+        """
+        if not self._job_queue.empty():
+            return False
+        self._num_workers -= 1
+        return True
+
+    @Threaded.exclusive
+    def _count_job(self, job):
+        """
+        Records a processed job and flags it as done.
+        """
+        if job.error is None:
+            self._num_uploaded += 1
+        job._done.set()
+
+    @Threaded.exclusive
+    def _count_retry(self):
+        """
+        Records a new attempt of a failed upload.
+        """
+        self._num_retries += 1
+
+    @Threaded.exclusive
+    def _forget(self, jobs):
+        """
+        Forgets the supplied processed jobs.
+        """
+        forgotten = set(id(job) for job in jobs)
+        self._jobs = [job for job in self._jobs if id(job) not in forgotten]
+
+
+# the upload queue shared by all callers
+_upload_queue = UploadQueue()
+
+
+def get_upload_queue():
+    """
+    Returns the :class:`UploadQueue` shared by the publisher.
+
+    :returns: An :class:`UploadQueue` instance.
+    """
+    return _upload_queue
@@ -8,57 +8,743 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
+import array
+import bisect
+import collections
+import fnmatch
+import glob
 import os
+import Queue
+import re
 import threading
+import time
+import traceback
 import pprint
 
 import sgtk
 
+try:
+    from os import scandir
+except ImportError:
+    # python 2, use the backport if available
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+from .threaded import Threaded
+from .path_analysis import get_path_analysis_cache
+from .context_cache import get_context_cache, get_context_template_fields
+from .publish_cache import (
+    find_publishes,
+    get_conflicting_publishes,
+    get_conflicting_publishes_batch,
+    get_published_files_cache,
+    prefetch_conflicting_publishes,
+)
+from .schema import get_schema_fields
+from .shotgun_pool import get_shotgun_pool
+
 # create a logger to use throughout
 logger = sgtk.platform.get_logger(__name__)
 
 
-class Threaded(object):
+class EventPump(object):
+    """
+    Processes pending Qt events, at most once per configured interval.
+
+    Processing events after every hook call or log message keeps the UI
+    responsive but, on large publish trees, can cost more than the work being
+    done. The pump throttles these requests to a time budget.
+    """
+    def __init__(self, interval):
+        """
+        Construction
+
+        :param int interval: The minimum number of milliseconds between two
+            consecutive processing of events. If ``0``, events are processed
+            on every request.
+        """
+        self._interval = interval / 1000.0
+        self._last_pump_time = 0
+        self._num_pumped = 0
+        self._num_skipped = 0
+
+    @property
+    def stats(self):
+        """
+        A dictionary with the number of requests that processed events,
+        ``pumped``, and the number of requests that were throttled, ``skipped``.
+        """
+        return {"pumped": self._num_pumped, "skipped": self._num_skipped}
+
+    def pump(self, force=False):
+        """
+        Processes pending events if the interval has elapsed since events were
+        last processed.
+
+        :param bool force: If ``True``, events are processed regardless of the
+            interval.
+
+        :returns: ``True`` if events were processed, ``False`` otherwise.
+        """
+        now = time.time()
+        if not force and now - self._last_pump_time < self._interval:
+            self._num_skipped += 1
+            return False
+
+        from sgtk.platform.qt import QtCore
+        QtCore.QCoreApplication.processEvents()
+
+        self._last_pump_time = time.time()
+        self._num_pumped += 1
+        return True
+
+
+# the event pump shared by all callers. created on first use so that the
+# interval is read from the settings of the current engine.
+_event_pump = None
+
+
+def get_event_pump():
+    """
+    Returns the :class:`EventPump` shared by the publisher.
+
+    The pump's interval is defined by the ``event_pump_interval`` setting of
+    the publisher, as configured for the current engine.
+
+    :returns: An :class:`EventPump` instance.
+    """
+    global _event_pump
+    if _event_pump is None:
+        publisher = sgtk.platform.current_bundle()
+        _event_pump = EventPump(publisher.get_setting("event_pump_interval", 30))
+    return _event_pump
+
+
+def process_events(force=False):
+    """
+    Processes pending Qt events, throttled by the shared :class:`EventPump`.
+
+    Plugins performing long running work can call this method regularly to
+    keep the UI responsive without paying for event processing on every call.
+
+    :param bool force: If ``True``, events are processed regardless of the
+        throttling interval.
+
+    :returns: ``True`` if events were processed, ``False`` otherwise.
+    """
+    return get_event_pump().pump(force)
+
+
+def get_template_from_path(path):
     """
-    Threaded base class that contains a threading.Lock member and an
-    'exclusive' function decorator that implements exclusive access
-    to the contained code using the lock
+    Returns the template matching the supplied path, using the publisher's
+    :class:`PathAnalysisCache`.
+
+    :param str path: The path to match.
+
+    :returns: A :class:`sgtk.Template` or ``None``.
     """
+    return get_path_analysis_cache().get_template(
+        sgtk.util.ShotgunPath.normalize(path))
+
+
+class DirectoryListingCache(Threaded):
+    """
+    Cache of the listings of the folders inspected during a publish session.
+
+    Each listing holds the names of the entries of a folder and whether they
+    are files or folders. Entry types come from ``scandir`` when available,
+    avoiding a ``stat`` per entry.
+
+    Listings are validated against the modification time of their folder,
+    which changes when entries are added, removed or renamed, so a single
+    ``stat`` of the folder replaces its listing and the ``stat`` of all of its
+    entries. Folders modified less than a second before being listed are not
+    cached, since further changes within the same second may not update the
+    modification time on some file systems.
+    """
+
+    # entry types
+    (FILE, FOLDER, OTHER) = ("file", "folder", "other")
+
+    # the resolution of folder modification times assumed
+    MTIME_RESOLUTION = 1.0
+
     def __init__(self):
         """
         Construction
         """
-        self._lock = threading.Lock()
+        Threaded.__init__(self)
+        self._listings = {}
+        self._hits = 0
+        self._misses = 0
+        self._calls_saved = 0
+
+    @property
+    def stats(self):
+        """
+        A dictionary with the number of cache ``hits`` and ``misses``, the
+        number of cached folders, ``size``, and the number of file system
+        calls the cache saved, ``calls_saved``.
+        """
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "size": len(self._listings),
+            "calls_saved": self._calls_saved,
+        }
+
+    @Threaded.exclusive
+    def clear(self):
+        """
+        Discards all cached listings. The statistics are kept.
+        """
+        self._listings.clear()
 
-    @staticmethod
-    def exclusive(func):
+    def list_folder(self, folder):
         """
-        Static method intended to be used as a function decorator in derived
-        classes.  Use it by doing:
+        Returns the entries of the supplied folder.
 
-            @Threaded.exclusive
-            def my_method(self, ...):
-                ...
+        :param str folder: The path of the folder to list.
+
+        :returns: A list of ``(name, type)`` tuples, sorted by name, where
+            ``type`` is one of ``FILE``, ``FOLDER`` or ``OTHER``. An empty list
+            if the folder doesn't exist.
+        """
+        try:
+            mtime = os.stat(folder).st_mtime
+        except OSError:
+            return []
+
+        entries = self._get(folder, mtime)
+        if entries is None:
+            listed_at = time.time()
+            entries = self._list(folder)
+            self._add(folder, mtime, entries, listed_at)
+
+        return entries
+
+    def glob(self, pattern):
+        """
+        Returns the files matching the supplied pattern, like
+        ``glob.glob`` filtered with ``os.path.isfile``.
+
+        Only patterns of files within a single folder use the cache.
+
+        :param str pattern: A path whose file name can contain wildcards.
+
+        :returns: A list of matching file paths, sorted.
+        """
+        (folder, file_pattern) = os.path.split(pattern)
+        if glob.has_magic(folder):
+            return sorted(f for f in glob.iglob(pattern) if os.path.isfile(f))
+
+        names = [
+            name for (name, entry_type) in self.list_folder(folder or os.curdir)
+            if entry_type == self.FILE
+        ]
+
+        # like glob, hidden files only match explicitly hidden patterns
+        if not file_pattern.startswith("."):
+            names = [name for name in names if not name.startswith(".")]
+
+        return [
+            os.path.join(folder, name)
+            for name in fnmatch.filter(names, file_pattern)
+        ]
+
+    def _list(self, folder):
+        """
+        Lists the entries of the supplied folder from disk.
+        """
+        entries = []
+        if scandir:
+            for entry in scandir(folder):
+                if entry.is_dir():
+                    entry_type = self.FOLDER
+                elif entry.is_file():
+                    entry_type = self.FILE
+                else:
+                    entry_type = self.OTHER
+                entries.append((entry.name, entry_type))
+            # scandir saved a stat per entry
+            self._count_saved(len(entries))
+        else:
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                if os.path.isdir(path):
+                    entry_type = self.FOLDER
+                elif os.path.isfile(path):
+                    entry_type = self.FILE
+                else:
+                    entry_type = self.OTHER
+                entries.append((name, entry_type))
+
+        entries.sort()
+        return entries
+
+    @Threaded.exclusive
+    def _get(self, folder, mtime):
+        """
+        Returns the cached entries of the supplied folder if they are still
+        valid for its current modification time, ``None`` otherwise.
+        """
+        listing = self._listings.get(folder)
+        if listing and listing[0] == mtime:
+            self._hits += 1
+            # the listing and the stat of each entry
+            self._calls_saved += len(listing[1])
+            return listing[1]
+
+        self._misses += 1
+        return None
+
+    @Threaded.exclusive
+    def _add(self, folder, mtime, entries, listed_at):
+        """
+        Caches the entries of the supplied folder, unless it was modified too
+        recently for its modification time to be trusted.
+        """
+        if listed_at - mtime < self.MTIME_RESOLUTION:
+            self._listings.pop(folder, None)
+            return
+        self._listings[folder] = (mtime, entries)
 
-        :param func:    Function to decorate/wrap
-        :returns:       Wrapper function that executes the function inside the acquired lock
+    @Threaded.exclusive
+    def _count_saved(self, num_calls):
         """
-        def wrapper(self, *args, **kwargs):
-            """
-            Internal wrapper method that executes the function with the specified arguments
-            inside the acquired lock
+        Adds to the number of file system calls saved.
+        """
+        self._calls_saved += num_calls
+
+
+# the directory listing cache shared by all callers
+_directory_listing_cache = DirectoryListingCache()
+
+
+def get_directory_listing_cache():
+    """
+    Returns the :class:`DirectoryListingCache` shared by the publisher. It is
+    cleared whenever the current session is collected.
+
+    :returns: A :class:`DirectoryListingCache` instance.
+    """
+    return _directory_listing_cache
+
+
+def list_folder(folder):
+    """
+    Returns the entries of the supplied folder, using the publisher's
+    :class:`DirectoryListingCache`.
+
+    :param str folder: The path of the folder to list.
 
-            :param *args:       The function parameters
-            :param **kwargs:    The function named parameters
-            :returns:           The result of the function call
-            """
-            self._lock.acquire()
+    :returns: A list of ``(name, type)`` tuples, sorted by name, where
+        ``type`` is one of ``"file"``, ``"folder"`` or ``"other"``.
+    """
+    return _directory_listing_cache.list_folder(folder)
+
+
+def glob_files(pattern):
+    """
+    Returns the files matching the supplied pattern, using the publisher's
+    :class:`DirectoryListingCache`.
+
+    :param str pattern: A path whose file name can contain wildcards.
+
+    :returns: A list of matching file paths, sorted.
+    """
+    return _directory_listing_cache.glob(pattern)
+
+
+def is_ignored(name, ignore_patterns):
+    """
+    Returns ``True`` if the supplied file or folder name matches one of the
+    supplied ``fnmatch`` style patterns, such as ``.*`` or ``*.tmp``.
+
+    :param str name: A file or folder name.
+    :param list ignore_patterns: A list of patterns, can be ``None``.
+    """
+    return any(fnmatch.fnmatch(name, pattern) for pattern in ignore_patterns or [])
+
+
+def walk_folders(root, max_workers=4, ignore_patterns=None, cancellation_token=None):
+    """
+    Walks the supplied folder and all of its subfolders, listing them
+    concurrently on a pool of threads.
+
+    Each folder is yielded, in the calling thread, as soon as it has been
+    listed, as a ``(folder, error)`` tuple where ``error`` is the formatted
+    traceback of a failure to list the folder, ``None`` otherwise. The listings
+    are stored in the publisher's :class:`DirectoryListingCache`, so the
+    entries of yielded folders can be retrieved via :func:`list_folder`,
+    :func:`glob_files` or ``get_frame_sequences`` without listing them again.
+
+    Folders are yielded in the order they are listed. Folders reached more than
+    once, via symbolic links, are only yielded once.
+
+    :param str root: The path of the folder to walk.
+    :param int max_workers: The maximum number of folders listed concurrently.
+    :param list ignore_patterns: A list of ``fnmatch`` style patterns of the
+        names of the subfolders not to walk.
+    :param cancellation_token: An optional :class:`~.api.CancellationToken`.
+        Once cancelled, no more folders are listed or yielded.
+    """
+    folder_queue = Queue.Queue()
+    result_queue = Queue.Queue()
+    stopped = threading.Event()
+
+    def worker():
+        while True:
+            folder = folder_queue.get()
+            if folder is None:
+                return
+            if stopped.is_set():
+                result_queue.put((folder, [], None))
+                continue
             try:
-                return func(self, *args, **kwargs)
-            finally:
-                self._lock.release()
+                subfolders = [
+                    (subfolder, os.path.realpath(subfolder))
+                    for subfolder in (
+                        os.path.join(folder, name)
+                        for (name, entry_type) in list_folder(folder)
+                        if entry_type == DirectoryListingCache.FOLDER and
+                        not is_ignored(name, ignore_patterns)
+                    )
+                ]
+                result_queue.put((folder, subfolders, None))
+            except Exception:
+                result_queue.put((folder, [], traceback.format_exc()))
+
+    threads = [
+        threading.Thread(target=worker) for _ in range(max(1, max_workers))
+    ]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    visited = set([os.path.realpath(root)])
+    folder_queue.put(root)
+    num_pending = 1
+
+    try:
+        while num_pending:
+            (folder, subfolders, error) = result_queue.get()
+            num_pending -= 1
+
+            if cancellation_token and cancellation_token.is_cancelled:
+                # let the workers drain the queued folders without listing them
+                stopped.set()
+            if stopped.is_set():
+                continue
+
+            for (subfolder, real_path) in subfolders:
+                if real_path not in visited:
+                    visited.add(real_path)
+                    folder_queue.put(subfolder)
+                    num_pending += 1
+
+            yield (folder, error)
+    finally:
+        # the walk is over or the caller stopped iterating
+        stopped.set()
+        for _ in threads:
+            folder_queue.put(None)
+        for thread in threads:
+            thread.join()
+
+
+class FrameSequence(collections.Sequence):
+    """
+    Compact, immutable, sequence of the paths of the frames of a file sequence.
+
+    Rather than a list of paths, only the path pattern of the sequence and its
+    frame ranges are stored. A ``FrameSequence`` can be used wherever a list of
+    frame paths, such as the ``sequence_paths`` item property, is expected::
+
+        >>> frames = FrameSequence.from_paths(
+        ...     "/shots/plate.%04d.exr",
+        ...     ["/shots/plate.1001.exr", "/shots/plate.1002.exr", "/shots/plate.1005.exr"]
+        ... )
+        >>> str(frames)
+        '/shots/plate.%04d.exr 1001-1002,1005'
+        >>> len(frames)
+        3
+        >>> frames[-1]
+        '/shots/plate.1005.exr'
+        >>> "/shots/plate.1002.exr" in frames
+        True
+
+    Length is computed once. Indexing and membership only search the frame
+    ranges, whatever the number of frames.
+    """
+
+    # a printf style frame specification, such as %04d
+    FRAME_SPEC_REGEX = re.compile(r"%(0\d+)?d")
 
-        return wrapper
+    # the key of the serialized form, as returned by to_dict
+    SERIALIZATION_KEY = "__frame_sequence__"
+
+    def __init__(self, pattern, ranges):
+        """
+        :param str pattern: The path of the sequence, with a single printf
+            style frame specification such as ``%04d``.
+        :param ranges: A list of ``(first, last)`` tuples of inclusive frame
+            ranges. Overlapping and adjacent ranges are merged.
+
+        :raises: ``ValueError`` if the pattern has no frame specification.
+        """
+        specs = list(self.FRAME_SPEC_REGEX.finditer(pattern))
+        if len(specs) != 1:
+            raise ValueError(
+                "Expected a single frame specification in '%s'." % (pattern,)
+            )
+
+        self._pattern = pattern
+        self._prefix = pattern[:specs[0].start()]
+        self._suffix = pattern[specs[0].end():]
+
+        # sorted, non overlapping ranges
+        merged = []
+        for (first, last) in sorted(ranges):
+            if merged and first <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+            else:
+                merged.append((first, last))
+        self._ranges = tuple(merged)
+
+        # the index of the first frame of each range
+        self._firsts = [first for (first, _) in self._ranges]
+        self._offsets = []
+        length = 0
+        for (first, last) in self._ranges:
+            self._offsets.append(length)
+            length += last - first + 1
+        self._length = length
+
+    @classmethod
+    def from_frames(cls, pattern, frames):
+        """
+        Creates a ``FrameSequence`` from frame numbers.
+
+        :param str pattern: The path of the sequence, with a printf style
+            frame specification.
+        :param frames: An iterable of frame numbers.
+        """
+        return cls(pattern, [(frame, frame) for frame in frames])
+
+    @classmethod
+    def from_paths(cls, pattern, paths):
+        """
+        Creates a ``FrameSequence`` from the paths of the frames.
+
+        :param str pattern: The path of the sequence, with a printf style
+            frame specification.
+        :param list paths: The paths of the frames of the sequence.
+
+        :raises: ``ValueError`` if a path doesn't match the pattern.
+        """
+        sequence = cls(pattern, [])
+        frames = []
+        for path in paths:
+            frame = sequence._get_frame(path)
+            if frame is None:
+                raise ValueError(
+                    "The path '%s' doesn't match the sequence '%s'." %
+                    (path, pattern)
+                )
+            frames.append(frame)
+        return cls.from_frames(pattern, frames)
+
+    @classmethod
+    def from_string(cls, sequence_str):
+        """
+        Creates a ``FrameSequence`` from its string representation, such as
+        ``"plate.%04d.exr 1001-1240,1250-1300"``.
+
+        :param str sequence_str: The string representation of the sequence.
+        """
+        (pattern, ranges_str) = sequence_str.rsplit(" ", 1)
+        ranges = []
+        for range_str in ranges_str.split(","):
+            if not range_str:
+                continue
+            (first, _, last) = range_str.partition("-")
+            ranges.append((int(first), int(last or first)))
+        return cls(pattern, ranges)
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Creates a ``FrameSequence`` from its serialized form, as returned by
+        :meth:`to_dict`.
+        """
+        return cls.from_string(data[cls.SERIALIZATION_KEY])
+
+    @classmethod
+    def is_serialized(cls, value):
+        """
+        Returns ``True`` if the supplied value is a serialized
+        ``FrameSequence``, as returned by :meth:`to_dict`.
+        """
+        return isinstance(value, dict) and cls.SERIALIZATION_KEY in value
+
+    def to_dict(self):
+        """
+        Returns the serialized form of the sequence.
+        """
+        return {self.SERIALIZATION_KEY: str(self)}
+
+    @property
+    def pattern(self):
+        """
+        The path of the sequence with its frame specification.
+        """
+        return self._pattern
+
+    @property
+    def ranges(self):
+        """
+        A tuple of the ``(first, last)`` inclusive frame ranges of the sequence.
+        """
+        return self._ranges
+
+    @property
+    def frames(self):
+        """
+        An iterator over the frame numbers of the sequence.
+        """
+        for (first, last) in self._ranges:
+            for frame in xrange(first, last + 1):
+                yield frame
+
+    def get_path(self, frame):
+        """
+        Returns the path of the supplied frame.
+
+        :param int frame: A frame number.
+        """
+        return self._pattern % (frame,)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in xrange(*index.indices(self._length))]
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("FrameSequence index out of range")
+
+        range_index = bisect.bisect_right(self._offsets, index) - 1
+        frame = self._ranges[range_index][0] + index - self._offsets[range_index]
+        return self.get_path(frame)
+
+    def __iter__(self):
+        for frame in self.frames:
+            yield self.get_path(frame)
+
+    def __reversed__(self):
+        for (first, last) in reversed(self._ranges):
+            for frame in xrange(last, first - 1, -1):
+                yield self.get_path(frame)
+
+    def __contains__(self, path):
+        return self._get_index(path) is not None
+
+    def index(self, path):
+        """
+        Returns the index of the supplied path.
+
+        :raises: ``ValueError`` if the path isn't part of the sequence.
+        """
+        index = self._get_index(path)
+        if index is None:
+            raise ValueError("'%s' is not in the sequence" % (path,))
+        return index
+
+    def count(self, path):
+        """
+        Returns the number of occurrences of the supplied path, 0 or 1.
+        """
+        return int(path in self)
+
+    def __eq__(self, other):
+        if isinstance(other, FrameSequence):
+            return (self._pattern, self._ranges) == (other._pattern, other._ranges)
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def __hash__(self):
+        return hash((self._pattern, self._ranges))
+
+    def __copy__(self):
+        # immutable
+        return self
+
+    def __deepcopy__(self, memo):
+        # immutable
+        return self
+
+    def __str__(self):
+        return "%s %s" % (
+            self._pattern,
+            ",".join(
+                "%d" % (first,) if first == last else "%d-%d" % (first, last)
+                for (first, last) in self._ranges
+            )
+        )
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, str(self))
+
+    def _get_frame(self, path):
+        """
+        Returns the frame number of the supplied path, ``None`` if it doesn't
+        match the pattern of the sequence.
+        """
+        if not isinstance(path, basestring):
+            return None
+
+        if not (path.startswith(self._prefix) and path.endswith(self._suffix)):
+            return None
+
+        frame_str = path[len(self._prefix):len(path) - len(self._suffix)]
+        if not frame_str.isdigit():
+            return None
+
+        frame = int(frame_str)
+        if self.get_path(frame) != path:
+            # the padding doesn't match
+            return None
+
+        return frame
+
+    def _get_index(self, path):
+        """
+        Returns the index of the supplied path, ``None`` if it isn't part of
+        the sequence.
+        """
+        frame = self._get_frame(path)
+        if frame is None:
+            return None
+
+        range_index = bisect.bisect_right(self._firsts, frame) - 1
+        if range_index < 0 or frame > self._ranges[range_index][1]:
+            return None
+
+        return self._offsets[range_index] + frame - self._ranges[range_index][0]
 
 
 # ---- file/path util functions
@@ -149,41 +835,13 @@ def get_file_path_components(path):
     # appropriate for current os, no double separators, etc.
     path = sgtk.util.ShotgunPath.normalize(path)
 
-    logger.debug("Getting file path components for path: '%s'..." % (path,))
-
-    # break it up into the major components
-    (folder, filename) = os.path.split(path)
+    # the analysis is memoized since this is called for each frame of a
+    # sequence by most of the path_info hook methods.
+    return get_path_analysis_cache().get_components(path)
 
-    if os.path.isdir(path):
-        # folder
-        extension = None
-    else:
-        # file. extract the extension and remove the "."
-        tk = sgtk.sgtk_from_path(sgtk.pipelineconfig_utils.get_config_install_location())
-        template = tk.template_from_path(path)
-        if template and 'extension' in template.get_fields(path):
-            extension = template.get_fields(path)['extension']
-        else:
-            (_, extension) = os.path.splitext(filename)
-        if extension:
-            extension = extension.lstrip(".")
-        else:
-            # prevent extension = ""
-            extension = None
-
-    file_info = dict(
-        path=path,
-        folder=folder,
-        filename=filename,
-        extension=extension,
-    )
-
-    logger.debug(
-        "Extracted components from path '%s': %s" %
-        (path, file_info)
-    )
 
-    return file_info
+# the default value of the path_info hook setting
+_DEFAULT_PATH_INFO_HOOK = "{self}/path_info.py"
 
 
 def get_frame_number(path):
@@ -207,6 +865,242 @@ def get_frame_number(path):
     )
 
 
+def get_frame_numbers(paths):
+    """
+    Given the paths of the frames of a sequence, return the frame number of
+    each of them.
+
+    The frame number of the first path is identified via
+    :func:`get_frame_number`. If the ``path_info`` hook isn't overridden, any
+    other path sharing the same prefix and suffix around that frame number is
+    sliced directly, without any further parsing. Others, and all paths if the
+    hook is overridden, are parsed via :func:`get_frame_number`.
+
+    :param list paths: The paths of the frames of a sequence.
+
+    :return: A list of the frame numbers, as returned by
+        :func:`get_frame_number`, in the order of the supplied paths.
+    """
+    if not paths:
+        return []
+
+    if not _is_default_path_info_hook():
+        # the hook may identify frame numbers differently
+        return [get_frame_number(path) for path in paths]
+
+    first_path = paths[0]
+    first_frame = get_frame_number(first_path)
+    if first_frame is None:
+        return [get_frame_number(path) for path in paths]
+
+    first_frame = str(first_frame)
+
+    # the frame number is the last occurrence before the extension
+    index = os.path.splitext(first_path)[0].rfind(first_frame)
+    prefix = first_path[:index]
+    suffix = first_path[index + len(first_frame):]
+    if index < 0 or (prefix and prefix[-1].isdigit()):
+        # can't reliably slice the frame number out of the paths
+        return [get_frame_number(path) for path in paths]
+
+    frame_numbers = []
+    for path in paths:
+        frame_num = path[len(prefix):len(path) - len(suffix)]
+        if not (
+            path.startswith(prefix) and
+            path.endswith(suffix) and
+            frame_num.isdigit()
+        ):
+            frame_num = get_frame_number(path)
+        frame_numbers.append(frame_num)
+
+    return frame_numbers
+
+
+def _is_default_path_info_hook():
+    """
+    Returns ``True`` if the publisher uses the app's own ``path_info`` hook,
+    ``False`` if it is overridden or extended by the configuration.
+    """
+    publisher = sgtk.platform.current_bundle()
+    return publisher.get_setting("path_info") == _DEFAULT_PATH_INFO_HOOK
+
+
+class SequenceAnalysis(object):
+    """
+    The completeness of a file sequence, as returned by
+    :func:`analyze_sequence`.
+    """
+
+    def __init__(self, frames, gaps, duplicates, empty_files, size_outliers,
+                 unknown_files):
+        """
+        :param frames: An ``array`` of the sorted, unique, frame numbers.
+        :param list gaps: A list of ``(first, last)`` ranges of missing frames.
+        :param dict duplicates: The paths of the frames found more than once,
+            with different paddings, keyed by frame number.
+        :param list empty_files: The paths of the empty frames.
+        :param list size_outliers: The paths of the frames much smaller than
+            the others.
+        :param list unknown_files: The paths no frame number was found for.
+        """
+        self.frames = frames
+        self.gaps = gaps
+        self.duplicates = duplicates
+        self.empty_files = empty_files
+        self.size_outliers = size_outliers
+        self.unknown_files = unknown_files
+
+    @property
+    def first_frame(self):
+        """
+        The first frame of the sequence, ``None`` if it has no frames.
+        """
+        return self.frames[0] if self.frames else None
+
+    @property
+    def last_frame(self):
+        """
+        The last frame of the sequence, ``None`` if it has no frames.
+        """
+        return self.frames[-1] if self.frames else None
+
+    @property
+    def num_missing(self):
+        """
+        The number of frames missing between the first and last frames.
+        """
+        return sum(last - first + 1 for (first, last) in self.gaps)
+
+    @property
+    def has_issues(self):
+        """
+        ``True`` if any issue was found with the sequence.
+        """
+        return bool(
+            self.gaps or self.duplicates or self.empty_files or
+            self.size_outliers or self.unknown_files
+        )
+
+    def summary(self):
+        """
+        Returns a one line summary of the issues found.
+        """
+        issues = []
+        if self.gaps:
+            issues.append("%d missing frames" % (self.num_missing,))
+        if self.duplicates:
+            issues.append("%d duplicate frames" % (len(self.duplicates),))
+        if self.empty_files:
+            issues.append("%d empty frames" % (len(self.empty_files),))
+        if self.size_outliers:
+            issues.append("%d suspiciously small frames" % (len(self.size_outliers),))
+        if self.unknown_files:
+            issues.append("%d files without a frame number" % (len(self.unknown_files),))
+        return ", ".join(issues)
+
+    def report(self):
+        """
+        Returns a detailed, multi-line, report of the issues found.
+        """
+        lines = [
+            "Frames: %s-%s (%d frames)" %
+            (self.first_frame, self.last_frame, len(self.frames))
+        ]
+        if self.gaps:
+            lines.append(
+                "Missing frames: %s" % (",".join(
+                    "%d" % (first,) if first == last else "%d-%d" % (first, last)
+                    for (first, last) in self.gaps
+                ),)
+            )
+        for frame in sorted(self.duplicates):
+            lines.append(
+                "Duplicate frame %d: %s" % (frame, ", ".join(self.duplicates[frame]))
+            )
+        for (label, paths) in (
+                ("Empty frames", self.empty_files),
+                ("Suspiciously small frames", self.size_outliers),
+                ("Files without a frame number", self.unknown_files)):
+            if paths:
+                lines.append("%s:\n  %s" % (label, "\n  ".join(paths)))
+        return "\n".join(lines)
+
+
+def analyze_sequence(paths, check_sizes=True, min_size_ratio=0.1):
+    """
+    Analyzes the completeness of a file sequence.
+
+    The frame numbers are extracted, via :func:`get_frame_numbers`, into a
+    sorted array of integers which is scanned once to find the missing frames
+    and the frames found more than once, for example with different paddings.
+
+    If ``check_sizes`` is set, the files are also checked for being empty or
+    much smaller than the median size of the frames, a sign of frames that
+    failed to render or were truncated.
+
+    :param paths: The paths of the frames of the sequence. A list or a
+        :class:`FrameSequence`.
+    :param bool check_sizes: Whether to check the size of the files.
+    :param float min_size_ratio: The ratio of the median frame size below which
+        a frame is reported as suspiciously small.
+
+    :returns: A :class:`SequenceAnalysis` instance.
+    """
+    unknown_files = []
+    duplicates = {}
+
+    if isinstance(paths, FrameSequence):
+        # the frames are already known, unique and sorted
+        frames = array.array("l", paths.frames)
+        gaps = [
+            (previous_last + 1, first - 1) for ((_, previous_last), (first, _))
+            in zip(paths.ranges, paths.ranges[1:])
+        ]
+    else:
+        pairs = []
+        for (path, frame_num) in zip(paths, get_frame_numbers(paths)):
+            if frame_num is None:
+                unknown_files.append(path)
+            else:
+                pairs.append((int(frame_num), path))
+        pairs.sort()
+
+        frames = array.array("l")
+        gaps = []
+        previous_path = None
+        for (frame, path) in pairs:
+            if frames and frame == frames[-1]:
+                duplicates.setdefault(frame, [previous_path]).append(path)
+                continue
+            if frames and frame > frames[-1] + 1:
+                gaps.append((frames[-1] + 1, frame - 1))
+            frames.append(frame)
+            previous_path = path
+
+    empty_files = []
+    size_outliers = []
+    if check_sizes and len(paths):
+        # a plain list, long arrays are 32 bits on windows
+        sizes = []
+        for path in paths:
+            try:
+                sizes.append(os.path.getsize(path))
+            except OSError:
+                sizes.append(0)
+
+        min_size = sorted(sizes)[len(sizes) // 2] * min_size_ratio
+        for (path, size) in zip(paths, sizes):
+            if not size:
+                empty_files.append(path)
+            elif size < min_size:
+                size_outliers.append(path)
+
+    return SequenceAnalysis(
+        frames, gaps, duplicates, empty_files, size_outliers, unknown_files
+    )
+
+
 def get_path_for_frame(path, frame_num, frame_spec=None):
     """
     Given a path with a frame spec, return the expanded path where the frame
@@ -399,82 +1293,6 @@ def get_version_number(path):
 
 # ---- publish util functions
 
-def get_conflicting_publishes(context, path, publish_name, filters=None):
-    """
-    Returns a list of SG published file dicts for any existing publishes that
-    match the supplied context, path, and publish_name.
-
-    :param context: The context to search publishes for
-    :param path: The path to match against previous publishes
-    :param publish_name: The name of the publish.
-    :param filters: A list of additional SG find() filters to apply to the
-        publish search.
-
-    :return: A list of ``dict``s representing existing publishes that match
-        the supplied arguments. The paths returned are the standard "id", and
-        "type" as well as the "path" field.
-
-    This method is typically used by publish plugin hooks to determine if there
-    are existing publishes for a given context, publish_name, and path and
-    warning appropriately.
-    """
-
-    publisher = sgtk.platform.current_bundle()
-
-    logger.debug(
-        "Getting conflicting publishes for context: %s, path: %s, name: %s" %
-        (context, path, publish_name)
-    )
-
-    # ask core to do a dry_run of a publish with the supplied criteria. this is
-    # a workaround for our inability to filter publishes by path. so for now,
-    # get a dictionary of data that would be used to create a matching publish
-    # and use that to get publishes via a call to find(). Then we'll filter
-    # those by their path field. Once we have the ability in SG to filter by
-    # path, we can replace this whole method with a simple call to find().
-    publish_data = sgtk.util.register_publish(
-        publisher.sgtk,
-        context,
-        path,
-        publish_name,
-        version_number=None,
-        dry_run=True
-    )
-    logger.debug("Publish dry run data: %s" % (publish_data,))
-
-    # now build up the filters to match against
-    publish_filters = [filters] if filters else []
-    for field in ["code", "entity", "name", "project", "task"]:
-        publish_filters.append([field, "is", publish_data[field]])
-    logger.debug("Build publish filters: %s" % (publish_filters,))
-
-    # run the
-    publishes = publisher.shotgun.find(
-        "PublishedFile",
-        publish_filters,
-        ["path"]
-    )
-
-    # ensure the path is normalized for comparison
-    normalized_path = sgtk.util.ShotgunPath.normalize(path)
-
-    # next, extract the publish path from each of the returned publishes and
-    # compare it against the supplied path. if the paths match, we add the
-    # publish to the list of publishes to return.
-    logger.debug("Comparing publish paths...")
-    matching_publishes = []
-    for publish in publishes:
-        publish_path = sgtk.util.resolve_publish_path(publisher.sgtk, publish)
-        if publish_path:
-            # ensure the published path is normalized for comparison
-            normalized_publish_path = sgtk.util.ShotgunPath.normalize(
-                publish_path)
-            if normalized_path == normalized_publish_path:
-                matching_publishes.append(publish)
-
-    return matching_publishes
-
-
 def clear_status_for_conflicting_publishes(context, publish_data):
     """
     Clear the status of any conflicting publishes matching the supplied publish
@@ -492,6 +1310,26 @@ def clear_status_for_conflicting_publishes(context, publish_data):
     :param publish_data: Dictionary of the current publish data (i.e. the
         publish entry whose status will not be cleared).
     """
+    clear_status_for_conflicting_publishes_batch([(context, publish_data)])
+
+
+def clear_status_for_conflicting_publishes_batch(publish_requests):
+    """
+    Clear the status of any conflicting publishes matching each of the
+    supplied publish data. This is the bulk equivalent of
+    :func:`clear_status_for_conflicting_publishes`.
+
+    The conflicting publishes of all requests are found with a single SG
+    find() per context, see :func:`get_conflicting_publishes_batch`, and
+    their status is cleared with a single SG batch() call.
+
+    :param publish_requests: A list of ``(context, publish_data)`` tuples,
+        where ``publish_data`` is the dictionary of the current publish data
+        (i.e. the publish entry whose status will not be cleared).
+
+    :returns: A list holding, for each request and in the same order, the list
+        of publishes whose status was cleared.
+    """
 
     publisher = sgtk.platform.current_bundle()
 
@@ -499,43 +1337,62 @@ def clear_status_for_conflicting_publishes(context, publish_data):
 
     # determine the path from the publish data. this will match the path that
     # was used to register the publish
-    path = sgtk.util.resolve_publish_path(publisher.sgtk, publish_data)
-    name = publish_data["name"]
+    conflict_requests = []
+    for (context, publish_data) in publish_requests:
+        path = sgtk.util.resolve_publish_path(publisher.sgtk, publish_data)
+        conflict_requests.append((context, path, publish_data["name"]))
 
     # get a list of all publishes matching this criteria
-    publishes = get_conflicting_publishes(
-        context,
-        path,
-        name,
+    results = get_conflicting_publishes_batch(
+        conflict_requests,
         filters=["sg_status_list", "is_not", None]
     )
 
-    if not publishes:
-        # no conflicting publishes. nothing to do.
-        logger.debug("No conflicting publishes detected for path: %s" % (path,))
-        return
-
     # do a batch update of the conflicting publishes to clear their status
     batch_data = []
-    for publish in publishes:
-
-        # make sure we don't update the supplied publish
-        if publish["id"] == publish_data["id"]:
-            continue
-
-        # add the update info to the batch data list
-        batch_data.append({
-            "request_type": "update",
-            "entity_type": publish["type"],
-            "entity_id": publish["id"],
-            "data": {"sg_status_list": None}  # will clear the status
-        })
-
-    if batch_data:
-        logger.debug(
-            "Batch updating publish data: %s" %
-            (pprint.pformat(batch_data),)
-        )
+    updated_ids = set()
+    cleared_publishes = []
+    request_indexes = dict(
+        (publish_data["id"], index)
+        for (index, (_, publish_data)) in enumerate(publish_requests)
+    )
+    for (index, publishes) in enumerate(results):
+
+        # make sure we don't update the supplied publish. the publishes of the
+        # following requests are kept as well: processing the requests one at
+        # a time, they would clear the status of this one instead
+        publishes = [
+            publish for publish in publishes
+            if request_indexes.get(publish["id"], -1) < index
+        ]
+        cleared_publishes.append(publishes)
+
+        for publish in publishes:
+
+            # a publish can conflict with several requests
+            if publish["id"] in updated_ids:
+                continue
+            updated_ids.add(publish["id"])
+
+            # add the update info to the batch data list
+            batch_data.append({
+                "request_type": "update",
+                "entity_type": publish["type"],
+                "entity_id": publish["id"],
+                "data": {"sg_status_list": None}  # will clear the status
+            })
+
+    if not batch_data:
+        # no conflicting publishes. nothing to do.
+        logger.debug("No conflicting publishes detected.")
+        return cleared_publishes
+
+    logger.debug(
+        "Batch updating publish data: %s" %
+        (pprint.pformat(batch_data),)
+    )
+
+    # execute all the updates!
+    publisher.shotgun.batch(batch_data)
 
-        # execute all the updates!
-        publisher.shotgun.batch(batch_data)
+    return cleared_publishes
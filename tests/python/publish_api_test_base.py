@@ -74,6 +74,8 @@ class PublishApiTestBase(TankTestBase):
         self.PublishManager = self.api.PublishManager
         self.PublishPluginInstance = self.api.plugins.PublishPluginInstance
 
+        self.util = self.app.util
+
         self.image_path = os.path.join(repo_root, "icon_256.png")
         self.dark_image_path = os.path.join(repo_root, "icon_256_dark.png")
 
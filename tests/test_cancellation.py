@@ -0,0 +1,68 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+from publish_api_test_base import PublishApiTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+from mock import Mock, MagicMock
+
+
+class TestCancellation(PublishApiTestBase):
+    """
+    Tests the cancellation tokens and timeouts of the publish phases.
+    """
+
+    def test_token(self):
+        """
+        Ensures tokens are cancelled explicitly, by their parent or by their
+        timeout.
+        """
+        parent = self.api.CancellationToken()
+        child = self.api.CancellationToken(parent=parent)
+        self.assertFalse(child.is_cancelled)
+        child.raise_if_cancelled()
+
+        parent.cancel("Test cancel!")
+        self.assertTrue(child.is_cancelled)
+        self.assertFalse(child.timed_out)
+        self.assertEqual(child.reason, "Test cancel!")
+        with self.assertRaises(self.api.PublishCancelledError):
+            child.raise_if_cancelled()
+
+        timed = self.api.CancellationToken(timeout=0.01)
+        self.assertTrue(timed.wait(1))
+        self.assertTrue(timed.timed_out)
+        with self.assertRaises(self.api.PublishTimeoutError):
+            timed.raise_if_cancelled()
+
+    def test_publish_timeout_undo(self):
+        """
+        Ensures a publish exceeding the plugin's hard timeout is undone and
+        aborted.
+        """
+        item = self.PublishItem("item", "item", "item", None, None, {})
+
+        hard_timeout = Mock(value=0.01)
+        plugin = MagicMock(settings={"Hard Timeout": hard_timeout})
+        plugin.init_task_settings.return_value = {}
+
+        def publish(settings, item):
+            # The item exposes the task's token while the plugin runs.
+            self.assertTrue(item.cancellation_token.wait(1))
+            item.cancellation_token.raise_if_cancelled()
+
+        plugin.run_publish.side_effect = publish
+
+        task = self.api.PublishTask(plugin, item)
+        with self.assertRaises(self.api.PublishTimeoutError):
+            task.publish()
+
+        self.assertEqual(plugin.run_undo.call_count, 1)
+        self.assertIsNone(item.cancellation_token)
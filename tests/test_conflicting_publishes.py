@@ -0,0 +1,199 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+
+import sgtk
+
+from publish_api_test_base import PublishApiTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+
+class TestConflictingPublishes(PublishApiTestBase):
+    """
+    Tests the batched lookup of conflicting publishes.
+    """
+
+    def setUp(self):
+        super(TestConflictingPublishes, self).setUp()
+        self.context = self.tk.context_from_entity(
+            self.project["type"], self.project["id"])
+
+        # register a few publishes, one of them twice
+        self.paths = []
+        for name in ["alpha", "beta", "alpha", "gamma"]:
+            path = os.path.join(self.project_root, "publishes", "%s.v001.ma" % (name,))
+            if path not in self.paths:
+                self.paths.append(path)
+            sgtk.util.register_publish(self.tk, self.context, path, name, 1)
+
+        # count the finds issued
+        self.find_calls = []
+        find = self.mockgun.find
+
+        def counting_find(*args, **kwargs):
+            self.find_calls.append(args)
+            return find(*args, **kwargs)
+
+        self.mockgun.find = counting_find
+
+    def test_batch(self):
+        """
+        Ensures all requests are resolved with a single find.
+        """
+        new_path = os.path.join(self.project_root, "publishes", "delta.v001.ma")
+        requests = [
+            (self.context, self.paths[0], "alpha"),
+            (self.context, self.paths[1], "beta"),
+            (self.context, self.paths[2], "gamma"),
+            (self.context, new_path, "delta"),
+            # a known path with another name doesn't conflict
+            (self.context, self.paths[1], "alpha"),
+        ]
+
+        results = self.util.get_conflicting_publishes_batch(requests)
+        self.assertEqual(len(self.find_calls), 1)
+        self.assertEqual([len(publishes) for publishes in results], [2, 1, 1, 0, 0])
+
+        # results match the per item lookup
+        for ((context, path, name), publishes) in zip(requests, results):
+            self.assertEqual(
+                sorted(p["id"] for p in self.util.get_conflicting_publishes(context, path, name)),
+                sorted(p["id"] for p in publishes)
+            )
+
+    def test_prefetch(self):
+        """
+        Ensures prefetched publishes are read from the cache.
+        """
+        cache = self.app.import_module("tk_multi_publish2").publish_cache.get_conflicting_publishes_cache()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        requests = [(self.context, path, name) for (path, name) in zip(self.paths, ["alpha", "beta", "gamma"])]
+        self.util.prefetch_conflicting_publishes(requests)
+        self.assertEqual(len(self.find_calls), 1)
+
+        for (context, path, name) in requests:
+            self.assertTrue(self.util.get_conflicting_publishes(context, path, name))
+        self.assertEqual(len(self.find_calls), 1)
+
+        # other filters aren't cached
+        self.util.get_conflicting_publishes(
+            self.context, self.paths[0], "alpha",
+            filters=["sg_status_list", "is_not", None]
+        )
+        self.assertEqual(len(self.find_calls), 2)
+
+        # prefetching again only queries missing requests
+        self.util.prefetch_conflicting_publishes(requests)
+        self.assertEqual(len(self.find_calls), 2)
+
+    def test_clear_status_batch(self):
+        """
+        Ensures the status of the conflicting publishes of all requests is
+        cleared with a single find and a single batch.
+        """
+        publishes = sorted(
+            self.mockgun.find("PublishedFile", [], ["code", "name", "path"]),
+            key=lambda publish: publish["id"]
+        )
+        for publish in publishes:
+            self.mockgun.update("PublishedFile", publish["id"], {"sg_status_list": "ip"})
+        alpha_publishes = [p for p in publishes if p["name"] == "alpha"]
+        beta_publishes = [p for p in publishes if p["name"] == "beta"]
+        self.find_calls[:] = []
+
+        # count the batches issued
+        batch_calls = []
+        batch = self.mockgun.batch
+
+        def counting_batch(requests):
+            batch_calls.append(requests)
+            return batch(requests)
+
+        self.mockgun.batch = counting_batch
+
+        results = self.util.clear_status_for_conflicting_publishes_batch([
+            (self.context, alpha_publishes[0]),
+            (self.context, alpha_publishes[1]),
+            (self.context, beta_publishes[0]),
+        ])
+        self.assertEqual(len(self.find_calls), 1)
+        self.assertEqual(len(batch_calls), 1)
+
+        # the last publish of a path keeps its status, as when clearing the
+        # publishes one at a time
+        self.assertEqual([[p["id"] for p in cleared] for cleared in results], [[], [alpha_publishes[0]["id"]], []])
+        statuses = dict(
+            (p["id"], p["sg_status_list"])
+            for p in self.mockgun.find("PublishedFile", [], ["sg_status_list"])
+        )
+        self.assertEqual(statuses[alpha_publishes[0]["id"]], None)
+        self.assertEqual(statuses[alpha_publishes[1]["id"]], "ip")
+        self.assertEqual(statuses[beta_publishes[0]["id"]], "ip")
+
+
+class TestPublishedFilesCache(PublishApiTestBase):
+    """
+    Tests the lookup of the existing publishes of a context.
+    """
+
+    def setUp(self):
+        super(TestPublishedFilesCache, self).setUp()
+        self.context = self.tk.context_from_entity(
+            self.project["type"], self.project["id"])
+
+        self.cache = self.util.get_published_files_cache()
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+
+        for (name, version) in [("plate", 1), ("plate", 2), ("plate_bg", 5), ("comp", 3)]:
+            path = os.path.join(self.project_root, "publishes", "%s.v%03d.exr" % (name, version))
+            sgtk.util.register_publish(
+                self.tk, self.context, path, name, version,
+                published_file_type="Image"
+            )
+
+        # count the finds issued
+        self.find_calls = []
+        find = self.mockgun.find
+
+        def counting_find(*args, **kwargs):
+            self.find_calls.append(args)
+            return find(*args, **kwargs)
+
+        self.mockgun.find = counting_find
+
+    def test_find(self):
+        """
+        Ensures lookups by name and type are resolved from a single query.
+        """
+        versions = [
+            sorted(p["version_number"] for p in self.util.find_publishes(self.context, name, "Image"))
+            for name in ["plate", "plate_bg", "comp", "other"]
+        ]
+        self.assertEqual(versions, [[1, 2, 5], [5], [3], []])
+        self.assertEqual(self.util.find_publishes(self.context, "plate", "Movie"), [])
+        self.assertEqual(len(self.find_calls), 1)
+
+    def test_registration(self):
+        """
+        Ensures registered publishes are found by the following lookups.
+        """
+        self.assertEqual(len(self.util.find_publishes(self.context, "comp")), 1)
+
+        path = os.path.join(self.project_root, "publishes", "comp.v004.exr")
+        sg_publish_data = sgtk.util.register_publish(
+            self.tk, self.context, path, "comp", 4, published_file_type="Image")
+        self.cache.discard(sg_publish_data)
+
+        self.assertEqual(len(self.util.find_publishes(self.context, "comp")), 2)
+        self.assertEqual(len(self.find_calls), 2)
@@ -0,0 +1,70 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+from mock import MagicMock, patch
+
+from publish_api_test_base import PublishApiTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+
+class TestContextCache(PublishApiTestBase):
+    """
+    Tests the memoization of context data.
+    """
+
+    def setUp(self):
+        super(TestContextCache, self).setUp()
+        self.cache = self.app.import_module("tk_multi_publish2").context_cache.ContextCache()
+
+        # build the contexts of a few shots
+        self.shots = [
+            self.mockgun.create("Shot", {"code": "shot_%02d" % (index,), "project": self.project})
+            for index in range(5)
+        ]
+        self.contexts = [
+            self.tk.context_from_entity(shot["type"], shot["id"])
+            for shot in self.shots
+        ]
+
+    def test_template_fields(self):
+        """
+        Ensures the template fields of a context are resolved once per
+        template.
+        """
+        template = MagicMock()
+        template.name = "shot_work"
+        context = self.contexts[0]
+
+        with patch.object(context, "as_template_fields", return_value={"Shot": "shot_00"}) as as_template_fields:
+            for _ in range(3):
+                fields = self.cache.as_template_fields(context, template)
+                self.assertEqual(fields, {"Shot": "shot_00"})
+                # callers can update the returned fields
+                fields["version"] = 1
+
+            self.assertEqual(as_template_fields.call_count, 1)
+
+            self.cache.as_template_fields(context, template, validate=True)
+            self.assertEqual(as_template_fields.call_count, 2)
+
+    def test_context_from_entities(self):
+        """
+        Ensures the contexts of identical entities are built once.
+        """
+        tk = MagicMock()
+        tk.context_from_entities.side_effect = lambda entities, previous_context: object()
+
+        contexts = [
+            self.cache.context_from_entities(tk, [self.shots[index % 2]], self.contexts[0])
+            for index in range(4)
+        ]
+        self.assertEqual(tk.context_from_entities.call_count, 2)
+        self.assertIs(contexts[0], contexts[2])
+        self.assertIsNot(contexts[0], contexts[1])
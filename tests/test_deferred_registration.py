@@ -0,0 +1,216 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+
+from mock import MagicMock, patch
+
+from publish_api_test_base import PublishApiTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+
+class TestDeferredRegistration(PublishApiTestBase):
+    """
+    Tests the deferral and replay of publish registrations and Version
+    creations.
+    """
+
+    def setUp(self):
+        super(TestDeferredRegistration, self).setUp()
+        self.deferred = self.app.import_module("tk_multi_publish2").deferred
+        self.queue = self.deferred.DeferredRegistrationQueue(
+            folder=os.path.join(self.project_root, "deferred"))
+        self.context = self.tk.context_from_entity(
+            self.project["type"], self.project["id"])
+
+        # record the uploads of the replayed Versions
+        self.uploads = []
+        shotgun = MagicMock()
+        shotgun.upload.side_effect = lambda *args: self.uploads.append(args)
+        shotgun.upload_thumbnail.side_effect = lambda *args: self.uploads.append(args)
+        shotgun_pool = self.app.import_module("tk_multi_publish2").shotgun_pool
+        pool = shotgun_pool.ShotgunPool(connection_factory=lambda: shotgun)
+        patcher = patch.object(shotgun_pool, "_shotgun_pool", pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.thumbnail_path = os.path.join(self.project_root, "thumbnail.png")
+        with open(self.thumbnail_path, "wb") as fh:
+            fh.write("thumbnail")
+
+        self.movie_path = os.path.join(self.project_root, "scene.mov")
+        with open(self.movie_path, "wb") as fh:
+            fh.write("movie")
+
+    def _defer_publish(self, name, dependencies=None):
+        """
+        Defers the registration of a publish.
+        """
+        return self.queue.defer_publish(
+            {
+                "tk": self.tk,
+                "context": self.context,
+                "path": os.path.join(self.project_root, "publishes", "%s.v001.ma" % (name,)),
+                "name": name,
+                "version_number": 1,
+                "thumbnail_path": self.thumbnail_path,
+            },
+            dependencies=dependencies
+        )
+
+    def _find_publishes(self):
+        return self.mockgun.find("PublishedFile", [], ["code"])
+
+    def test_replay(self):
+        """
+        Ensures deferred registrations are replayed once.
+        """
+        scene_key = self._defer_publish("scene")
+        self._defer_publish("cache", dependencies=[scene_key])
+        self.queue.defer_version(
+            {"project": self.project, "code": "scene"},
+            published_files=[scene_key],
+            uploads=[(self.movie_path, "sg_uploaded_movie"), (self.thumbnail_path, None)]
+        )
+
+        # the files are copied, the originals can change or be discarded
+        os.remove(self.thumbnail_path)
+        os.remove(self.movie_path)
+        self.assertEqual(len(self.queue.get_pending()), 3)
+        self.assertEqual(self._find_publishes(), [])
+
+        result = self.queue.replay()
+        self.assertEqual(
+            result, {"registered": 2, "versions": 1, "failed": 0, "pending": 0})
+        self.assertEqual(len(self._find_publishes()), 2)
+        self.assertEqual(len(self.uploads), 2)
+
+        versions = self.mockgun.find("Version", [], ["code", "published_files"])
+        self.assertEqual(len(versions), 1)
+        self.assertEqual(len(versions[0]["published_files"]), 1)
+
+        # replaying again doesn't register anything twice
+        self.assertEqual(
+            self.queue.replay(),
+            {"registered": 0, "versions": 0, "failed": 0, "pending": 0}
+        )
+        self.assertEqual(len(self._find_publishes()), 2)
+        self.assertEqual(len(self.mockgun.find("Version", [], [])), 1)
+        self.assertEqual(
+            os.listdir(os.path.join(self.queue.folder, "files")), [])
+
+    def test_interrupted_replay(self):
+        """
+        Ensures publishes created by an interrupted replay aren't registered
+        again.
+        """
+        scene_key = self._defer_publish("scene")
+        self._defer_publish("cache", dependencies=[scene_key])
+
+        # the replay is killed once the parent publish is created, before its
+        # dependent publish is
+        with patch.object(
+                self.deferred.RegistrationQueue,
+                "_create_dependencies",
+                side_effect=KeyboardInterrupt):
+            self.assertRaises(KeyboardInterrupt, self.queue.replay)
+        self.assertEqual(len(self._find_publishes()), 1)
+
+        self.assertEqual(len(self.queue.get_pending()), 1)
+        self.assertEqual(self.queue.replay()["registered"], 1)
+        self.assertEqual(len(self._find_publishes()), 2)
+
+    def test_lost_results(self):
+        """
+        Ensures registrations created by a replay whose result was lost aren't
+        created again.
+        """
+        # add the field storing the keys to the schema of the site
+        key_field = self.app.get_setting("deferred_registration_key_field")
+        for entity_type in ["PublishedFile", "Version"]:
+            self.mockgun._schema[entity_type][key_field] = {
+                "data_type": {"value": "text"},
+                "editable": {"value": True},
+                "entity_type": {"value": entity_type},
+                "name": {"value": "Deferred Registration Key"},
+            }
+        self.app.import_module("tk_multi_publish2").schema.get_schema_cache().clear()
+
+        scene_key = self._defer_publish("scene")
+        version_key = self.queue.defer_version(
+            {"project": self.project, "code": "scene"},
+            published_files=[scene_key],
+            uploads=[(self.movie_path, "sg_uploaded_movie")]
+        )
+
+        append = self.queue._append
+
+        def lose_results(lost_keys):
+            def _append(records):
+                if any(record.get("done") in lost_keys for record in records):
+                    raise KeyboardInterrupt
+                append(records)
+            return _append
+
+        # the replay is killed once the publish is created, before it is
+        # recorded as done
+        with patch.object(self.queue, "_append", side_effect=lose_results([scene_key])):
+            self.assertRaises(KeyboardInterrupt, self.queue.replay)
+        self.assertEqual(len(self._find_publishes()), 1)
+        self.assertEqual(len(self.queue.get_pending()), 2)
+
+        # the publish is recovered, the Version is lost the same way
+        with patch.object(self.queue, "_append", side_effect=lose_results([version_key])):
+            self.assertRaises(KeyboardInterrupt, self.queue.replay)
+        self.assertEqual(len(self._find_publishes()), 1)
+        self.assertEqual(len(self.mockgun.find("Version", [], [])), 1)
+        self.assertEqual(self.uploads, [])
+
+        # the Version is recovered and its files uploaded
+        self.assertEqual(
+            self.queue.replay(),
+            {"registered": 0, "versions": 1, "failed": 0, "pending": 0}
+        )
+        self.assertEqual(len(self._find_publishes()), 1)
+        self.assertEqual(len(self.mockgun.find("Version", [], [])), 1)
+        self.assertEqual(len(self.uploads), 1)
+
+    def test_pending_dependencies(self):
+        """
+        Ensures Versions are kept in the queue until their publishes are
+        registered.
+        """
+        scene_key = self._defer_publish("scene")
+        self.queue.defer_version(
+            {"project": self.project, "code": "scene"},
+            published_files=[scene_key]
+        )
+
+        # a publish failing to register keeps its Version pending
+        with patch("sgtk.util.register_publish", side_effect=Exception("Offline")):
+            result = self.queue.replay()
+        self.assertEqual(result["registered"], 0)
+        self.assertEqual(result["pending"], 2)
+        self.assertEqual(self.mockgun.find("Version", [], []), [])
+
+        result = self.queue.replay()
+        self.assertEqual(
+            result, {"registered": 1, "versions": 1, "failed": 0, "pending": 0})
+
+    def test_cancel(self):
+        """
+        Ensures cancelled registrations aren't replayed.
+        """
+        keys = [self._defer_publish("scene"), self._defer_publish("cache")]
+        self.queue.cancel(keys[:1])
+
+        self.assertEqual([entry["key"] for entry in self.queue.get_pending()], keys[1:])
+        self.assertEqual(self.queue.replay()["registered"], 1)
+        self.assertEqual([publish["code"] for publish in self._find_publishes()], ["cache.v001.ma"])
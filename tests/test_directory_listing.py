@@ -0,0 +1,123 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import glob
+import os
+import time
+
+from publish_api_test_base import PublishApiTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+
+class TestDirectoryListing(PublishApiTestBase):
+    """
+    Tests the caching of folder listings done by the util module.
+    """
+
+    def setUp(self):
+        super(TestDirectoryListing, self).setUp()
+        self.cache = self.util.DirectoryListingCache()
+
+        self.folder = os.path.join(self.tank_temp, "listing")
+        os.makedirs(os.path.join(self.folder, "subfolder.0001.exr"))
+        for frame in range(1001, 1011):
+            self._touch("plate.%04d.exr" % (frame,))
+        self._touch(".hidden.0001.exr")
+        self._age_folder()
+
+    def _touch(self, filename):
+        with open(os.path.join(self.folder, filename), "w") as fh:
+            fh.write(filename)
+
+    def _age_folder(self):
+        # listings of folders modified within the last second aren't cached
+        mtime = time.time() - 10
+        os.utime(self.folder, (mtime, mtime))
+
+    def test_glob(self):
+        """
+        Ensures globbing matches glob.glob, restricted to files.
+        """
+        pattern = os.path.join(self.folder, "*.exr")
+        expected = sorted(f for f in glob.glob(pattern) if os.path.isfile(f))
+
+        self.assertEqual(self.cache.glob(pattern), expected)
+        self.assertEqual(self.cache.glob(pattern), expected)
+        self.assertEqual(self.cache.stats["hits"], 1)
+        self.assertEqual(self.cache.stats["misses"], 1)
+        self.assertGreaterEqual(self.cache.stats["calls_saved"], 12)
+
+        self.assertEqual(
+            self.cache.glob(os.path.join(self.folder, ".*.exr")),
+            [os.path.join(self.folder, ".hidden.0001.exr")]
+        )
+        self.assertEqual(self.cache.glob(os.path.join(self.tank_temp, "missing", "*")), [])
+
+    def test_invalidation(self):
+        """
+        Ensures listings are invalidated once their folder is modified.
+        """
+        pattern = os.path.join(self.folder, "plate.*.exr")
+        self.assertEqual(len(self.cache.glob(pattern)), 10)
+
+        self._touch("plate.1011.exr")
+        self.assertEqual(len(self.cache.glob(pattern)), 11)
+
+        # recently modified folders are listed again
+        self.assertEqual(self.cache.stats["hits"], 0)
+        self.assertEqual(self.cache.stats["size"], 0)
+
+        self._age_folder()
+        self.cache.glob(pattern)
+        self.cache.glob(pattern)
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+    def test_frame_sequences(self):
+        """
+        Ensures sequences are found from the cached listing, ignoring folders.
+        """
+        sequences = self.util.get_frame_sequences(self.folder, ["exr"])
+        paths = [seq_path for (seq_path, _) in sequences]
+        self.assertIn(os.path.join(self.folder, "plate.%04d.exr"), paths)
+        self.assertNotIn(os.path.join(self.folder, "subfolder.%04d.exr"), paths)
+
+        files = self.util.get_sequence_path_files(
+            os.path.join(self.folder, "plate.%04d.exr")
+        )
+        self.assertEqual(len(files), 10)
+
+    def test_walk_folders(self):
+        """
+        Ensures all subfolders are walked once, skipping ignored folders, and
+        that walks can be cancelled.
+        """
+        root = os.path.join(self.tank_temp, "walk")
+        expected = set([root])
+        for shot in range(5):
+            for layer in range(4):
+                folder = os.path.join(root, "shot%d" % (shot,), "layer%d" % (layer,))
+                os.makedirs(folder)
+                expected.add(folder)
+                expected.add(os.path.dirname(folder))
+        os.makedirs(os.path.join(root, ".snapshot", "shot0"))
+
+        folders = [
+            folder for (folder, error) in
+            self.util.walk_folders(root, max_workers=4, ignore_patterns=[".*"])
+        ]
+        self.assertEqual(len(folders), len(expected))
+        self.assertEqual(set(folders), expected)
+
+        token = self.api.CancellationToken()
+        num_folders = 0
+        for _ in self.util.walk_folders(root, max_workers=4, cancellation_token=token):
+            num_folders += 1
+            token.cancel()
+        self.assertEqual(num_folders, 1)
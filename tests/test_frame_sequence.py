@@ -0,0 +1,128 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import json
+import logging
+import os
+import time
+
+from publish_api_test_base import PublishApiTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+logger = logging.getLogger(__name__)
+
+
+class TestFrameSequence(PublishApiTestBase):
+    """
+    Tests the compact representation of the paths of sequences.
+    """
+
+    def setUp(self):
+        super(TestFrameSequence, self).setUp()
+        self.frames = range(1001, 1241) + range(1250, 1301)
+        self.paths = ["/shots/plate.%04d.exr" % (frame,) for frame in self.frames]
+        self.sequence = self.util.FrameSequence.from_paths(
+            "/shots/plate.%04d.exr", reversed(self.paths)
+        )
+
+    def test_sequence(self):
+        """
+        Ensures a frame sequence behaves like the list of its paths.
+        """
+        self.assertEqual(str(self.sequence), "/shots/plate.%04d.exr 1001-1240,1250-1300")
+        self.assertEqual(len(self.sequence), len(self.paths))
+        self.assertEqual(self.sequence, self.paths)
+        self.assertEqual(list(self.sequence), self.paths)
+        self.assertEqual(self.sequence[0], self.paths[0])
+        self.assertEqual(self.sequence[-1], self.paths[-1])
+        self.assertEqual(self.sequence[240], "/shots/plate.1250.exr")
+        self.assertEqual(self.sequence[10:12], self.paths[10:12])
+        self.assertEqual(list(self.sequence.frames), self.frames)
+
+        self.assertIn("/shots/plate.1250.exr", self.sequence)
+        self.assertNotIn("/shots/plate.1245.exr", self.sequence)
+        self.assertNotIn("/shots/plate.01250.exr", self.sequence)
+        self.assertEqual(self.sequence.index("/shots/plate.1250.exr"), 240)
+
+        with self.assertRaises(IndexError):
+            self.sequence[len(self.paths)]
+
+        with self.assertRaises(ValueError):
+            self.util.FrameSequence.from_paths("/shots/plate.####.exr", self.paths)
+
+    def test_serialization(self):
+        """
+        Ensures frame sequences round trip through string and item property
+        serialization.
+        """
+        FrameSequence = self.util.FrameSequence
+
+        self.assertEqual(FrameSequence.from_string(str(self.sequence)), self.sequence)
+        self.assertEqual(
+            FrameSequence.from_string("/a folder/plate.%d.exr 5").ranges,
+            ((5, 5),)
+        )
+
+        data = self.PublishData(sequence_paths=self.sequence)
+        data_dict = json.loads(
+            json.dumps(data.to_dict(), default=lambda value: value.to_dict())
+        )
+        self.assertEqual(
+            self.PublishData.from_dict(data_dict).sequence_paths, self.sequence
+        )
+
+        # orders of magnitude smaller than the list of paths
+        self.assertLess(
+            len(json.dumps(self.sequence.to_dict())) * 50,
+            len(json.dumps(self.paths))
+        )
+
+    def test_analysis(self):
+        """
+        Ensures gaps, duplicates and empty frames are reported.
+        """
+        folder = os.path.join(self.tank_temp, "analysis")
+        os.makedirs(folder)
+
+        paths = []
+        for frame in range(1001, 1010) + [1012, 1013]:
+            paths.append(os.path.join(folder, "plate.%04d.exr" % (frame,)))
+        paths.append(os.path.join(folder, "plate.01003.exr"))
+        for path in paths:
+            with open(path, "w") as fh:
+                if not path.endswith("1005.exr"):
+                    fh.write("x" * 1000)
+
+        analysis = self.util.analyze_sequence(paths)
+        self.assertEqual(analysis.first_frame, 1001)
+        self.assertEqual(analysis.last_frame, 1013)
+        self.assertEqual(analysis.gaps, [(1010, 1011)])
+        self.assertEqual(list(analysis.duplicates), [1003])
+        self.assertEqual(len(analysis.duplicates[1003]), 2)
+        self.assertEqual(analysis.empty_files, [os.path.join(folder, "plate.1005.exr")])
+        self.assertTrue(analysis.has_issues)
+
+        analysis = self.util.analyze_sequence(self.sequence, check_sizes=False)
+        self.assertEqual(analysis.gaps, [(1241, 1249)])
+        self.assertEqual(analysis.num_missing, 9)
+
+    def test_analysis_benchmark(self):
+        """
+        Times the analysis of a 50k frames sequence.
+        """
+        paths = ["/shots/plate.%05d.exr" % (frame,) for frame in range(50000) if frame % 1000]
+
+        start = time.time()
+        analysis = self.util.analyze_sequence(paths, check_sizes=False)
+        elapsed = time.time() - start
+
+        logger.info("Analyzed 50k frames in %.3fs" % (elapsed,))
+        self.assertEqual(len(analysis.gaps), 49)
+        self.assertLess(elapsed, 5)
@@ -46,6 +46,65 @@ class TestPublishItem(PublishApiTestBase):
         # on items.
         self.assertListEqual(expected_depth_first, list(self.manager.tree))
 
+    def test_bulk_item_creation(self):
+        """
+        Ensures items created in bulk are parented, ordered and share contexts.
+        """
+        root = self.manager.tree.root_item
+        collector = self.manager.load_collector(self.manager.context)
+
+        item_specs = []
+        for index in range(10):
+            # pass a distinct, but equal, context for every other item
+            context = self.manager.context if index % 2 else None
+            item_specs.append(
+                ("generic.item", "Generic Item", "Item %d" % index, {"index": index}, context)
+            )
+
+        items = root.create_items(item_specs, collector)
+
+        self.assertEqual(len(items), 10)
+        self.assertListEqual(items, list(root.children))
+
+        for (index, item) in enumerate(items):
+            self.assertEqual(item.name, "Item %d" % index)
+            self.assertEqual(item.type_spec, "generic.item")
+            self.assertEqual(item.properties.index, index)
+            self.assertEqual(item.parent, root)
+
+            # equal contexts are shared between the created items
+            self.assertIs(item.context, items[0].context)
+
+        # all the items should have the same plugins attached
+        plugin_names = [task.plugin.name for task in items[0].tasks]
+        for item in items:
+            self.assertListEqual([task.plugin.name for task in item.tasks], plugin_names)
+
+    def test_context_change_accept_results(self):
+        """
+        Ensures the accept results memoized for an item are only discarded when
+        its context changes.
+        """
+        shot = self.mockgun.create("Shot", {"code": "shot_01", "project": self.project})
+        shot_context = self.tk.context_from_entity(shot["type"], shot["id"])
+
+        root = self.manager.tree.root_item
+        collector = self.manager.load_collector(self.manager.context)
+
+        with patch.object(self.PublishPluginInstance, "discard_accept_result") as discard_accept_result:
+            # the item is created with the context of its parent
+            item = root.create_item("generic.item", "Generic Item", "Item", collector)
+            item.context = root.context
+            self.assertTrue(item.tasks)
+            self.assertEqual(discard_accept_result.call_count, 0)
+
+            # only the results memoized for the item are discarded
+            item.context = shot_context
+            self.assertListEqual(
+                discard_accept_result.call_args_list,
+                [((task.settings, item),) for task in item.tasks]
+            )
+
     def test_task_creation(self):
 
         item = self.PublishItem("test", "test", "test")
@@ -11,7 +11,7 @@
 from publish_api_test_base import PublishApiTestBase
 from tank_test.tank_test_base import setUpModule # noqa
 
-from mock import Mock, MagicMock
+from mock import Mock, MagicMock, patch
 
 
 class TestManager(PublishApiTestBase):
@@ -42,6 +42,36 @@ class TestManager(PublishApiTestBase):
         next(self.manager.tree.root_item.children).persistent = False
         self.assertEqual(self.manager.collected_files, [D_PNG])
 
+    def test_collected_callback(self):
+        """
+        Ensures the items reported by the collector are forwarded while files
+        are collected, and only then.
+        """
+        root_item = self.manager.tree.root_item
+        collector = self.manager.load_collector(self.manager.context)
+        collected = []
+
+        def process_file(parent_item, path):
+            items = parent_item.create_items(
+                [("generic.item", "Generic Item", "Item", None, None)], collector)
+            parent_item.notify_items_collected(items)
+            # the items are forwarded before the collection completes
+            self.assertEqual(collected, [items])
+
+        with patch.object(
+                self.manager._collector_instance,
+                "run_process_file",
+                side_effect=process_file) as run_process_file:
+            new_items = self.manager.collect_files(
+                ["/a/b/c.png"], collected_callback=collected.append)
+
+        self.assertEqual(run_process_file.call_count, 1)
+        self.assertEqual(collected, [new_items])
+
+        # reports outside of the collection are ignored
+        root_item.notify_items_collected(new_items)
+        self.assertEqual(len(collected), 1)
+
     def test_publish_workflow(self):
         """
         Ensures the default publish workflow works.
@@ -154,3 +184,46 @@ class TestManager(PublishApiTestBase):
 
         with self.assertRaisesRegex(Exception, "Test error!"):
             self.manager.publish(test_nodes())
+
+    def test_cancellation(self):
+        """
+        Ensures no more tasks are processed once the token is cancelled.
+        """
+        token = self.api.CancellationToken()
+
+        def cancel(cancellation_token):
+            # The manager forwards its token to the task.
+            self.assertIs(cancellation_token, token)
+            token.cancel("Test cancel!")
+            return True
+
+        task_1 = MagicMock(validate=Mock(side_effect=cancel))
+        task_2 = MagicMock(validate=Mock(return_value=True))
+
+        def test_nodes():
+            yield task_1
+            yield task_2
+
+        self.assertEqual(self.manager.validate(test_nodes(), token), [])
+        self.assertEqual(task_1.validate.call_count, 1)
+        self.assertEqual(task_2.validate.call_count, 0)
+
+    def test_pre_phases(self):
+        """
+        Ensures the pre phases run for the tasks supplied with custom
+        generators, and for all active tasks otherwise.
+        """
+        task = MagicMock(validate=Mock(return_value=True))
+
+        def test_nodes():
+            yield task
+
+        with patch.object(self.manager, "_run_pre_phase") as run_pre_phase:
+            self.manager.validate(test_nodes(), tasks=[task])
+            self.manager.finalize(test_nodes(), tasks=[task])
+            self.manager.validate()
+            self.manager.finalize()
+            self.assertEqual(
+                [args for (args, _) in run_pre_phase.call_args_list],
+                [("validate", [task]), ("finalize", [task]), ("validate", None), ("finalize", None)]
+            )
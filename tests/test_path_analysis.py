@@ -0,0 +1,111 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import logging
+import os
+import time
+
+from mock import patch
+
+from publish_api_test_base import PublishApiTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+logger = logging.getLogger(__name__)
+
+
+class TestPathAnalysis(PublishApiTestBase):
+    """
+    Tests the memoization of path analysis done by the path_analysis module.
+    """
+
+    def setUp(self):
+        super(TestPathAnalysis, self).setUp()
+        self.path_analysis = self.app.import_module("tk_multi_publish2").path_analysis
+        self.cache = self.path_analysis.PathAnalysisCache(max_size=100)
+
+    def test_components(self):
+        """
+        Ensures components are memoized per normalized path and returned as
+        copies.
+        """
+        path = os.path.join(self.tank_temp, "a", "b", "file.v001.exr")
+
+        file_info = self.cache.get_components(path)
+        self.assertEqual(file_info["filename"], "file.v001.exr")
+        self.assertEqual(file_info["extension"], "exr")
+
+        # modifying the returned value doesn't alter the cache
+        file_info["extension"] = "jpg"
+        self.assertEqual(self.cache.get_components(path)["extension"], "exr")
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+    def test_pipeline_configurations(self):
+        """
+        Ensures analysis is memoized per pipeline configuration and cleared
+        when the manager collects files.
+        """
+        path = os.path.join(self.tank_temp, "a", "b", "file.v001.exr")
+        self.cache.get_components(path)
+        misses = self.cache.stats["misses"]
+        self.cache.get_components(path)
+        self.assertEqual(self.cache.stats["misses"], misses)
+
+        pipeline_configuration = self.app.sgtk.pipeline_configuration
+        with patch.object(pipeline_configuration, "get_path", return_value="/other/config"):
+            self.cache.get_components(path)
+        self.assertGreater(self.cache.stats["misses"], misses)
+
+        with patch.object(self.path_analysis, "_path_analysis_cache", self.cache):
+            self.manager.collect_files([])
+        self.assertEqual(self.cache.stats["size"], 0)
+
+    def test_eviction(self):
+        """
+        Ensures the least recently used paths are evicted.
+        """
+        paths = ["/a/b/file.%04d.exr" % (frame,) for frame in range(150)]
+        for path in paths:
+            self.cache.get_components(path)
+
+        self.assertLessEqual(self.cache.stats["size"], 200)
+
+        misses = self.cache.stats["misses"]
+        self.cache.get_components(paths[-1])
+        self.assertEqual(self.cache.stats["misses"], misses)
+        self.cache.get_components(paths[0])
+        self.assertGreater(self.cache.stats["misses"], misses)
+
+    def test_benchmark(self):
+        """
+        Compares the analysis of 10k paths with a cold and a warm cache.
+        """
+        cache = self.path_analysis.PathAnalysisCache(max_size=20000)
+        paths = [
+            os.path.join(self.tank_temp, "plates", "plate.%04d.exr" % (frame,))
+            for frame in range(10000)
+        ]
+
+        start = time.time()
+        for path in paths:
+            cache.get_components(path)
+        cold_time = time.time() - start
+
+        start = time.time()
+        for path in paths:
+            cache.get_components(path)
+        warm_time = time.time() - start
+
+        logger.info(
+            "10k paths: %.3fs cold, %.3fs warm (%s)" %
+            (cold_time, warm_time, cache.stats)
+        )
+
+        self.assertEqual(cache.stats["hits"], 10000)
+        self.assertLess(warm_time, cold_time)
@@ -0,0 +1,71 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import logging
+import os
+import time
+
+from publish_api_test_base import PublishApiTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+logger = logging.getLogger(__name__)
+
+
+class TestPathInfo(PublishApiTestBase):
+    """
+    Tests the frame substitution of the path_info hook.
+    """
+
+    def test_path_for_frame(self):
+        """
+        Ensures frames are substituted for the supported frame specs.
+        """
+        folder = os.path.join(self.tank_temp, "plates")
+
+        self.assertEqual(
+            self.util.get_path_for_frame(os.path.join(folder, "plate.%04d.exr"), 1001),
+            os.path.join(folder, "plate.1001.exr")
+        )
+        self.assertEqual(
+            self.util.get_path_for_frame(
+                os.path.join(folder, "plate_{FRAME}.exr"), "*", "{FRAME}"
+            ),
+            os.path.join(folder, "plate_*.exr")
+        )
+        self.assertIsNone(
+            self.util.get_path_for_frame(os.path.join(folder, "plate.exr"), 1001)
+        )
+        # memoized paths are resolved identically
+        self.assertIsNone(
+            self.util.get_path_for_frame(os.path.join(folder, "plate.exr"), 1002)
+        )
+
+    def test_benchmark(self):
+        """
+        Times 100k frame substitutions for a known sequence.
+        """
+        seq_path = os.path.join(self.tank_temp, "plates", "plate.%04d.exr")
+
+        start = time.time()
+        self.util.get_path_for_frame(seq_path, 1)
+        cold_time = time.time() - start
+
+        frames = range(100000)
+        start = time.time()
+        paths = [self.util.get_path_for_frame(seq_path, frame) for frame in frames]
+        warm_time = time.time() - start
+
+        logger.info(
+            "100k frame substitutions: %.3fs, first substitution: %.6fs" %
+            (warm_time, cold_time)
+        )
+
+        self.assertEqual(paths[-1], seq_path.replace("%04d", "99999"))
+        self.assertLess(warm_time / len(frames), cold_time)
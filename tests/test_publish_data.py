@@ -61,3 +61,56 @@ class TestPublishData(PublishApiTestBase):
             self.PublishData.from_dict(data.to_dict()).to_dict(),
             {"one": 1, "two": 2}
         )
+
+    def test_lazy_values(self):
+        """
+        Ensure lazy values are resolved once, on first access, and are not
+        resolved when persisted.
+        """
+        data = self.PublishData()
+        data.one = 1
+
+        calls = []
+
+        def _get_two():
+            calls.append(True)
+            return 2
+
+        data.set_lazy("two", _get_two)
+
+        # The key is visible without being resolved.
+        self.assertTrue("two" in data)
+        self.assertFalse(data.is_resolved("two"))
+        self.assertEqual(sorted(data), ["one", "two"])
+        self.assertEqual(len(data), 2)
+        self.assertEqual(calls, [])
+
+        # Resolved on first access and memoized.
+        self.assertEqual(data.two, 2)
+        self.assertEqual(data["two"], 2)
+        self.assertTrue(data.is_resolved("two"))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(data.to_dict(), {"one": 1, "two": 2})
+
+        # Pending values are skipped when persisted.
+        data.set_lazy("five", _get_two)
+        self.assertEqual(data.to_dict(), {"one": 1, "two": 2})
+        self.assertFalse(data.is_resolved("five"))
+
+        # Assigning or deleting a key discards its provider.
+        data.set_lazy("three", _get_two)
+        data["three"] = 3
+        self.assertEqual(data.three, 3)
+
+        data.set_lazy("five", _get_two)
+        data.five = 5
+        self.assertTrue(data.is_resolved("five"))
+        self.assertEqual(data.to_dict(), {"one": 1, "two": 2, "three": 3, "five": 5})
+        del data.five
+        self.assertFalse("five" in data)
+
+        data.set_lazy("four", _get_two)
+        del data["four"]
+        self.assertFalse("four" in data)
+        self.assertFalse(hasattr(data, "four"))
+        self.assertEqual(len(calls), 1)
@@ -146,3 +146,118 @@ class TestPublishPluginInstance(PublishApiTestBase):
         handler.keyword = "Error running accept for"
         self.assertEqual(ppi.run_accept(None), {"accepted": True})
         self.assertFalse(handler.found)
+
+    @mock_publish_plugin_instance_hook_creation
+    def test_accept_cache(self, create_hook_instance):
+        """
+        Ensure accept results are memoized by the key provided by the hook.
+        """
+        accept = Mock(return_value={"accepted": True})
+        create_hook_instance.return_value = MagicMock(
+            accept=accept,
+            accept_cache_key=Mock(side_effect=lambda settings, item: item.type)
+        )
+        ppi = self.PublishPluginInstance("test hook", None, {}, logger)
+
+        for item_type in ["file.image", "file.image", "file.video", "file.image"]:
+            self.assertEqual(
+                ppi.run_accept({}, Mock(type=item_type)), {"accepted": True}
+            )
+
+        self.assertEqual(accept.call_count, 2)
+        self.assertEqual(
+            ppi.accept_cache_stats, {"hits": 2, "misses": 2, "size": 2}
+        )
+
+        # Once cleared, the hook is called again.
+        ppi.clear_accept_cache()
+        ppi.run_accept({}, Mock(type="file.image"))
+        self.assertEqual(accept.call_count, 3)
+
+    @mock_publish_plugin_instance_hook_creation
+    def test_discard_accept_result(self, create_hook_instance):
+        """
+        Ensure only the accept result memoized for the key of an item is
+        discarded.
+        """
+        accept = Mock(return_value={"accepted": True})
+        create_hook_instance.return_value = MagicMock(
+            accept=accept,
+            accept_cache_key=Mock(side_effect=lambda settings, item: item.type)
+        )
+        ppi = self.PublishPluginInstance("test hook", None, {}, logger)
+
+        for item_type in ["file.image", "file.video"]:
+            ppi.run_accept({}, Mock(type=item_type))
+
+        ppi.discard_accept_result({}, Mock(type="file.image"))
+        self.assertEqual(ppi.accept_cache_stats["size"], 1)
+
+        ppi.run_accept({}, Mock(type="file.video"))
+        self.assertEqual(accept.call_count, 2)
+        ppi.run_accept({}, Mock(type="file.image"))
+        self.assertEqual(accept.call_count, 3)
+
+    @mock_publish_plugin_instance_hook_creation
+    def test_accept_cache_disabled(self, create_hook_instance):
+        """
+        Ensure accept results are not memoized without a key.
+        """
+        accept = Mock(return_value={"accepted": True})
+        create_hook_instance.return_value = MagicMock(
+            accept=accept,
+            accept_cache_key=Mock(return_value=None)
+        )
+        ppi = self.PublishPluginInstance("test hook", None, {}, logger)
+
+        ppi.run_accept({}, Mock(type="file.image"))
+        ppi.run_accept({}, Mock(type="file.image"))
+
+        self.assertEqual(accept.call_count, 2)
+        self.assertEqual(ppi.accept_cache_stats["size"], 0)
+
+    @mock_publish_plugin_instance_hook_creation
+    def test_accept_event_pump_benchmark(self, create_hook_instance):
+        """
+        Compare the cost of processing events after each of 10k accepts with
+        the throttled event pump.
+        """
+        import time
+
+        create_hook_instance.return_value = MagicMock(
+            accept=Mock(return_value={"accepted": True}),
+            accept_cache_key=Mock(return_value=None)
+        )
+        ppi = self.PublishPluginInstance("test hook", None, {}, logger)
+
+        # Simulate a costly event loop, as seen with large publish trees.
+        def process_events():
+            time.sleep(0.0001)
+
+        def run_accepts(interval):
+            pump = self.util.EventPump(interval)
+            with patch.object(self.util, "get_event_pump", return_value=pump):
+                start = time.time()
+                for _ in xrange(10000):
+                    ppi.run_accept({}, None)
+                return (time.time() - start, pump.stats)
+
+        with patch("sgtk.platform.current_engine") as current_engine:
+            current_engine.return_value.has_ui = False
+            with patch.object(
+                self.QtCore.QCoreApplication, "processEvents", side_effect=process_events
+            ):
+                (unthrottled_time, unthrottled_stats) = run_accepts(0)
+                (throttled_time, throttled_stats) = run_accepts(30)
+
+        logger.info(
+            "10k accepts: %.3fs processing events every call, %.3fs throttled (%s)" %
+            (unthrottled_time, throttled_time, throttled_stats)
+        )
+
+        self.assertEqual(unthrottled_stats, {"pumped": 10000, "skipped": 0})
+        self.assertEqual(
+            throttled_stats["pumped"] + throttled_stats["skipped"], 10000
+        )
+        self.assertLess(throttled_stats["pumped"], unthrottled_stats["pumped"])
+        self.assertLess(throttled_time, unthrottled_time)
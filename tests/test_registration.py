@@ -0,0 +1,172 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+
+import sgtk
+from mock import patch
+
+from publish_api_test_base import PublishApiTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+
+class TestRegistrationQueue(PublishApiTestBase):
+    """
+    Tests the batched registration of publishes.
+    """
+
+    def setUp(self):
+        super(TestRegistrationQueue, self).setUp()
+        self.registration = self.app.import_module("tk_multi_publish2").registration
+        self.queue = self.registration.RegistrationQueue(batch_size=2)
+
+        # count the batches issued
+        self.batch_calls = []
+        batch = self.mockgun.batch
+
+        def counting_batch(requests):
+            self.batch_calls.append(requests)
+            if any(request["data"].get("name") == "bad" for request in requests):
+                raise Exception("Failed to create 'bad'.")
+            return batch(requests)
+
+        self.mockgun.batch = counting_batch
+
+        root_item = self.manager.tree.root_item
+        self.parent_item = root_item.create_item("parent", "Parent", "Parent")
+        self.items = [
+            self.parent_item.create_item("child", "Child", "Child %d" % (index,))
+            for index in range(3)
+        ]
+
+    def _queue(self, item, name, error_callback=None):
+        path = os.path.join(self.project_root, "publishes", "%s.v001.ma" % (name,))
+        return self.queue.register_publish(
+            item,
+            {
+                "tk": self.tk,
+                "context": self.manager.context,
+                "path": path,
+                "name": name,
+                "version_number": 1,
+                "published_file_type": "Maya Scene",
+            },
+            dependencies=self.queue.get_pending_requests(item.parent),
+            error_callback=error_callback
+        )
+
+    def test_flush(self):
+        """
+        Ensures publishes are created in batches, parents first.
+        """
+        parent_request = self._queue(self.parent_item, "parent")
+        requests = [
+            self._queue(item, "child%d" % (index,))
+            for (index, item) in enumerate(self.items)
+        ]
+
+        self.assertEqual(self.queue.stats["pending"], 4)
+        self.queue.flush()
+        self.assertEqual(self.queue.stats["pending"], 0)
+        self.assertEqual(self.queue.stats["registered"], 4)
+
+        # one batch for the parent, two for the children and two for the
+        # dependencies of the children
+        self.assertEqual(len(self.batch_calls), 5)
+
+        parent_publish = parent_request.sg_publish_data
+        self.assertEqual(self.parent_item.properties.sg_publish_data_list, [parent_publish])
+        for (item, request) in zip(self.items, requests):
+            self.assertEqual(item.properties.sg_publish_data_list, [request.sg_publish_data])
+            self.assertIn(parent_publish["id"], request.publish_data["dependency_ids"])
+
+    def test_group_data(self):
+        """
+        Ensures core builds the data of a single publish per context and
+        publish type, the data of the others being derived from it.
+        """
+        requests = [self._queue(self.parent_item, "parent")] + [
+            self._queue(item, "child%d" % (index,))
+            for (index, item) in enumerate(self.items)
+        ]
+        expected = [
+            sgtk.util.register_publish(dry_run=True, **request.publish_data)
+            for request in requests
+        ]
+
+        with patch("sgtk.util.register_publish", wraps=sgtk.util.register_publish) as register_publish:
+            self.queue.flush()
+        self.assertEqual(register_publish.call_count, 1)
+
+        # the publishes are created before their dependencies
+        created = [
+            request["data"]
+            for batch_requests in self.batch_calls
+            for request in batch_requests
+            if request["entity_type"] == expected[0]["type"]
+        ]
+        self.assertEqual(len(created), len(expected))
+        for (data, expected_data) in zip(created, expected):
+            expected_data.pop("type")
+            self.assertEqual(data, expected_data)
+
+    def test_manager_queues(self):
+        """
+        Ensures each publish manager owns its registration queue.
+        """
+        other_manager = self.app.create_publish_manager()
+        self.assertIsNot(other_manager.registration_queue, self.manager.registration_queue)
+
+    def test_lazy_flush(self):
+        """
+        Ensures accessing the publishes of an item registers the queued
+        publishes.
+        """
+        self.parent_item.properties.sg_publish_data_list = [{"type": "PublishedFile", "id": 1}]
+        self._queue(self.parent_item, "parent")
+        self._queue(self.items[0], "child")
+
+        self.assertFalse(self.items[0].properties.is_resolved("sg_publish_data_list"))
+        self.assertEqual(len(self.items[0].properties.sg_publish_data_list), 1)
+        self.assertEqual(len(self.parent_item.properties.sg_publish_data_list), 2)
+        self.assertEqual(self.queue.stats["pending"], 0)
+
+    def test_registered_publishes(self):
+        """
+        Ensures the publishes already registered for an item are available
+        without flushing the queue.
+        """
+        registered = {"type": "PublishedFile", "id": 1}
+        self.parent_item.properties.sg_publish_data_list = [registered]
+        self._queue(self.parent_item, "parent")
+
+        self.assertEqual(self.queue.get_registered_publishes(self.parent_item), [registered])
+        self.assertEqual(self.queue.get_registered_publishes(self.items[0]), [])
+        self.assertEqual(self.queue.stats["pending"], 1)
+
+    def test_failure(self):
+        """
+        Ensures failures are reported for the item and its dependents.
+        """
+        other_item = self.manager.tree.root_item.create_item("other", "Other", "Other")
+
+        failed = []
+        self.queue = self.registration.RegistrationQueue(batch_size=1)
+        self._queue(self.parent_item, "bad", error_callback=failed.append)
+        self._queue(self.items[0], "child", error_callback=failed.append)
+        self._queue(other_item, "other")
+
+        with self.assertRaises(self.registration.RegistrationError) as context:
+            self.queue.flush()
+
+        self.assertEqual(len(context.exception.failures), 2)
+        self.assertEqual([request.item for request in failed], [self.parent_item, self.items[0]])
+        self.assertNotIn("sg_publish_data_list", self.items[0].properties)
+        self.assertEqual(len(other_item.properties.sg_publish_data_list), 1)
@@ -0,0 +1,65 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+from publish_api_test_base import PublishApiTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+
+class TestSchemaCache(PublishApiTestBase):
+    """
+    Tests the caching of the Shotgun schema done by the util module.
+    """
+
+    def setUp(self):
+        super(TestSchemaCache, self).setUp()
+
+        # count the schema reads issued
+        self.schema_reads = []
+        schema_field_read = self.mockgun.schema_field_read
+
+        def counting_schema_field_read(entity_type, *args, **kwargs):
+            self.schema_reads.append(entity_type)
+            return schema_field_read(entity_type, *args, **kwargs)
+
+        self.mockgun.schema_field_read = counting_schema_field_read
+        self.schema = self.app.import_module("tk_multi_publish2").schema
+
+    def test_single_read(self):
+        """
+        Ensures the schema is read once for many publishes.
+        """
+        cache = self.schema.get_schema_cache()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        cache.prefetch(["PublishedFile"])
+        for _ in range(500):
+            fields = self.util.get_schema_fields("PublishedFile")
+            self.assertIn("code", fields)
+
+        self.assertEqual(self.schema_reads, ["PublishedFile"])
+        self.assertEqual(cache.stats["reads"], 1)
+        self.assertEqual(cache.stats["hits"], 500)
+
+    def test_ttl(self):
+        """
+        Ensures expired schemas are read again.
+        """
+        cache = self.schema.SchemaCache(ttl=0)
+        cache.get_fields("PublishedFile")
+        cache.get_fields("PublishedFile")
+        self.assertEqual(len(self.schema_reads), 2)
+
+        cache = self.schema.SchemaCache(ttl=60)
+        cache.get_fields("PublishedFile")
+        cache.get_fields("Version")
+        cache.get_fields("PublishedFile")
+        self.assertEqual(self.schema_reads[2:], ["PublishedFile", "Version"])
+        self.assertEqual(cache.stats["size"], 2)
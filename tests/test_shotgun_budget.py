@@ -0,0 +1,152 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+
+from publish_api_test_base import PublishApiTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+
+class TestShotgunBudget(PublishApiTestBase):
+    """
+    Publishes a tree of files against the mocked Shotgun site and ensures the
+    Shotgun calls of each phase stay within a budget.
+
+    The budget of each phase and category of calls is a number of calls per
+    published file plus a fixed number of calls. Calls which should be issued
+    once for all files, such as grouped finds, have no per file budget, so
+    that any regression issuing them for each file fails the test.
+    """
+
+    # the number of files published
+    NUM_FILES = 50
+
+    # the (per file, fixed) number of calls budgeted for each phase and
+    # category. categories which aren't listed aren't expected to be called.
+    BUDGET = {
+        "validate": {
+            "find": (0, 10),
+            "schema": (0, 5),
+        },
+        "publish": {
+            # register_publish looks up the publish type and creates the
+            # publish for each file
+            "find": (3, 10),
+            "create": (2, 5),
+            "schema": (0, 5),
+        },
+        "finalize": {
+            "find": (0, 5),
+            "batch": (0, 2),
+        },
+    }
+
+    def setUp(self):
+        super(TestShotgunBudget, self).setUp()
+
+        plugin = self.PublishPluginInstance(
+            "Publish to Shotgun",
+            "{self}/basic/publish.py:{self}/basic/publish_files.py",
+            self.manager.context,
+            self.manager
+        )
+
+        folder = os.path.join(self.project_root, "budget")
+        os.makedirs(folder)
+
+        root_item = self.manager.tree.root_item
+        for index in range(self.NUM_FILES):
+            path = os.path.join(folder, "plate_%03d.v001.png" % (index,))
+            with open(path, "wb") as fh:
+                fh.write("budget")
+
+            item = root_item.create_item("file.image", "Image", os.path.basename(path))
+            item.properties.path = path
+            item.add_task(plugin)
+
+        self.call_stats = self.app.import_module("tk_multi_publish2").shotgun_pool.get_call_stats()
+        self.call_stats.clear()
+
+    def test_budget(self):
+        """
+        Ensures publishing doesn't issue more Shotgun calls than budgeted.
+        """
+        self.assertEqual(self.manager.validate(), [])
+        self.manager.publish()
+        self.manager.finalize()
+
+        exceeded = []
+        for phase in ["validate", "publish", "finalize"]:
+            totals = self.call_stats.get_totals(phase=phase)
+            for (category, total) in sorted(totals.items()):
+                (per_file, fixed) = self.BUDGET[phase].get(category, (0, 0))
+                budgeted = per_file * self.NUM_FILES + fixed
+                if total["count"] > budgeted:
+                    exceeded.append(
+                        "%s %s: %d calls, %d budgeted" %
+                        (phase, category, total["count"], budgeted)
+                    )
+
+        self.assertFalse(
+            exceeded,
+            "Shotgun call budget exceeded:\n%s\n\n%s" % (
+                "\n".join(exceeded), self.call_stats.format_report())
+        )
+
+    def test_task_generator(self):
+        """
+        Ensures validating the tasks of a custom generator groups the finds of
+        the plugins' pre validation.
+        """
+        tasks = [task for item in self.manager.tree for task in item.tasks]
+
+        def task_generator():
+            for task in tasks:
+                yield task
+
+        self.assertEqual(
+            self.manager.validate(task_generator=task_generator(), tasks=tasks), [])
+
+        totals = self.call_stats.get_totals(phase="validate")
+        (_, fixed) = self.BUDGET["validate"]["find"]
+        self.assertLessEqual(
+            totals.get("find", {}).get("count", 0),
+            fixed,
+            "Shotgun call budget exceeded:\n%s" % (self.call_stats.format_report(),)
+        )
+
+    def test_retargeted_items(self):
+        """
+        Ensures validating items retargeted to other entities issues the
+        Shotgun calls of each distinct context rather than of each item.
+        """
+        shots = [
+            self.mockgun.create("Shot", {"code": "shot_%02d" % (index,), "project": self.project})
+            for index in range(2)
+        ]
+        contexts = [
+            self.tk.context_from_entity(shot["type"], shot["id"])
+            for shot in shots
+        ]
+        for (index, item) in enumerate(self.manager.tree):
+            item.context = contexts[index % len(contexts)]
+
+        self.assertEqual(self.manager.validate(), [])
+
+        # the finds have no per file budget, a fixed number of them is
+        # budgeted per context
+        totals = self.call_stats.get_totals(phase="validate")
+        (_, fixed) = self.BUDGET["validate"]["find"]
+        budgeted = fixed * (len(contexts) + 1)
+        self.assertLessEqual(
+            totals.get("find", {}).get("count", 0),
+            budgeted,
+            "Shotgun call budget exceeded:\n%s" % (self.call_stats.format_report(),)
+        )
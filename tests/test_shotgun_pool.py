@@ -0,0 +1,87 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import threading
+
+from mock import MagicMock
+
+from publish_api_test_base import PublishApiTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+
+class TestShotgunPool(PublishApiTestBase):
+    """
+    Tests the per thread Shotgun connections handed out by the shotgun_pool
+    module.
+    """
+
+    def setUp(self):
+        super(TestShotgunPool, self).setUp()
+        self.shotgun_pool = self.app.import_module("tk_multi_publish2").shotgun_pool
+
+    def _get_in_thread(self, pool):
+        """
+        Returns the connection the supplied pool hands out to a new thread,
+        once the thread has exited.
+        """
+        connections = []
+        thread = threading.Thread(target=lambda: connections.append(pool.get()))
+        thread.start()
+        thread.join()
+        return connections[0]
+
+    def test_per_thread(self):
+        """
+        Ensures each thread gets a connection of its own, reused once the
+        thread has exited.
+        """
+        pool = self.shotgun_pool.ShotgunPool(max_size=4, connection_factory=MagicMock)
+
+        connection = pool.get()
+        self.assertIs(pool.get(), connection)
+
+        thread_connection = self._get_in_thread(pool)
+        self.assertIsNot(thread_connection.connection, connection.connection)
+
+        # the connection of the exited thread is handed out again
+        self.assertIs(self._get_in_thread(pool), thread_connection)
+        self.assertEqual(pool.stats["created"], 2)
+
+    def test_eviction(self):
+        """
+        Ensures idle connections and connections exceeding the size of the
+        pool are evicted.
+        """
+        pool = self.shotgun_pool.ShotgunPool(max_size=1, connection_factory=MagicMock)
+        connection = pool.get()
+        self._get_in_thread(pool)
+        self.assertEqual(pool.stats["size"], 1)
+        self.assertEqual(pool.stats["evicted"], 1)
+
+        # the main thread's connection was evicted for the thread's one
+        self.assertIsNot(pool.get(), connection)
+
+        pool = self.shotgun_pool.ShotgunPool(max_size=4, idle_timeout=-1, connection_factory=MagicMock)
+        connection = pool.get()
+        self.assertIsNot(pool.get(), connection)
+        self.assertEqual(pool.stats["evicted"], 1)
+
+    def test_request_counts(self):
+        """
+        Ensures requests issued through the pool are counted.
+        """
+        pool = self.shotgun_pool.ShotgunPool(connection_factory=lambda: self.mockgun)
+        shotgun = pool.get()
+        shotgun.find("Project", [])
+        shotgun.find_one("Project", [])
+        shotgun.find("Project", [])
+
+        self.assertEqual(pool.request_counts, {"find": 2, "find_one": 1})
+        self.assertEqual(pool.stats["requests"], 3)
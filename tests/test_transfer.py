@@ -0,0 +1,245 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import hashlib
+import os
+import stat
+
+from mock import patch
+
+from publish_api_test_base import PublishApiTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+
+class TestTransfer(PublishApiTestBase):
+    """
+    Tests the copy of files and sequences to their publish location.
+    """
+
+    def setUp(self):
+        super(TestTransfer, self).setUp()
+        self.transfer = self.app.import_module("tk_multi_publish2").transfer
+
+        self.src_folder = os.path.join(self.tank_temp, "transfer", "work")
+        self.dest_folder = os.path.join(self.tank_temp, "transfer", "publish")
+        os.makedirs(self.src_folder)
+
+        self.src_files = []
+        for frame in range(1001, 1011):
+            src_file = os.path.join(self.src_folder, "plate.%04d.exr" % (frame,))
+            with open(src_file, "w") as fh:
+                fh.write("frame %d" % (frame,))
+            self.src_files.append(src_file)
+
+    def test_sequence_jobs(self):
+        """
+        Ensures the destination of each frame is derived from the patterns.
+        """
+        dest_path = os.path.join(self.dest_folder, "plate.v001.%04d.exr")
+        jobs = self.transfer.get_transfer_jobs(self.src_files, dest_path, True)
+
+        self.assertEqual([job.source for job in jobs], self.src_files)
+        self.assertEqual(
+            [job.destination for job in jobs],
+            [
+                os.path.join(self.dest_folder, "plate.v001.%04d.exr" % (frame,))
+                for frame in range(1001, 1011)
+            ]
+        )
+
+    def test_copy(self):
+        """
+        Ensures all frames are copied, reporting progress.
+        """
+        dest_path = os.path.join(self.dest_folder, "plate.v001.%04d.exr")
+        jobs = self.transfer.get_transfer_jobs(self.src_files, dest_path, True)
+
+        progress = []
+        file_transfer = self.transfer.FileTransfer(
+            max_workers=4,
+            progress_callback=lambda done, total: progress.append((done, total))
+        )
+        copied_files = file_transfer.copy(jobs)
+
+        self.assertEqual(copied_files, [job.destination for job in jobs])
+        for job in jobs:
+            with open(job.destination) as fh:
+                with open(job.source) as src_fh:
+                    self.assertEqual(fh.read(), src_fh.read())
+
+        self.assertEqual(progress[-1], (10, 10))
+        self.assertEqual(len(progress), 10)
+
+    def test_copy_failures(self):
+        """
+        Ensures failures are aggregated once all files have been processed.
+        """
+        dest_path = os.path.join(self.dest_folder, "plate.v001.%04d.exr")
+        jobs = self.transfer.get_transfer_jobs(self.src_files, dest_path, True)
+
+        os.remove(self.src_files[2])
+        os.remove(self.src_files[5])
+
+        file_transfer = self.transfer.FileTransfer(max_workers=4)
+        with self.assertRaises(self.transfer.TransferError) as cm:
+            file_transfer.copy(jobs)
+
+        self.assertEqual(
+            sorted(job.source for (job, _) in cm.exception.failures),
+            [self.src_files[2], self.src_files[5]]
+        )
+        # the other frames were still copied
+        self.assertTrue(os.path.exists(jobs[9].destination))
+
+    def test_short_copy(self):
+        """
+        Ensures files left short by a copy are reported as failed.
+        """
+        dest_path = os.path.join(self.dest_folder, "plate.v001.%04d.exr")
+        jobs = self.transfer.get_transfer_jobs(self.src_files[:2], dest_path, True)
+
+        def short_copy(source, destination, **kwargs):
+            with open(destination, "w") as fh:
+                fh.write("frame")
+
+        file_transfer = self.transfer.FileTransfer(
+            max_workers=1, mode=self.transfer.TRANSFER_MODE_COPY)
+        with patch.object(self.transfer.filesystem, "copy_file", side_effect=short_copy):
+            with self.assertRaises(self.transfer.TransferError) as cm:
+                file_transfer.copy(jobs)
+
+        self.assertEqual(len(cm.exception.failures), 2)
+        self.assertIn("Size mismatch", cm.exception.failures[0][1])
+
+    def test_transfer_modes(self):
+        """
+        Ensures the strategy used is reported per file and files are sealed.
+        """
+        for mode in self.transfer.TRANSFER_MODES:
+            dest_path = os.path.join(
+                self.dest_folder, mode, "plate.v001.%04d.exr"
+            )
+            jobs = self.transfer.get_transfer_jobs(self.src_files, dest_path, True)
+
+            file_transfer = self.transfer.FileTransfer(max_workers=4, mode=mode)
+            file_transfer.copy(jobs)
+
+            for job in jobs:
+                self.assertIn(
+                    job.strategy,
+                    (
+                        self.transfer.HARDLINK,
+                        self.transfer.REFLINK,
+                        self.transfer.COPY
+                    )
+                )
+                self.assertFalse(
+                    os.stat(job.destination).st_mode &
+                    (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+                )
+                with open(job.destination) as fh:
+                    with open(job.source) as src_fh:
+                        self.assertEqual(fh.read(), src_fh.read())
+
+            self.assertEqual(sum(file_transfer.stats.values()), 10)
+
+            if mode == self.transfer.TRANSFER_MODE_COPY:
+                self.assertEqual(file_transfer.stats, {self.transfer.COPY: 10})
+            elif mode == self.transfer.TRANSFER_MODE_LINK and hasattr(os, "link"):
+                # the work and publish areas are on the same device
+                self.assertEqual(file_transfer.stats, {self.transfer.HARDLINK: 10})
+                self.assertTrue(
+                    os.path.samefile(jobs[0].source, jobs[0].destination)
+                )
+
+        with self.assertRaises(self.transfer.sgtk.TankError):
+            self.transfer.FileTransfer(mode="teleport")
+
+    def test_checksums(self):
+        """
+        Ensures the digest of each file is computed and verified while copying
+        and stored compactly.
+        """
+        for mode in self.transfer.TRANSFER_MODES:
+            dest_path = os.path.join(
+                self.dest_folder, mode, "plate.v001.%04d.exr"
+            )
+            jobs = self.transfer.get_transfer_jobs(self.src_files, dest_path, True)
+
+            file_transfer = self.transfer.FileTransfer(
+                max_workers=4, mode=mode, checksum_algorithm="md5", verify=True
+            )
+            file_transfer.copy(jobs)
+
+            expected = []
+            for job in jobs:
+                with open(job.source, "rb") as fh:
+                    expected.append(hashlib.md5(fh.read()).hexdigest())
+            self.assertEqual([job.digest for job in jobs], expected)
+
+            checksums = self.transfer.pack_checksums(
+                "md5", [job.digest for job in jobs]
+            )
+            self.assertEqual(checksums["digests"], "".join(expected))
+            self.assertEqual(self.transfer.unpack_checksums(checksums), expected)
+
+        # files published in place are hashed too
+        jobs = [
+            self.transfer.TransferJob(src_file, src_file)
+            for src_file in self.src_files
+        ]
+        file_transfer = self.transfer.FileTransfer(checksum_algorithm="sha1")
+        self.assertEqual(file_transfer.copy(jobs), [])
+        self.assertEqual(file_transfer.stats, {self.transfer.IN_PLACE: 10})
+        self.assertTrue(all(len(job.digest) == 40 for job in jobs))
+
+        with self.assertRaises(self.transfer.sgtk.TankError):
+            self.transfer.FileTransfer(checksum_algorithm="nope")
+
+    def test_resume(self):
+        """
+        Ensures a resumed copy skips the files left identical by a partial copy
+        and replaces the others.
+        """
+        dest_path = os.path.join(self.dest_folder, "plate.v001.%04d.exr")
+        jobs = self.transfer.get_transfer_jobs(self.src_files, dest_path, True)
+
+        # a partial copy of the first frames
+        self.transfer.FileTransfer(mode="copy", resume=True).copy(jobs[:5])
+
+        # a divergent frame
+        os.chmod(jobs[1].destination, stat.S_IRUSR | stat.S_IWUSR)
+        with open(jobs[1].destination, "w") as fh:
+            fh.write("corrupted")
+
+        # a divergent frame left read-only by the partial copy
+        with open(jobs[2].source, "w") as fh:
+            fh.write("updated frame")
+
+        self.assertFalse(self.transfer.is_unchanged(jobs[1].source, jobs[1].destination))
+        self.assertFalse(self.transfer.is_unchanged(jobs[2].source, jobs[2].destination))
+        self.assertTrue(self.transfer.is_unchanged(jobs[0].source, jobs[0].destination))
+
+        jobs = self.transfer.get_transfer_jobs(self.src_files, dest_path, True)
+        file_transfer = self.transfer.FileTransfer(
+            mode="copy", resume=True, checksum_algorithm="md5"
+        )
+        copied_files = file_transfer.copy(jobs)
+
+        self.assertEqual(copied_files, [job.destination for job in jobs])
+        self.assertEqual(
+            file_transfer.stats,
+            {self.transfer.UNCHANGED: 3, self.transfer.COPY: 7}
+        )
+        self.assertTrue(all(job.digest for job in jobs))
+        for job in jobs:
+            with open(job.destination) as fh:
+                with open(job.source) as src_fh:
+                    self.assertEqual(fh.read(), src_fh.read())
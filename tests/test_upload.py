@@ -0,0 +1,113 @@
+# Copyright (c) 2018 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import threading
+
+from mock import MagicMock, patch
+
+from publish_api_test_base import PublishApiTestBase
+from tank_test.tank_test_base import setUpModule # noqa
+
+
+class TestUploadQueue(PublishApiTestBase):
+    """
+    Tests the background upload of files.
+    """
+
+    def setUp(self):
+        super(TestUploadQueue, self).setUp()
+        self.upload = self.app.import_module("tk_multi_publish2").upload
+        self.queue = self.upload.UploadQueue(max_workers=2, max_attempts=3, retry_delay=0)
+
+        # the files failing to upload, with their number of failures left
+        self.failures = {}
+        self.uploads = []
+        self.connections = []
+        lock = threading.Lock()
+
+        def upload(entity_type, entity_id, path, field_name=None):
+            with lock:
+                if self.failures.get(path):
+                    self.failures[path] -= 1
+                    raise Exception("Failed to upload '%s'." % (path,))
+                self.uploads.append((entity_type, entity_id, path, field_name))
+
+        def create_connection():
+            shotgun = MagicMock()
+            shotgun.upload.side_effect = upload
+            shotgun.upload_thumbnail.side_effect = upload
+            self.connections.append(shotgun)
+            return shotgun
+
+        shotgun_pool = self.app.import_module("tk_multi_publish2").shotgun_pool
+        pool = shotgun_pool.ShotgunPool(max_size=2, connection_factory=create_connection)
+        patcher = patch.object(shotgun_pool, "_shotgun_pool", pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.item = self.manager.tree.root_item.create_item("item", "Item", "Item")
+
+    def test_wait(self):
+        """
+        Ensures queued files are uploaded by a bounded pool of workers.
+        """
+        jobs = [
+            self.queue.upload(self.item, "Version", index, "/movie%d.mov" % (index,), "sg_uploaded_movie")
+            for index in range(10)
+        ]
+        jobs.append(self.queue.upload_thumbnail(self.item, "Version", 10, "/thumb.jpg"))
+
+        self.assertEqual(self.queue.get_jobs(self.item), jobs)
+        self.queue.wait()
+
+        self.assertEqual(len(self.uploads), 11)
+        self.assertIn(("Version", 10, "/thumb.jpg", None), self.uploads)
+        self.assertLessEqual(len(self.connections), 2)
+        self.assertEqual(self.queue.stats["uploaded"], 11)
+        self.assertEqual(self.queue.stats["pending"], 0)
+        self.assertEqual(self.queue.get_jobs(self.item), [])
+
+    def test_retries(self):
+        """
+        Ensures failed uploads are retried and reported once out of attempts.
+        """
+        self.failures = {"/flaky.mov": 2, "/broken.mov": 3}
+        flaky_job = self.queue.upload(self.item, "Version", 1, "/flaky.mov", "sg_uploaded_movie")
+        broken_job = self.queue.upload(self.item, "Version", 2, "/broken.mov", "sg_uploaded_movie")
+        other_item = self.manager.tree.root_item.create_item("item", "Item", "Other")
+        other_job = self.queue.upload(other_item, "Version", 3, "/other.mov", "sg_uploaded_movie")
+
+        with self.assertRaises(self.upload.UploadError) as context:
+            self.queue.wait(self.queue.get_jobs(self.item))
+
+        self.assertEqual(context.exception.failures, [broken_job])
+        self.assertEqual(flaky_job.attempts, 3)
+        self.assertIsNone(flaky_job.error)
+        self.assertEqual(broken_job.attempts, 3)
+        self.assertIn("Failed to upload '/broken.mov'.", broken_job.error)
+        self.assertEqual(self.queue.stats["retries"], 4)
+
+        # the failure was reported, only the other upload is left to wait for
+        self.assertEqual(self.queue.wait(), [other_job])
+
+    def test_manager_wait(self):
+        """
+        Ensures the manager only waits for the uploads of the items of its tree.
+        """
+        item_job = self.queue.upload(self.item, "Version", 1, "/item.mov", "sg_uploaded_movie")
+        other_job = self.queue.upload(None, "Version", 2, "/other.mov", "sg_uploaded_movie")
+
+        with patch.object(self.upload, "_upload_queue", self.queue):
+            self.manager.finalize()
+
+        self.assertTrue(item_job.is_done)
+        self.assertEqual(self.queue.get_jobs(self.item), [])
+        self.assertEqual(self.queue.get_jobs(None), [other_job])
+        self.queue.wait()